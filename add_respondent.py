@@ -1,13 +1,16 @@
 #!/usr/bin/env python
 
+import logging
 import tkinter as tk
 import tkinter.messagebox as messagebox
-from fuzzywuzzy import fuzz
 import queryfuncs as qf
 from possible_matches import PossibleMatches
 
+logger = logging.getLogger(__name__)
+
+
 class AddRespondent:
-    def __init__(self, master, main_gui, con):
+    def __init__(self, master, main_gui, con, worker):
         """
         TK Window Class used for when the user wants to add a respondent. User is constrained to add only respondent types
         2 or 3 (Parents and Mentors) as a design decision. Process gets the name of the respondent and then runs a fuzzy
@@ -16,10 +19,12 @@ class AddRespondent:
         :param master: Master TK Root
         :param main_gui: the main GUI object from gui.py. This is passed so that the main window can be updated upon completion
         :param con: cx_Oracle object
+        :param worker: DBWorker the duplicate check and the insert run on
         """
         self.master = master
         self.main_gui = main_gui
         self.con = con
+        self.worker = worker
         self.mainframe = tk.Frame(self.master)
         self.mainframe.pack()
 
@@ -53,13 +58,14 @@ class AddRespondent:
         parent_radio.grid(row=1, column=1)
         mentor_radio.grid(row=1, column=2)
 
-        submit_button = tk.Button(self.entryframe, text='Submit', width=10, command=self.submit)
-        submit_button.grid(row=3, column = 0, columnspan=3, sticky='nsew')
+        self.submit_button = tk.Button(self.entryframe, text='Submit', width=10, command=self.submit)
+        self.submit_button.grid(row=3, column = 0, columnspan=3, sticky='nsew')
 
     def submit(self, bypass_duplicate=False):
         """
-        Method used to fetch the entered name and respondent type to compare against existing database. Uses fuzzywuzzy
-        python package to compare the names, if any comparison yields a 50% match or higher then that respondent is added
+        Method used to fetch the entered name and respondent type to compare against existing database. Uses the
+        cached DuplicateFinder for the respondent type (see duplicates.py) to compare the names with the same score as
+        fuzz.ratio(), if any comparison yields a 50% match or higher then that respondent is added
         to a "review" list that is passed to another window. This can be bypassed by passing "True" as the second argument.
         This is used specifically when the user has completed their review of potential matches and determined that the
         repsondent is unique. NOTE: If the respondent exists exactly then the respondent cannot be added again (database enforced constraint)
@@ -76,40 +82,56 @@ class AddRespondent:
             messagebox.showerror("Empty Name", "Please enter the full name of the respondent")
             return None
 
+        # The check and the insert run on the worker, the button is locked until they report back
+        self.submit_button.config(state='disabled')
         if not bypass_duplicate:
-            existing_respondents = qf.get_existing_respondents(self.con, resp_type)
-            if name.lower() in [resp[0].lower() for resp in existing_respondents]:
-                messagebox.showerror('Already Exists', 'The respondent you are trying to add already exists in the database.\n\nIf you believe this to be an error, please contact the Admin.')
-                return None
-            possible_matches = []
-            for existing_name, id, district in existing_respondents:
-                token = fuzz.ratio(name.lower(), existing_name.lower())
-                if token >= 50:
-                    possible_matches.append((existing_name, id, token, district))
-
-            if possible_matches:
-                possible_matches = sorted(possible_matches, key=lambda x: x[2])
-                errorstr = 'There are {} possible matches for the name you\'ve entered.\n\nPlease review them to ensure that your entry is unique'.format(len(possible_matches))
-                messagebox.showinfo('Possible Duplicate', errorstr)
-                self.possiblematchwindow = tk.Toplevel()
-                self.app = PossibleMatches(self.possiblematchwindow, self.con, self, possible_matches)
-            else:
-                result = qf.insert_respondent(self.con, name.title(), resp_type)
-                if not result:
-                    messagebox.showinfo('Sucess!', 'Respondent added successfully!')
-                    self.master.destroy()
-                    self.main_gui.respSearchEntry.insert(0, name.title())
-                    self.main_gui.respondent_search()
-                else:
-                    messagebox.showerror('Error!', 'Respondent has not added correctly.\n\nPlease take a screenshot of what you entered and send it to Dave.')
+            self.worker.submit(qf.check_new_respondent, name, resp_type,
+                               callback=lambda result: self.checked(name, resp_type, *result),
+                               errback=self.failed)
+        else:
+            self.worker.submit(qf.insert_respondent, name.title(), resp_type,
+                               callback=lambda result: self.inserted(name, result, bypass_duplicate),
+                               errback=self.failed)
+
+    def checked(self, name, resp_type, exists, possible_matches, linked_students):
+        """
+        Called on the Tk thread with the result of qf.check_new_respondent(): stops on an exact match, opens the review
+        of the possible matches (with the students they were linked to) if there are any, otherwise adds the respondent.
+        :return: None
+        """
+        if exists:
+            messagebox.showerror('Already Exists', 'The respondent you are trying to add already exists in the database.\n\nIf you believe this to be an error, please contact the Admin.')
+            self.submit_button.config(state='normal')
+            return None
+
+        if possible_matches:
+            errorstr = 'There are {} possible matches for the name you\'ve entered.\n\nPlease review them to ensure that your entry is unique'.format(len(possible_matches))
+            messagebox.showinfo('Possible Duplicate', errorstr)
+            self.submit_button.config(state='normal')
+            self.possiblematchwindow = tk.Toplevel()
+            self.app = PossibleMatches(self.possiblematchwindow, self.con, self, possible_matches, linked_students)
         else:
-            result =  qf.insert_respondent(self.con, name.title(), resp_type)
-            if not result:
-                messagebox.showinfo('Sucess!', 'Respondent added successfully!')
-                self.master.destroy()
+            self.worker.submit(qf.insert_respondent, name.title(), resp_type,
+                               callback=lambda result: self.inserted(name, result, False), errback=self.failed)
+
+    def inserted(self, name, result, reviewed):
+        """
+        Called on the Tk thread with the result of qf.insert_respondent().
+        :param reviewed: True if the possible matches window is open and has to be closed as well
+        :return: None
+        """
+        if not result:
+            messagebox.showinfo('Sucess!', 'Respondent added successfully!')
+            self.master.destroy()
+            if reviewed:
                 self.app.master.destroy()
-                self.main_gui.respSearchEntry.insert(0, name.title())
-                self.main_gui.respondent_search()
-            else:
-                messagebox.showerror('Error!', 'Respondent has not added correctly.\n\nPlease take a screenshot of what you entered and send it to Dave.')
+            self.main_gui.respSearchEntry.insert(0, name.title())
+            self.main_gui.respondent_search()
+        else:
+            messagebox.showerror('Error!', 'Respondent has not added correctly.\n\nPlease take a screenshot of what you entered and send it to Dave.')
+            self.submit_button.config(state='normal')
 
+    def failed(self, e):
+        logger.error('Could not add the respondent: %s', e)
+        messagebox.showerror('Error!', 'Respondent has not added correctly.\n\nPlease take a screenshot of what you entered and send it to Dave.')
+        self.submit_button.config(state='normal')
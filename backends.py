@@ -0,0 +1,784 @@
+#!/usr/bin/env python
+
+"""
+Storage backends for queryfuncs. Each backend knows how to open a connection for its engine and how to run the
+queries in queryfuncs against it, so the rest of the app can stay the same whether it is talking to the production
+Oracle database or to a local SQLite file.
+
+The backend is picked from the connection string given at login: anything starting with "sqlite:" (or a path ending in
+.db/.sqlite) opens a SQLite database, everything else is treated as an Oracle domain.
+"""
+
+import logging
+import re
+import time
+import zlib
+import queue
+import sqlite3
+import datetime
+import threading
+from collections import OrderedDict
+try:
+    import cx_Oracle
+except ImportError:
+    cx_Oracle = None
+
+logger = logging.getLogger(__name__)
+
+
+ORACLE_SCHEMA = 'davidj'
+
+# Default pool sizes, one connection for the background worker and one for the Tk thread per data-entry window
+POOL_MIN_SIZE = 2
+POOL_MAX_SIZE = 8
+POOL_TIMEOUT = 10  # seconds to wait for a connection when the pool is exhausted
+
+# Prepared statements kept open per connection (queryfuncs has a few dozen distinct queries), and rows fetched per
+# round trip
+STATEMENT_CACHE_SIZE = 40
+ARRAYSIZE = 500
+
+# Sequences the production schema needs for ID allocation, created once by the schema owner. Start them above the
+# current max(id) of their table.
+ORACLE_SEQUENCES_DDL = """
+CREATE SEQUENCE rs_respondent_seq START WITH 1 CACHE 20;
+CREATE SEQUENCE rs_survey_response_seq START WITH 1 CACHE 20;
+"""
+
+# Change tracking column the respondent directory refreshes from (see queryfuncs.refresh_respondents), added once by
+# the schema owner. Existing rows keep a NULL last_updated, they are already loaded at login.
+ORACLE_RESPONDENT_DDL = """
+ALTER TABLE rs_respondent ADD (last_updated TIMESTAMP);
+CREATE INDEX rs_respondent_updated_idx ON rs_respondent (last_updated);
+"""
+
+# One administration per respondent, survey and date taken (one student application per respondent, its date taken is
+# the day it was entered), enforced so that two clerks entering the same survey at the same time can't both save it.
+# Oracle indexes the NULL of the application rows, so a second application for the respondent is a duplicate.
+ORACLE_ADMINISTRATION_DDL = """
+CREATE UNIQUE INDEX rs_survey_response_uk ON rs_survey_response
+    (respondent_id, survey_id, DECODE(survey_id, 7, NULL, date_taken));
+"""
+SQLITE_ADMINISTRATION_DDL = """
+CREATE UNIQUE INDEX IF NOT EXISTS RS_SURVEY_RESPONSE_UK ON RS_SURVEY_RESPONSE
+    (RESPONDENT_ID, SURVEY_ID, CASE WHEN SURVEY_ID = 7 THEN '' ELSE DATE_TAKEN END)
+"""
+
+# Errors meaning the database can't be reached (network down, listener or instance unavailable, session killed),
+# the work is retried later instead of failing for good
+ORACLE_CONNECTION_ERRORS = {1012, 1033, 1034, 1089, 3113, 3114, 3135, 12170, 12514, 12528, 12537, 12541, 12543,
+                            12545, 12547, 12571, 28547}
+ORACLE_CONNECTION_MESSAGES = ('DPI-1010', 'DPI-1080')  # not connected, connection closed
+SQLITE_CONNECTION_MESSAGES = ('unable to open', 'database is locked', 'disk i/o error')
+
+SQLITE_PREFIX = 'sqlite:'
+SQLITE_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+
+# Oracle date format elements used by the queries and their strptime equivalents
+ORACLE_DATE_FORMATS = {
+    'YYYY': '%Y',
+    'MM': '%m',
+    'DD': '%d',
+    'HH24': '%H',
+    'MI': '%M',
+    'SS': '%S'
+}
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS RS_RESPONDENT_TYPE_XREF (
+    ID INTEGER PRIMARY KEY,
+    NAME TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS RS_RESPONDENT (
+    ID INTEGER PRIMARY KEY,
+    NAME TEXT NOT NULL,
+    RESPONDENT_TYPE_ID INTEGER NOT NULL,
+    ENROLLED_DISTRICT TEXT,
+    COHORT TEXT,
+    LAST_UPDATED TIMESTAMP,
+    UNIQUE (NAME, RESPONDENT_TYPE_ID)
+);
+CREATE TABLE IF NOT EXISTS RS_SURVEY (
+    ID INTEGER PRIMARY KEY,
+    NAME TEXT NOT NULL UNIQUE,
+    DESCRIPTION TEXT
+);
+CREATE TABLE IF NOT EXISTS RS_AVAILABLE_SURVEYS (
+    RESPONDENT_TYPE_ID INTEGER NOT NULL,
+    SURVEY_ID INTEGER NOT NULL,
+    PRIMARY KEY (RESPONDENT_TYPE_ID, SURVEY_ID)
+);
+CREATE TABLE IF NOT EXISTS RS_QUESTION (
+    ID INTEGER PRIMARY KEY,
+    TEXT TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS RS_QUESTION_ORDER (
+    SURVEY_ID INTEGER NOT NULL,
+    QUESTION_ID INTEGER NOT NULL,
+    Q_ORDER INTEGER NOT NULL,
+    PRIMARY KEY (SURVEY_ID, Q_ORDER)
+);
+CREATE TABLE IF NOT EXISTS RS_QUESTION_TYPE_XREF (
+    QUESTION_TYPE_ID INTEGER PRIMARY KEY,
+    NAME TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS RS_QUESTION_TYPE (
+    QUESTION_ID INTEGER PRIMARY KEY,
+    NAME INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS RS_RESPONSE_CHOICE (
+    ID INTEGER PRIMARY KEY,
+    QUESTION_ID INTEGER NOT NULL,
+    TEXT TEXT NOT NULL,
+    ANSWER_ORDER INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS RS_SURVEY_RESPONSE (
+    ID INTEGER PRIMARY KEY,
+    SURVEY_ID INTEGER NOT NULL,
+    RESPONDENT_ID INTEGER NOT NULL,
+    DATE_TAKEN TIMESTAMP,
+    DATE_ENTERED TIMESTAMP,
+    LAST_UPDATED TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS RS_RESPONSE (
+    SURVEY_RESPONSE_ID INTEGER NOT NULL,
+    QUESTION_ID INTEGER NOT NULL,
+    RESPONDENT_ID INTEGER NOT NULL,
+    ANSWER TEXT
+);
+
+CREATE INDEX IF NOT EXISTS RS_RESPONDENT_TYPE_IDX ON RS_RESPONDENT (RESPONDENT_TYPE_ID);
+CREATE UNIQUE INDEX IF NOT EXISTS RS_QUESTION_ORDER_QID_IDX ON RS_QUESTION_ORDER (QUESTION_ID, SURVEY_ID);
+CREATE INDEX IF NOT EXISTS RS_RESPONSE_CHOICE_QID_IDX ON RS_RESPONSE_CHOICE (QUESTION_ID, ANSWER_ORDER);
+CREATE INDEX IF NOT EXISTS RS_SURVEY_RESPONSE_RESP_IDX ON RS_SURVEY_RESPONSE (RESPONDENT_ID, SURVEY_ID, DATE_TAKEN);
+CREATE INDEX IF NOT EXISTS RS_RESPONSE_ADMIN_IDX ON RS_RESPONSE (SURVEY_RESPONSE_ID, QUESTION_ID);
+CREATE INDEX IF NOT EXISTS RS_RESPONSE_RESP_IDX ON RS_RESPONSE (RESPONDENT_ID, QUESTION_ID);
+
+INSERT OR IGNORE INTO RS_RESPONDENT_TYPE_XREF (ID, NAME) VALUES (1, 'Student');
+INSERT OR IGNORE INTO RS_RESPONDENT_TYPE_XREF (ID, NAME) VALUES (2, 'Parent');
+INSERT OR IGNORE INTO RS_RESPONDENT_TYPE_XREF (ID, NAME) VALUES (3, 'Mentor');
+
+INSERT OR IGNORE INTO RS_QUESTION_TYPE_XREF (QUESTION_TYPE_ID, NAME) VALUES (1, 'short_string');
+INSERT OR IGNORE INTO RS_QUESTION_TYPE_XREF (QUESTION_TYPE_ID, NAME) VALUES (2, 'long_string');
+INSERT OR IGNORE INTO RS_QUESTION_TYPE_XREF (QUESTION_TYPE_ID, NAME) VALUES (3, 'single_choice');
+INSERT OR IGNORE INTO RS_QUESTION_TYPE_XREF (QUESTION_TYPE_ID, NAME) VALUES (4, 'table_single_choice');
+INSERT OR IGNORE INTO RS_QUESTION_TYPE_XREF (QUESTION_TYPE_ID, NAME) VALUES (5, 'table_multiple_choice');
+INSERT OR IGNORE INTO RS_QUESTION_TYPE_XREF (QUESTION_TYPE_ID, NAME) VALUES (6, 'multiple_choice');
+"""
+
+
+class DatabaseUnavailable(Exception):
+    """Raised when the driver for the requested backend is not installed."""
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection became free within the checkout timeout."""
+
+
+class Connection:
+    def __init__(self, raw, backend, args=(), cache_size=STATEMENT_CACHE_SIZE):
+        """
+        Thin wrapper around a driver connection. queryfuncs runs every statement through fetchall(), execute() and
+        executemany() so that the backend can adapt the SQL and the driver calls to its engine. Statements are prepared
+        once per connection: the prepared cursor of each SQL text is kept in a least recently used cache of cache_size
+        cursors and re-executed with the new bind variables.
+        :param raw: the cx_Oracle or sqlite3 connection object
+        :param backend: the backend object that opened the connection
+        :param args: the (name, pw, domain) the connection was opened with, used by clone()
+        :param cache_size: number of prepared statements kept open
+        """
+        self.raw = raw
+        self.backend = backend
+        self.args = args
+        self.pool = None
+        self.cache_size = cache_size
+        self.statements = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def clone(self):
+        """
+        Opens a new connection (a separate database session) with the same credentials, e.g. for a background thread.
+        Pooled connections check out another connection from their pool instead.
+        :return: a new Connection
+        """
+        if self.pool is not None:
+            return self.pool.acquire()
+        return self.backend.connect(*self.args)
+
+    def cursor(self):
+        return self.raw.cursor()
+
+    def statement(self, query):
+        """
+        Returns the prepared cursor for the SQL text, preparing it on the first use and evicting the least recently
+        used statement when the cache is full.
+        :param query: SQL text as written in queryfuncs
+        :return: (cursor, statement) to pass to the backend's execute()/executemany()
+        """
+        entry = self.statements.get(query)
+        if entry is not None:
+            self.hits += 1
+            self.statements.move_to_end(query)
+            return entry
+        self.misses += 1
+        cursor = self.raw.cursor()
+        cursor.arraysize = ARRAYSIZE
+        entry = self.statements[query] = (cursor, self.backend.prepare(cursor, query))
+        if len(self.statements) > self.cache_size:
+            evicted, _ = self.statements.popitem(last=False)[1]
+            evicted.close()
+            self.evictions += 1
+        return entry
+
+    def statement_stats(self):
+        """
+        Hit/miss counters of the statement cache.
+        :return: dict
+        """
+        return {'size': len(self.statements), 'capacity': self.cache_size, 'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions}
+
+    def clear_statements(self):
+        for cursor, _ in self.statements.values():
+            cursor.close()
+        self.statements.clear()
+
+    def fetchall(self, query, params=None):
+        """
+        Runs a query and returns every row of the result set.
+        :param query: SQL text as written in queryfuncs
+        :param params: dict of named bind variables
+        :return: a list of tuples
+        """
+        cursor, statement = self.statement(query)
+        self.backend.execute(cursor, statement, params)
+        return cursor.fetchall()
+
+    def stream(self, query, params=None, size=ARRAYSIZE):
+        """
+        Runs a query and yields its result set in chunks of at most size rows, so large result sets are never held in
+        memory at once. Uses a cursor of its own (not the statement cache) which stays open until the generator is
+        exhausted or closed.
+        :param query: SQL text as written in queryfuncs
+        :param params: dict of named bind variables
+        :param size: rows fetched per round trip
+        :return: generator of lists of tuples
+        """
+        cursor = self.raw.cursor()
+        cursor.arraysize = size
+        try:
+            self.backend.execute(cursor, self.backend.prepare(cursor, query), params)
+            while True:
+                rows = cursor.fetchmany(size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+
+    def execute(self, query, params=None):
+        """
+        Runs a single DML statement. Nothing is committed.
+        :param query: SQL text as written in queryfuncs
+        :param params: dict of named bind variables
+        :return: the number of rows affected
+        """
+        cursor, statement = self.statement(query)
+        self.backend.execute(cursor, statement, params)
+        return cursor.rowcount
+
+    def insert(self, query, params=None):
+        """
+        Runs an INSERT that takes its ID from a sequence and returns it (INSERT ... VALUES (seq.nextval, ...) RETURNING
+        id INTO :new_id), so the new ID comes back in the same round trip. Nothing is committed.
+        :param query: SQL text as written in queryfuncs
+        :param params: dict of named bind variables, without new_id
+        :return: the ID of the new row
+        """
+        cursor, statement = self.statement(query)
+        return self.backend.insert(cursor, statement, params)
+
+    def reserve_ids(self, sequence, table, count):
+        """
+        Reserves count new IDs for rows inserted with explicit IDs in array-bound batches, where RETURNING cannot be
+        used. The IDs come from the table's sequence in one round trip.
+        :param sequence: name of the sequence the table's IDs come from
+        :param table: name of the table
+        :param count: number of IDs to reserve
+        :return: list of IDs
+        """
+        if count <= 0:
+            return []
+        return self.backend.reserve_ids(self, sequence, table, count)
+
+    def executemany(self, query, rows):
+        """
+        Runs a DML statement once for each row with array binding. Nothing is committed.
+        :param query: SQL text as written in queryfuncs
+        :param rows: list of bind variable lists/dicts
+        :return: None
+        """
+        cursor, statement = self.statement(query)
+        self.backend.executemany(cursor, statement, rows)
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def close(self):
+        """
+        Closes the connection, or gives it back to its pool if it was checked out of one.
+        """
+        if self.pool is not None:
+            self.pool.release(self)
+        else:
+            self.clear_statements()
+            self.raw.close()
+
+
+class ConnectionPool:
+    def __init__(self, backend, name, pw, domain, min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE, timeout=POOL_TIMEOUT):
+        """
+        Pool of open connections shared by the windows and the background worker of a session. Connections are checked
+        out with acquire() and given back with release() (or Connection.close()). min_size connections are opened up
+        front, more are opened on demand up to max_size, after which acquire() waits up to timeout seconds for one to be
+        released. Checkout statistics are kept for sizing the pool, see stats().
+        :param backend: the backend opening the connections
+        :param name, pw, domain: the credentials the connections are opened with
+        :param min_size: number of connections opened when the pool is created
+        :param max_size: maximum number of connections open at once
+        :param timeout: seconds acquire() waits for a free connection before raising PoolTimeout
+        """
+        self.backend = backend
+        self.args = (name, pw, domain)
+        self.min_size = min_size
+        self.max_size = max(max_size, min_size, 1)
+        self.timeout = timeout
+        self.closed = False
+        self.lock = threading.Lock()
+        self.checked_out = set()
+        self.acquires = 0
+        self.releases = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+        self.peak_in_use = 0
+        self.idle = queue.LifoQueue()
+        self.opened = 0
+        for _ in range(min_size):
+            self.opened += 1
+            self.idle.put(self._open())
+
+    def _open(self):
+        """
+        Opens a new connection, the caller has already counted it in self.opened.
+        """
+        try:
+            return self.backend.connect(*self.args)
+        except Exception:
+            with self.lock:
+                self.opened -= 1
+            raise
+
+    def _take(self, timeout):
+        """
+        Returns an idle connection, opens a new one if the pool is not full, otherwise waits for one to be released.
+        :return: (Connection, True if the caller had to wait)
+        """
+        try:
+            return self.idle.get_nowait(), False
+        except queue.Empty:
+            pass
+        with self.lock:
+            grow = self.opened < self.max_size
+            if grow:
+                self.opened += 1
+        if grow:
+            return self._open(), False
+        try:
+            return self.idle.get(timeout=timeout), True
+        except queue.Empty:
+            raise PoolTimeout('No connection was released within {} seconds'.format(timeout)) from None
+
+    def _give(self, con):
+        try:
+            if self.closed:
+                con.raw.close()
+            else:
+                con.raw.rollback()  # a connection goes back to the pool without uncommitted work
+                self.idle.put(con)
+                return
+        except self.backend.DatabaseError:
+            pass
+        with self.lock:
+            self.opened -= 1
+
+    def acquire(self, timeout=None):
+        """
+        Checks a connection out of the pool.
+        :param timeout: seconds to wait for a free connection, the pool's timeout if not given
+        :return: a Connection, give it back with release() or its close()
+        """
+        if timeout is None:
+            timeout = self.timeout
+        start = time.perf_counter()
+        try:
+            con, waited = self._take(timeout)
+        except PoolTimeout:
+            with self.lock:
+                self.waits += 1
+                self.timeouts += 1
+            raise
+        wait = time.perf_counter() - start
+        con.pool = self
+        with self.lock:
+            self.checked_out.add(con)
+            self.acquires += 1
+            self.waits += waited
+            self.wait_time += wait
+            self.max_wait = max(self.max_wait, wait)
+            self.peak_in_use = max(self.peak_in_use, len(self.checked_out))
+        return con
+
+    def release(self, con):
+        """
+        Gives a checked out connection back to the pool. Releasing a connection twice does nothing.
+        :return: None
+        """
+        with self.lock:
+            if con not in self.checked_out:
+                return
+            self.checked_out.remove(con)
+            self.releases += 1
+        self._give(con)
+
+    def stats(self):
+        """
+        Checkout statistics of the pool, e.g. a high peak_in_use or any timeouts mean max_size should be raised.
+        :return: dict
+        """
+        with self.lock:
+            return {
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'opened': self.opened,
+                'in_use': len(self.checked_out),
+                'peak_in_use': self.peak_in_use,
+                'acquires': self.acquires,
+                'releases': self.releases,
+                'waits': self.waits,
+                'timeouts': self.timeouts,
+                'avg_wait_ms': 1000 * self.wait_time / self.acquires if self.acquires else 0.0,
+                'max_wait_ms': 1000 * self.max_wait
+            }
+
+    def close(self):
+        """
+        Closes the idle connections, connections still checked out are closed when they are released.
+        :return: None
+        """
+        self.closed = True
+        self.max_size = 0
+        while True:
+            try:
+                con = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            con.raw.close()
+            with self.lock:
+                self.opened -= 1
+
+
+class OracleSessionPool(ConnectionPool):
+    def __init__(self, backend, name, pw, domain, min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE, timeout=POOL_TIMEOUT):
+        """
+        ConnectionPool backed by a cx_Oracle SessionPool, which keeps the sessions open on the server side and blocks
+        for up to timeout seconds when all max_size sessions are busy. cx_Oracle returns a new connection object on
+        every acquire, so the Connection wrapper and its cache of prepared cursors only last for one checkout and are
+        closed on release; what is kept across checkouts is each session's own statement cache (stmtcachesize). The
+        wrappers' cache hits and misses are added up in stats().
+        """
+        self.session_pool = cx_Oracle.SessionPool(user=name, password=pw, dsn=domain, min=min_size,
+                                                  max=max(max_size, min_size, 1), increment=1, threaded=True,
+                                                  getmode=cx_Oracle.SPOOL_ATTRVAL_TIMEDWAIT,
+                                                  wait_timeout=int(timeout * 1000))
+        ConnectionPool.__init__(self, backend, name, pw, domain, 0, max_size, timeout)
+        self.min_size = min_size
+        self.statement_hits = 0
+        self.statement_misses = 0
+
+    def _take(self, timeout):
+        busy = self.session_pool.busy >= self.session_pool.max
+        try:
+            raw = self.session_pool.acquire()
+        except cx_Oracle.DatabaseError as e:
+            error, = e.args
+            if getattr(error, 'code', None) == 24457:  # ORA-24457: no session available within wait_timeout
+                raise PoolTimeout('No session was released within {} seconds'.format(timeout)) from None
+            raise
+        if self.backend.schema:
+            raw.current_schema = self.backend.schema
+        raw.stmtcachesize = STATEMENT_CACHE_SIZE
+        return Connection(raw, self.backend, self.args), busy
+
+    def _give(self, con):
+        with self.lock:
+            self.statement_hits += con.hits
+            self.statement_misses += con.misses
+        try:
+            con.clear_statements()
+        except cx_Oracle.Error:
+            pass  # the session is gone, its cursors with it
+        if not self.closed:
+            self.session_pool.release(con.raw)
+
+    def stats(self):
+        stats = ConnectionPool.stats(self)
+        stats['opened'] = self.session_pool.opened
+        with self.lock:
+            stats['statement_hits'] = self.statement_hits
+            stats['statement_misses'] = self.statement_misses
+        return stats
+
+    def close(self):
+        self.closed = True
+        self.session_pool.close(force=True)
+
+
+class OracleBackend:
+    name = 'oracle'
+
+    def __init__(self, schema=ORACLE_SCHEMA):
+        """
+        The production backend. Connects with cx_Oracle and points the session at the schema that owns the rs_ tables,
+        so the queries do not need to be qualified with the schema name.
+        :param schema: the schema that owns the survey tables
+        """
+        self.schema = schema
+        if cx_Oracle:
+            self.DatabaseError = cx_Oracle.DatabaseError
+        else:
+            self.DatabaseError = DatabaseUnavailable
+
+    def connect(self, name, pw, domain):
+        if not cx_Oracle:
+            raise DatabaseUnavailable('cx_Oracle is not installed')
+        raw = cx_Oracle.connect('{}/{}@{}'.format(name, pw, domain), threaded=True)
+        if self.schema:
+            raw.current_schema = self.schema
+        raw.stmtcachesize = STATEMENT_CACHE_SIZE  # OCI's own cache, for statements evicted from Connection's
+        return Connection(raw, self, (name, pw, domain))
+
+    def create_pool(self, name, pw, domain, **sizes):
+        if not cx_Oracle:
+            raise DatabaseUnavailable('cx_Oracle is not installed')
+        return OracleSessionPool(self, name, pw, domain, **sizes)
+
+    def is_credentials_error(self, e):
+        error, = e.args
+        return getattr(error, 'code', None) == 1017
+
+    def is_unique_violation(self, e):
+        error, = e.args
+        return getattr(error, 'code', None) == 1  # ORA-00001: unique constraint violated
+
+    def is_connection_error(self, e):
+        if isinstance(e, (DatabaseUnavailable, PoolTimeout)):
+            return True
+        if cx_Oracle is None or not isinstance(e, cx_Oracle.Error) or not e.args:
+            return False
+        error = e.args[0]
+        return (getattr(error, 'code', None) in ORACLE_CONNECTION_ERRORS
+                or str(error).startswith(ORACLE_CONNECTION_MESSAGES))
+
+    def prepare(self, cursor, query):
+        cursor.prepare(query)
+        return None  # execute(None) runs the statement prepared on the cursor
+
+    def execute(self, cursor, statement, params=None):
+        cursor.execute(statement, params or {})
+
+    def insert(self, cursor, statement, params=None):
+        new_id = cursor.var(int)
+        params = dict(params or {}, new_id=new_id)
+        cursor.execute(statement, params)
+        value = new_id.getvalue()
+        return value[0] if isinstance(value, list) else value  # DML returning gives a list per row
+
+    def reserve_ids(self, con, sequence, table, count):
+        query = 'select {}.nextval from dual connect by level <= :count'.format(sequence)
+        return [row[0] for row in con.fetchall(query, {'count': count})]
+
+    def executemany(self, cursor, statement, rows):
+        cursor.executemany(statement, rows)
+
+
+class SQLiteBackend:
+    name = 'sqlite'
+    DatabaseError = sqlite3.Error
+
+    def __init__(self):
+        """
+        Local backend backed by a SQLite file with the same tables as the Oracle schema. The file is put in WAL mode and
+        the schema and indexes are created on first connect. Oracle's to_date(), to_timestamp() and ora_hash() are
+        registered as SQL functions, and numbered binds (:1) and sequence inserts (seq.nextval, RETURNING ... INTO) are rewritten, so the
+        queryfuncs SQL runs unchanged.
+        """
+        self._translated = {}
+
+    @staticmethod
+    def path_from(conn_string):
+        """
+        Takes a connection string like sqlite:///C:/data/surveys.db, sqlite:surveys.db or surveys.db and returns the
+        path of the database file.
+        """
+        path = conn_string
+        if path.lower().startswith(SQLITE_PREFIX):
+            path = path[len(SQLITE_PREFIX):]
+            if path.startswith('//'):
+                path = path[2:]
+            if re.match(r'^/[A-Za-z]:', path):
+                path = path[1:]
+        return path
+
+    def connect(self, name, pw, domain):
+        # Connections are opened by the background worker and used on the Tk thread (one thread at a time)
+        raw = sqlite3.connect(self.path_from(domain), detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False,
+                              cached_statements=STATEMENT_CACHE_SIZE)
+        raw.create_function('to_date', 2, _sqlite_to_timestamp, deterministic=True)
+        raw.create_function('to_timestamp', 2, _sqlite_to_timestamp, deterministic=True)
+        raw.create_function('ora_hash', 1, _sqlite_ora_hash, deterministic=True)
+        raw.execute('PRAGMA journal_mode=WAL')
+        raw.execute('PRAGMA synchronous=NORMAL')
+        raw.executescript(SQLITE_SCHEMA)
+        self.migrate(raw)
+        raw.commit()
+        return Connection(raw, self, (name, pw, domain))
+
+    @staticmethod
+    def migrate(raw):
+        """
+        Brings database files created before a column was added to the schema up to date.
+        """
+        columns = [row[1].upper() for row in raw.execute('PRAGMA table_info(RS_RESPONDENT)')]
+        if 'LAST_UPDATED' not in columns:
+            raw.execute('ALTER TABLE RS_RESPONDENT ADD COLUMN LAST_UPDATED TIMESTAMP')
+        raw.execute('CREATE INDEX IF NOT EXISTS RS_RESPONDENT_UPDATED_IDX ON RS_RESPONDENT (LAST_UPDATED)')
+        try:
+            raw.execute(SQLITE_ADMINISTRATION_DDL)
+        except sqlite3.IntegrityError:
+            logger.warning('Duplicate survey administrations found, the unique index on rs_survey_response was not '
+                           'created')
+
+    def create_pool(self, name, pw, domain, **sizes):
+        return ConnectionPool(self, name, pw, domain, **sizes)
+
+    def is_credentials_error(self, e):
+        return False
+
+    def is_unique_violation(self, e):
+        return isinstance(e, sqlite3.IntegrityError) and 'UNIQUE' in str(e).upper()
+
+    def is_connection_error(self, e):
+        if isinstance(e, (DatabaseUnavailable, PoolTimeout)):
+            return True
+        return isinstance(e, sqlite3.OperationalError) and str(e).lower().startswith(SQLITE_CONNECTION_MESSAGES)
+
+    def translate(self, query):
+        """
+        Rewrites Oracle numbered binds (:1, :2, ...) to SQLite's ?1, ?2, ... and sequence inserts to INTEGER PRIMARY KEY
+        ones: seq.nextval becomes NULL, which makes SQLite assign the next rowid, and RETURNING id INTO :var becomes
+        RETURNING id (dropped on SQLite < 3.35, insert() then reads cursor.lastrowid). The result is cached per query text.
+        """
+        translated = self._translated.get(query)
+        if translated is None:
+            translated = re.sub(r'(?<![\w\'])\:(\d+)', r'?\1', query)
+            translated = re.sub(r'\b\w+\.nextval\b', 'NULL', translated, flags=re.IGNORECASE)
+            if sqlite3.sqlite_version_info >= (3, 35, 0):
+                translated = re.sub(r'\bRETURNING\s+(\w+)\s+INTO\s+:\w+', r'RETURNING \1', translated, flags=re.IGNORECASE)
+            else:
+                translated = re.sub(r'\bRETURNING\s+\w+\s+INTO\s+:\w+', '', translated, flags=re.IGNORECASE)
+            self._translated[query] = translated
+        return translated
+
+    def prepare(self, cursor, query):
+        """
+        sqlite3 compiles statements in its own cache keyed by the SQL text, so preparing only means translating.
+        """
+        return self.translate(query)
+
+    def execute(self, cursor, statement, params=None):
+        cursor.execute(statement, params or {})
+
+    def insert(self, cursor, statement, params=None):
+        cursor.execute(statement, params or {})
+        if cursor.description:
+            return cursor.fetchone()[0]
+        return cursor.lastrowid
+
+    def reserve_ids(self, con, sequence, table, count):
+        """
+        SQLite has no sequences, the IDs after the current max(id) are reserved by taking the write lock first, so no
+        other connection can insert until the transaction ends.
+        """
+        if not con.raw.in_transaction:
+            con.raw.execute('BEGIN IMMEDIATE')
+        start = con.fetchall('select coalesce(max(id), 0) from {}'.format(table))[0][0] + 1
+        return list(range(start, start + count))
+
+    def executemany(self, cursor, statement, rows):
+        cursor.executemany(statement, rows)
+
+
+def get_backend(conn_string):
+    '''
+    Picks the backend for the connection string entered at login.
+    :param conn_string: string, the Oracle domain or a SQLite connection string/file path
+    :return: a backend object
+    '''
+    lowered = conn_string.strip().lower()
+    if lowered.startswith(SQLITE_PREFIX) or lowered.endswith(SQLITE_EXTENSIONS):
+        return SQLiteBackend()
+    return OracleBackend()
+
+
+def _sqlite_to_timestamp(value, fmt):
+    """
+    SQLite implementation of Oracle's to_date()/to_timestamp(). Stores the value as YYYY-MM-DD HH:MM:SS text, which the
+    TIMESTAMP converter below turns back into a datetime.
+    """
+    if value is None:
+        return None
+    py_fmt = re.sub('|'.join(sorted(ORACLE_DATE_FORMATS, key=len, reverse=True)),
+                    lambda m: ORACLE_DATE_FORMATS[m.group(0)], fmt.upper())
+    return datetime.datetime.strptime(value, py_fmt).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _sqlite_ora_hash(value):
+    """
+    SQLite implementation of Oracle's ora_hash() with the default bucket range (0 to 2^32 - 1). The hash values differ
+    from Oracle's, they are only compared with other values from the same database.
+    """
+    if value is None:
+        return None
+    return zlib.crc32(str(value).encode())
+
+
+def _convert_timestamp(value):
+    value = value.decode()
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%d'):
+        try:
+            return datetime.datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return value
+
+
+sqlite3.register_converter('TIMESTAMP', _convert_timestamp)
+# Stored the same way as CURRENT_TIMESTAMP and to_timestamp() values, so bound datetimes compare correctly
+sqlite3.register_adapter(datetime.datetime, lambda value: value.isoformat(' '))
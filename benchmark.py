@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+
+"""
+Benchmarks of the data-entry hot paths, run against a local SQLite database seeded by synthetic_data.py at a chosen
+scale (the number of rs_response rows). Results are written as JSON so that two
+versions can be compared with --compare.
+
+The SurveyEntry benchmarks (form build, answer prefill, answer collection) need a display; without one they are
+listed as skipped and the database benchmarks still run. The administrations added by the submit benchmark are deleted
+again afterwards.
+
+usage: python benchmark.py [--scale 1k|100k|1m] [--database FILE] [--repeat N] [-o FILE] [--compare FILE]
+"""
+
+import os
+import sys
+import json
+import random
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from time import perf_counter, strftime
+import tkinter as tk
+import queryfuncs as qf
+import synthetic_data
+
+SCALES = {'1k': 1000, '100k': 100000, '1m': 1000000}  # rs_response rows
+REPEAT = 5
+SEARCH_TERMS = 20  # searches per run of the search benchmarks
+SEED = 20180101
+
+SURVEY_ID = 1  # the student pre survey of synthetic_data
+
+
+def measure(func, repeat, setup=None):
+    """
+    Runs func repeat times and summarizes the run times.
+    :param func: the code measured, called with the result of setup() if given
+    :param setup: called before each run, outside of the timing
+    :return: dict of runs and min, median, mean and max run time in seconds
+    """
+    times = []
+    for _ in range(repeat):
+        args = setup() if setup else ()
+        start = perf_counter()
+        func(*args)
+        times.append(perf_counter() - start)
+    return {'runs': repeat, 'min': min(times), 'median': statistics.median(times), 'mean': statistics.mean(times),
+            'max': max(times)}
+
+
+def version():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_database_benchmarks(con, repeat, rng, results):
+    names = [row[1] for row in con.fetchall('select id, name from rs_respondent')]
+    terms = [rng.choice(names).split()[rng.randint(0, 1)].lower()[:rng.randint(2, 6)] for _ in range(SEARCH_TERMS)]
+
+    results['build_respondent_index'] = measure(lambda: qf.build_respondent_index(con), repeat)
+    results['search_for_names'] = measure(lambda: [qf.search_for_names(con, term) for term in terms], repeat)
+    results['search_sql'] = measure(lambda: [con.fetchall(qf.GET_RESPONDENTS_QUERY, {'part': term}) for term in terms],
+                                    repeat)
+
+    results['get_survey_definition_cold'] = measure(lambda: qf.get_survey_definition(con, SURVEY_ID), repeat,
+                                                    setup=lambda: qf.clear_survey_definitions() or ())
+    with tempfile.TemporaryDirectory() as cache_dir:
+        path = qf.metadata_cache.cache_path(con.args[2], cache_dir)
+        results['load_survey_metadata_cold'] = measure(
+            lambda: qf.load_survey_metadata(con, con.args[2], cache_dir), repeat,
+            setup=lambda: qf.clear_survey_definitions() or (os.path.exists(path) and os.remove(path)) or ())
+        results['load_survey_metadata_cached'] = measure(
+            lambda: qf.load_survey_metadata(con, con.args[2], cache_dir), repeat,
+            setup=lambda: qf.clear_survey_definitions() or ())
+
+    admin_id, respondent = con.fetchall('select id, respondent_id from rs_survey_response where survey_id = :1',
+                                        [SURVEY_ID])[0]
+    answers = [(quid, answer) for quid, answer, _ in qf.get_given_answers(con, admin_id)]
+    dates = ('{:02d}/{:02d}/{}'.format(day % 12 + 1, day % 28 + 1, 2100 + day) for day in range(10 ** 6))
+    submitted = []
+    results['submit_survey'] = measure(
+        lambda: submitted.append(qf.submit_survey(con, SURVEY_ID, respondent, answers, next(dates)).admin_id), repeat)
+    # the submitted administrations are removed again so that every run starts from the same data
+    con.executemany('DELETE FROM RS_RESPONSE WHERE SURVEY_RESPONSE_ID = :1', [[admin] for admin in submitted])
+    con.executemany('DELETE FROM RS_SURVEY_RESPONSE WHERE ID = :1', [[admin] for admin in submitted])
+    con.commit()
+
+    qf._duplicate_finders.clear()
+    results['duplicate_finder_build'] = measure(lambda: qf.get_duplicate_finder(con, 1), repeat,
+                                                setup=lambda: qf._duplicate_finders.clear() or ())
+    finder = qf.get_duplicate_finder(con, 1)
+    typos = [name[:-1] + 'x' for name in rng.sample(names, min(SEARCH_TERMS, len(names)))]
+    results['duplicate_check'] = measure(lambda: [(finder.exists(name), finder.find(name)) for name in typos], repeat)
+    return admin_id, respondent
+
+
+def run_form_benchmarks(con, repeat, admin_id, respondent, results, skipped):
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        for name in ('populate', 'input_answers', 'collect_answers'):
+            skipped[name] = 'no display: {}'.format(e)
+        return
+    root.withdraw()
+    from enter_survey import SurveyEntry
+
+    def build_form():
+        top = tk.Toplevel(root)
+        top.withdraw()
+        form = SurveyEntry(top, con, SURVEY_ID, respondent)
+        while not hasattr(form, 'submitbutton'):  # the rest of the form is built while Tk is idle
+            root.update()
+        return form
+
+    forms = []
+    results['populate'] = measure(lambda: forms.append(build_form()), repeat)
+    for form in forms:
+        form.master.destroy()
+
+    form = build_form()
+    old_answers = qf.get_given_answers(con, admin_id)
+    results['input_answers'] = measure(form.input_answers, repeat, setup=lambda: form.reset() or (old_answers,))
+    results['collect_answers'] = measure(form.collect_answers, repeat)
+    root.destroy()
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print('{:<28} {:>12} {:>12} {:>8}'.format('benchmark', 'baseline ms', 'current ms', 'change'))
+    for name, result in results['results'].items():
+        old = baseline.get('results', {}).get(name)
+        if old is None:
+            continue
+        change = (result['median'] - old['median']) / old['median'] * 100 if old['median'] else 0
+        print('{:<28} {:>12.2f} {:>12.2f} {:>+7.1f}%'.format(name, old['median'] * 1000, result['median'] * 1000,
+                                                             change))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the data-entry hot paths.')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='1k', help='rs_response rows in the seeded database')
+    parser.add_argument('--database', help='SQLite file, seeded if it has no surveys (default benchmark_SCALE.db)')
+    parser.add_argument('--repeat', type=int, default=REPEAT, help='runs of each benchmark')
+    parser.add_argument('-o', '--output', help='JSON file the results are written to (default benchmark_SCALE.json)')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare against')
+    args = parser.parse_args(argv)
+
+    database = args.database or 'benchmark_{}.db'.format(args.scale)
+    con = qf.connect('', '', database)
+    if con in (-1, -2):
+        return 2
+    rng = random.Random(SEED)
+    if not con.fetchall('select count(*) from rs_survey')[0][0]:
+        synthetic_data.generate(con, SCALES[args.scale], seed=SEED)
+
+    results = {}
+    skipped = {}
+    admin_id, respondent = run_database_benchmarks(con, args.repeat, rng, results)
+    run_form_benchmarks(con, args.repeat, admin_id, respondent, results, skipped)
+    con.close()
+
+    report = {
+        'version': version(),
+        'timestamp': strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'scale': args.scale,
+        'database': database,
+        'repeat': args.repeat,
+        'results': results,
+        'skipped': skipped
+    }
+    output = args.output or 'benchmark_{}.json'.format(args.scale)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    for name, result in results.items():
+        print('{:<28} median {:>9.2f} ms  min {:>9.2f} ms'.format(name, result['median'] * 1000, result['min'] * 1000))
+    for name, reason in skipped.items():
+        print('{:<28} skipped ({})'.format(name, reason))
+    print('Results written to {}'.format(output))
+    if args.compare:
+        compare(report, args.compare)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
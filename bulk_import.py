@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+
+"""
+Command line loader for surveys keyed or scanned outside of the app. Reads CSV or JSON files of responses, checks every
+administration against the survey definitions and the same entry rules as the SurveyEntry window (see survey_rules.py),
+and loads the valid ones with array-bound batches.
+
+CSV files have a header with the columns respondent_id, survey_id, q_order and answer, one row per answer (a multiple
+choice question has a row per checked answer). An optional sheet column tells apart several administrations of the same
+survey for the same respondent in one file. JSON files hold a list of the same flat records, or of administrations:
+{"respondent_id": 12, "survey_id": 4, "sheet": "box3-17", "answers": {"1": "Yes", "5": ["A", "C"]}}
+
+The date taken is read from the survey's date question, like in the entry window.
+
+usage: python bulk_import.py -u USER -d DOMAIN [-p PASSWORD] [--batch-size N] [--dry-run] FILE [FILE ...]
+"""
+
+import csv
+import sys
+import json
+import time
+import getpass
+import argparse
+import queryfuncs as qf
+import survey_rules
+
+BATCH_SIZE = 500  # administrations per executemany batch and commit
+CSV_COLUMNS = ('respondent_id', 'survey_id', 'q_order', 'answer')
+
+
+class Administration:
+    def __init__(self, source, respondent_id, survey_id, sheet=''):
+        """
+        One survey administration read from a file, before validation.
+        :param source: file name and line/record number, used in the error report
+        """
+        self.source = source
+        self.respondent_id = int(respondent_id)
+        self.survey_id = int(survey_id)
+        self.sheet = sheet
+        self.answers = {}
+
+    def add(self, q_order, answer):
+        self.answers.setdefault(int(q_order), []).append(answer)
+
+
+def read_csv(path):
+    """
+    Groups the rows of a CSV file into administrations by respondent, survey and sheet.
+    :return: list of Administration objects
+    """
+    administrations = {}
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        missing = [column for column in CSV_COLUMNS if column not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError('{}: missing column(s) {}'.format(path, ', '.join(missing)))
+        for line, row in enumerate(reader, 2):
+            key = (row['respondent_id'], row['survey_id'], row.get('sheet') or '')
+            admin = administrations.get(key)
+            if admin is None:
+                admin = administrations[key] = Administration('{}:{}'.format(path, line), *key)
+            admin.add(row['q_order'], row['answer'])
+    return list(administrations.values())
+
+
+def read_json(path):
+    """
+    Reads a JSON list of administrations or of flat answer records.
+    :return: list of Administration objects
+    """
+    with open(path, encoding='utf-8') as f:
+        records = json.load(f)
+    administrations = {}
+    for number, record in enumerate(records, 1):
+        key = (record['respondent_id'], record['survey_id'], record.get('sheet') or '')
+        admin = administrations.get(key)
+        if admin is None:
+            admin = administrations[key] = Administration('{}#{}'.format(path, number), *key)
+        if 'answers' in record:
+            for q_order, answers in record['answers'].items():
+                for answer in ([answers] if isinstance(answers, str) else answers):
+                    admin.add(q_order, answer)
+        else:
+            admin.add(record['q_order'], record['answer'])
+    return list(administrations.values())
+
+
+def read_file(path):
+    if path.lower().endswith('.json'):
+        return read_json(path)
+    return read_csv(path)
+
+
+class Loader:
+    def __init__(self, con, batch_size=BATCH_SIZE, dry_run=False):
+        """
+        Validates administrations and loads the valid ones in batches. The survey definitions, respondents, available
+        surveys and entered administrations are each fetched once, so validation itself makes no database calls.
+        :param con: backends.Connection object
+        :param batch_size: administrations per batch
+        :param dry_run: only validate, nothing is written
+        """
+        self.con = con
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.respondent_types = qf.get_respondent_types(con)
+        self.available = qf.get_available_survey_pairs(con)
+        self.entered = qf.get_administration_keys(con)
+        self.batch = []
+        self.errors = []
+        self.loaded = 0
+        self.rows = 0
+
+    def validate(self, admin):
+        """
+        :return: (survey_id, respondent_id, date_taken, answers) ready for qf.bulk_insert_surveys()
+        """
+        type_id = self.respondent_types.get(admin.respondent_id)
+        if type_id is None:
+            raise survey_rules.ValidationError('Unknown Respondent', 'No respondent with id {}'.format(admin.respondent_id))
+        if (type_id, admin.survey_id) not in self.available:
+            raise survey_rules.ValidationError('Unavailable Survey', 'Survey {} is not available to respondent {}'.format(
+                admin.survey_id, admin.respondent_id))
+        definition = qf.get_survey_definition(self.con, admin.survey_id)
+        if not definition.questions:
+            raise survey_rules.ValidationError('Unknown Survey', 'No survey with id {}'.format(admin.survey_id))
+        answers, date = survey_rules.validate_administration(definition, admin.answers)
+        key = qf.administration_key(admin.survey_id, admin.respondent_id, date)
+        if key in self.entered:
+            raise survey_rules.ValidationError('Invalid Entry', 'Survey {} has already been entered for respondent {} on {}'.format(
+                admin.survey_id, admin.respondent_id, date))
+        self.entered.add(key)  # also catches duplicates within the files
+        return admin.survey_id, admin.respondent_id, date, answers
+
+    def add(self, admin):
+        try:
+            self.batch.append(self.validate(admin))
+        except survey_rules.ValidationError as e:
+            self.errors.append((admin.source, e.title, e.message))
+            return
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        batch, self.batch = self.batch, []
+        if not batch:
+            return
+        if self.dry_run:
+            self.loaded += len(batch)
+            self.rows += sum(len(answers) for _, _, _, answers in batch)
+            return
+        if self.insert(batch) < 0 and len(batch) > 1:
+            # a single failing administration rolls back the whole batch, so it is loaded again one administration at
+            # a time to report only the ones that fail
+            for administration in batch:
+                self.insert([administration])
+
+    def insert(self, batch):
+        """
+        Loads a batch with qf.bulk_insert_surveys(). The administrations of a failed batch are reported only if it holds
+        a single one.
+        :return: the qf.bulk_insert_surveys() result
+        """
+        result = qf.bulk_insert_surveys(self.con, batch)
+        if result >= 0:
+            self.loaded += len(batch)
+            self.rows += result
+        elif len(batch) == 1:
+            survey_id, respondent_id, date, _ = batch[0]
+            if result == -2:
+                # entered by someone else since the entered administrations were fetched
+                self.errors.append(('batch', 'Invalid Entry', 'Survey {} has already been entered for respondent {} on {}'.format(
+                    survey_id, respondent_id, date)))
+            else:
+                self.entered.discard(qf.administration_key(survey_id, respondent_id, date))
+                self.errors.append(('batch', 'Database Error', 'Survey {} for respondent {} on {} was not loaded'.format(
+                    survey_id, respondent_id, date)))
+        return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Bulk load survey responses from CSV/JSON files.')
+    parser.add_argument('files', nargs='+', help='CSV or JSON files of responses')
+    parser.add_argument('-u', '--user', default='', help='database username')
+    parser.add_argument('-p', '--password', help='database password, prompted for if not given')
+    parser.add_argument('-d', '--domain', required=True, help='Oracle domain or SQLite connection string')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='administrations per batch')
+    parser.add_argument('--dry-run', action='store_true', help='only validate the files')
+    args = parser.parse_args(argv)
+
+    password = args.password
+    if password is None:
+        password = getpass.getpass() if args.user else ''
+    con = qf.connect(args.user, password, args.domain)
+    if con in (-1, -2):
+        return 2
+
+    start = time.perf_counter()
+    loader = Loader(con, args.batch_size, args.dry_run)
+    read = 0
+    for path in args.files:
+        try:
+            administrations = read_file(path)
+        except (OSError, ValueError, KeyError) as e:
+            loader.errors.append((path, 'Unreadable File', str(e)))
+            continue
+        read += len(administrations)
+        for admin in administrations:
+            loader.add(admin)
+    loader.flush()
+    elapsed = time.perf_counter() - start
+    con.close()
+
+    for source, title, message in loader.errors:
+        print('{}: {}: {}'.format(source, title, message.replace('\n', ' ')))
+    print('{} administrations read, {} {}, {} rejected'.format(read, loader.loaded,
+                                                                 'valid' if args.dry_run else 'loaded', len(loader.errors)))
+    print('{} response rows in {:.2f} s ({:.0f} rows/s)'.format(loader.rows, elapsed,
+                                                                 loader.rows / elapsed if elapsed else 0))
+    return 1 if loader.errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+
+"""
+Background database worker. Runs queryfuncs calls on a thread of its own so that a slow round trip to the database
+never blocks the Tk mainloop, and hands the results back to the Tk thread, which is the only thread allowed to touch
+widgets.
+"""
+
+import queue
+import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
+
+POLL_INTERVAL = 25  # ms between checks for finished work while something is pending
+
+
+class DBWorker:
+    def __init__(self, root, interval=POLL_INTERVAL):
+        """
+        Single background thread that owns its own database connection (self.con). Work is queued with submit() or
+        run(), executed in order on the worker thread, and the results are delivered to the callbacks on the Tk thread
+        through root.after(). Work submitted with a key supersedes any earlier work with the same key: if the older work
+        has not started it is skipped, and if it has its result is dropped, so e.g. only the latest search fills the
+        results table.
+        :param root: any TK widget, used to schedule the delivery of results on the Tk thread
+        :param interval: milliseconds between checks for finished work
+        """
+        self.root = root
+        self.interval = interval
+        self.con = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db-worker')
+        self.results = queue.Queue()
+        self.generations = {}
+        self.pending = 0
+        self.polling = False
+        self.busy_listeners = []
+        self.closed = False
+
+    def submit(self, func, *args, callback=None, errback=None, key=None):
+        """
+        Queues func(con, *args) to run on the worker thread with the worker's connection, for the queryfuncs functions.
+        :param func: function taking a connection as first argument
+        :param args: the other arguments of func
+        :param callback: function called on the Tk thread with the return value of func
+        :param errback: function called on the Tk thread with the exception if func raises, the exception is reported
+        through Tk's report_callback_exception() if not given
+        :param key: hashable, newer work with the same key cancels this one
+        :return: None
+        """
+        self.run(lambda *a: func(self.con, *a), *args, callback=callback, errback=errback, key=key)
+
+    def run(self, func, *args, callback=None, errback=None, key=None):
+        """
+        Queues func(*args) to run on the worker thread, same as submit() but without passing the connection.
+        :return: None
+        """
+        if self.closed:
+            return
+        generation = None
+        if key is not None:
+            generation = self.generations[key] = self.generations.get(key, 0) + 1
+        self.pending += 1
+        if self.pending == 1:
+            self.notify_busy(True)
+        self.executor.submit(self._work, func, args, callback, errback, key, generation)
+        if not self.polling:
+            self.polling = True
+            self.root.after(self.interval, self._poll)
+
+    def cancel(self, key):
+        """
+        Cancels any pending work with the given key.
+        :return: None
+        """
+        if key in self.generations:
+            self.generations[key] += 1
+
+    def superseded(self, key, generation):
+        return key is not None and self.generations.get(key) != generation
+
+    def _work(self, func, args, callback, errback, key, generation):
+        """
+        Runs on the worker thread. Only puts the outcome in the results queue, nothing here may touch Tk.
+        """
+        if self.superseded(key, generation):
+            self.results.put((None, None, key, generation))
+            return
+        try:
+            result = func(*args)
+        except Exception as e:
+            self.results.put((errback or self.report, e, key, generation))
+        else:
+            self.results.put((callback, result, key, generation))
+
+    def _poll(self):
+        """
+        Runs on the Tk thread, delivers the finished work and keeps polling while work is pending.
+        """
+        while True:
+            try:
+                handler, value, key, generation = self.results.get_nowait()
+            except queue.Empty:
+                break
+            self.pending -= 1
+            if self.pending == 0:
+                self.notify_busy(False)
+            if handler and not self.superseded(key, generation):
+                try:
+                    handler(value)
+                except Exception as e:
+                    self.report(e)
+        if self.pending and not self.closed:
+            self.root.after(self.interval, self._poll)
+        else:
+            self.polling = False
+
+    def report(self, e):
+        self.root.report_callback_exception(type(e), e, e.__traceback__)
+
+    def add_busy_listener(self, listener):
+        """
+        Registers a function called on the Tk thread with True when the worker starts working and False when all the
+        queued work is done, used to show a busy indicator.
+        :return: None
+        """
+        self.busy_listeners.append(listener)
+        listener(self.pending > 0)
+
+    def remove_busy_listener(self, listener):
+        if listener in self.busy_listeners:
+            self.busy_listeners.remove(listener)
+
+    def notify_busy(self, busy):
+        for listener in list(self.busy_listeners):
+            listener(busy)
+
+    @property
+    def busy(self):
+        return self.pending > 0
+
+    def close(self):
+        """
+        Closes the worker's connection once the queued work is done and stops the thread. Callbacks of work still queued
+        are not called.
+        :return: None
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self.executor.submit(self._close_connection)
+        self.executor.shutdown(wait=False)
+
+    def reconnect(self):
+        """
+        Runs on the worker thread, queue it with run(). Replaces the worker's connection with a new one from its pool
+        after the database could not be reached; the pool drops the old connection if it is dead.
+        :return: None
+        """
+        if self.con is None or self.con.pool is None:
+            return
+        con = self.con.pool.acquire()
+        old, self.con = self.con, con
+        old.close()
+
+    def _close_connection(self):
+        if self.con is not None:
+            self.con.close()
+            self.con = None
+
+
+class BusyIndicator:
+    def __init__(self, widget, label=None, text='Working...'):
+        """
+        Busy indicator for a window: while the worker is busy the cursor of the widget becomes a watch and the label (if
+        given) shows the text.
+        :param widget: TK widget, usually the window
+        :param label: TK label showing the text while busy
+        :param text: text shown while busy
+        """
+        self.widget = widget
+        self.label = label
+        self.text = text
+        self.cursor = widget.cget('cursor')
+
+    def __call__(self, busy):
+        try:
+            self.widget.config(cursor='watch' if busy else self.cursor)
+            if self.label is not None:
+                self.label.config(text=self.text if busy else '')
+        except tk.TclError:
+            pass  # the window was closed while work was pending
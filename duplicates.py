@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+
+"""
+Fuzzy duplicate detection for new respondents. Used by AddRespondent to find existing respondents whose name is close
+enough to the one being entered that a person should review them before the new respondent is added.
+
+Scores are fuzz.ratio() scores (0-100). All the candidates of an entry are scored in one batch call: with rapidfuzz
+installed its process.cdist() scores them in C, otherwise they are scored one by one with python-Levenshtein's ratio()
+or, if that isn't installed either, with difflib.
+"""
+
+from collections import Counter
+try:
+    from rapidfuzz import fuzz
+    from rapidfuzz.process import cdist
+    import numpy  # cdist() returns a numpy array
+except ImportError:
+    cdist = None
+    try:
+        from Levenshtein import ratio as _ratio
+    except ImportError:
+        from difflib import SequenceMatcher
+
+        def _ratio(s1, s2):
+            return SequenceMatcher(None, s1, s2).ratio()
+
+
+MATCH_THRESHOLD = 50
+
+
+def scores(name, others, threshold=MATCH_THRESHOLD):
+    """
+    Scores a name against a list of names in one batch.
+    :param name: lowercase string
+    :param others: list of lowercase strings
+    :param threshold: scores below it may be returned as 0
+    :return: list of int scores (0-100), in the order of others
+    """
+    if not others:
+        return []
+    if cdist is not None:
+        return [int(round(value)) for value in cdist([name], others, scorer=fuzz.ratio, score_cutoff=threshold - 0.5,
+                                                     workers=1)[0]]
+    return [int(round(100 * _ratio(name, other))) for other in others]
+
+
+class DuplicateFinder:
+    def __init__(self, respondents):
+        """
+        Candidate index over the existing respondents of one type, by the characters in their names. The score of two
+        names of lengths a and b is at most 200*m/(a+b), where m is the number of characters (counted with repeats)
+        they have in common: the matched characters of the ratio are a common subsequence of the names. A name is only
+        scored if m is high enough to reach the threshold, so the filter drops no name a full scan would report.
+        :param respondents: rows from queryfuncs.get_existing_respondents() (name, id, district)
+        """
+        self.names = []
+        self.lowered = []
+        self.ids = []
+        self.districts = []
+        self.postings = {}  # character -> list of (position, count of the character in the name)
+        self.existing = set()
+        self.positions = {}
+        for name, resp_id, district in respondents:
+            self.add(name, resp_id, district)
+
+    def add(self, name, resp_id, district=None):
+        """
+        Adds a respondent to the index. A respondent already indexed only has its district updated.
+        :return: None
+        """
+        if resp_id in self.positions:
+            self.districts[self.positions[resp_id]] = district
+            return
+        lowered = name.lower()
+        position = self.positions[resp_id] = len(self.names)
+        self.names.append(name)
+        self.lowered.append(lowered)
+        self.ids.append(resp_id)
+        self.districts.append(district)
+        self.existing.add(lowered)
+        for char, count in Counter(lowered).items():
+            self.postings.setdefault(char, []).append((position, count))
+
+    def exists(self, name):
+        """
+        Returns True if a respondent with exactly this name (ignoring case) already exists.
+        """
+        return name.lower() in self.existing
+
+    def candidates(self, lowered, threshold=MATCH_THRESHOLD):
+        """
+        Returns the positions of the names that share enough characters with the given name to score at least the
+        threshold. A score is rounded, so it reaches the threshold from 200*m/(a+b) >= threshold - 0.5 on.
+        """
+        shared = [0] * len(self.names)
+        for char, wanted in Counter(lowered).items():
+            for position, count in self.postings.get(char, ()):
+                shared[position] += min(wanted, count)
+        size = len(lowered)
+        names = self.lowered
+        return [position for position, common in enumerate(shared)
+                if 400 * common >= (2 * threshold - 1) * (size + len(names[position]))]
+
+    def find(self, name, threshold=MATCH_THRESHOLD):
+        """
+        Scores the name against the candidate respondents.
+        :param name: the name being entered
+        :param threshold: minimum score (0-100) to be reported as a possible match
+        :return: list of (name, id, score, district) tuples, sorted by score
+        """
+        lowered = name.lower()
+        if not lowered:
+            return []
+        positions = self.candidates(lowered, threshold)
+        values = scores(lowered, [self.lowered[position] for position in positions], threshold)
+        matches = []
+        for position, token in zip(positions, values):
+            if token >= threshold:
+                matches.append((self.names[position], self.ids[position], token, self.districts[position]))
+        return sorted(matches, key=lambda x: x[2])
@@ -1,19 +1,65 @@
 #!/usr/bin/env python
 
+import logging
 import tkinter as tk
 from tkinter import messagebox
-import time
-import datetime
 import queryfuncs as qf
 import student_lookup as sl
+import survey_rules
+import form_layout
+
+logger = logging.getLogger(__name__)
+
+
+# Messages for the stage of qf.submit_survey() that failed, the whole survey is rolled back in every case
+SUBMIT_ERRORS = {
+    'validate': ('Invalid Entry', 'You\'re trying to enter a survey for a student that\'s already been entered.\nPlease double check the respondent\'ts name, the survey type, and the date you\'ve entered above'),
+    'administration': ('Error', 'Could not save the survey data. Call Dave'),
+    'responses': ('Error', 'One of the answers could not be saved, please check to make sure no field is incorrectly entered'),
+    'district': ('Error', 'Tried to update the respondents given district but failed. Please let Dave know.'),
+    'commit': ('Error', 'The survey could not be saved, please try again.')
+}
+
+# Questions built before the window is shown, the rest are built in chunks while Tk is idle
+FIRST_SCREEN_QUESTIONS = 15
+IDLE_CHUNK_QUESTIONS = 10
+
+# Keep a closed survey window (hidden) per survey and clear it for the next entry instead of rebuilding it
+POOL_FORMS = True
+_idle_forms = {}
+
+
+def open_form(master, con, survey_id, resp_id, admin_id=None, edit=False, parentwindow=None, worker=None,
+              old_answers=None):
+    """
+    Opens a SurveyEntry window for the survey, reusing the idle window of the survey if there is one (see
+    SurveyEntry.release()), otherwise a new Toplevel is built.
+    :param master: TK root the window is opened over
+    :return: the SurveyEntry object
+    """
+    form = _idle_forms.pop(survey_id, None)
+    if form is not None and form.master.winfo_exists():
+        form.reopen(con, resp_id, admin_id, edit, parentwindow, worker, old_answers)
+        return form
+    return SurveyEntry(tk.Toplevel(master), con, survey_id, resp_id, admin_id, edit, parentwindow, worker,
+                       old_answers)
+
+
+def clear_forms():
+    """
+    Forgets the idle survey windows, called when the main window they belong to is closed.
+    :return: None
+    """
+    _idle_forms.clear()
 
 
 class SurveyEntry:
-    def __init__(self, master, con, survey_id, resp_id, admin_id = None, edit=False, parentwindow = None):
+    def __init__(self, master, con, survey_id, resp_id, admin_id = None, edit=False, parentwindow = None, worker = None,
+                 old_answers=None):
         """
         This class is initialized as a TK window for survey entry. The Window is a large canvas laid onto the master, inisde
         that canvas is a frame that the canvas scrolls through. The frame is populated with widgets proceedurally based on
-        queries to the Oracle db.
+        the survey definition, which is fetched from the Oracle db once per survey and cached.
         :param master: TK root that the window exists in
         :param con: cx_oracle connection object
         :param survey_id: ID of the survey to be completed
@@ -21,25 +67,32 @@ class SurveyEntry:
         :param admin_id: ID of the administration, given only if editing
         :param edit: Boolean, True if editting an old survey
         :param parentwindow: GUI object, used for updating certain fields based on actions taken in this window
+        :param worker: DBWorker the answers are saved on, so the window does not freeze while submitting
+        :param old_answers: the previously given answers when editing, from qf.get_given_answers() (fetched on the
+        worker before the window is opened)
         :return:
         """
         self.master = master
         self.con = con
+        self.worker = worker
         self.survey_id = survey_id
         self.admin_id = admin_id
         self.respondent = resp_id
         self.toedit = edit
         self.parentwindow = parentwindow
-        self.questions = qf.get_survey_questions(self.con, self.survey_id)
+        self.definition = qf.get_survey_definition(self.con, self.survey_id)
+        self.questions = self.definition.questions
         self.answers = []
         self.questionwidgets = {}
-        self.survey_title = qf.get_survey_name(self.con, self.survey_id)
+        self.survey_title = self.definition.name
         self.survey_widgets = {}
+        self.layout = form_layout.get_layout(self.definition)
         self.master.protocol("WM_DELETE_WINDOW", self.close_window)
         self.master.minsize(1200,800)
         self.master.title('{} Entry'.format(self.survey_title))
         self.lookupwindow = None
         self.linked_student = None
+        self.loaded_answers = None
 
         # Initialize The Canvas info
         self.canvas = tk.Canvas(self.master, borderwidth=0)
@@ -58,13 +111,81 @@ class SurveyEntry:
         tk.Label(self.master_frame, text='Please enter the data exactly as it appears on the survey', padx=10, pady=6).grid(
             sticky='w', column=0, columnspan=8)
 
+        #Previously given answers if editing, they are filled in once the form is complete
+        self.load_old_answers(old_answers)
+
         #Populate Survey
         self.populate()
 
-        #Populate previously given answers if editing
+    def load_old_answers(self, old_answers):
+        """
+        Keeps the previously given answers when editing.
+        :param old_answers: rows from qf.get_given_answers()
+        :return: None
+        """
+        self.old_answers = None
         if self.toedit:
-            old_answers = qf.get_given_answers(self.con, self.admin_id)
-            self.input_answers(old_answers)
+            self.old_answers = old_answers
+            # snapshot of the stored answers, only the ones that change are written on submit
+            self.loaded_answers = [(quid, answer) for quid, answer, _ in self.old_answers]
+
+    def reopen(self, con, resp_id, admin_id=None, edit=False, parentwindow=None, worker=None, old_answers=None):
+        """
+        Reuses this (hidden) window for another entry of the same survey: the widgets are cleared instead of rebuilt.
+        Parameters are the same as in __init__.
+        :return: None
+        """
+        self.con = con
+        self.worker = worker
+        self.parentwindow = parentwindow
+        self.respondent = resp_id
+        self.admin_id = admin_id
+        self.toedit = edit
+        self.linked_student = None
+        self.loaded_answers = None
+        self.reset()
+        self.load_old_answers(old_answers)
+        if self.old_answers is not None:
+            self.input_answers(self.old_answers)
+        self.canvas.yview_moveto(0)
+        self.master.deiconify()
+        self.master.lift()
+
+    def reset(self):
+        """
+        Clears every answer widget back to how it was built (the respondent's name is filled in again).
+        :return: None
+        """
+        for widget_dict in self.survey_widgets.values():
+            quid = widget_dict['quid']
+            qtype = widget_dict['type']
+            if qtype == 1:
+                widget_dict['response_var'].set(self.respondent_field_text(quid))
+            elif qtype == 2:
+                widget_dict['response'].delete('1.0', 'end')
+            elif qtype == 3:
+                widget_dict['response_var'].set(None)
+            elif qtype == 4:
+                widget_dict['response_var'].set('')
+            else:
+                for var in widget_dict['response_var']:
+                    var.set('')
+        self.submitbutton.config(state='normal')
+
+    def release(self):
+        """
+        Closes the window. With POOL_FORMS the completed form is hidden and kept for the next entry of the survey,
+        unless another window of the survey is already kept.
+        :return: None
+        """
+        if self.lookupwindow is not None and self.lookupwindow.winfo_exists():
+            self.lookupwindow.destroy()
+        self.lookupwindow = None
+        if POOL_FORMS and not self.pending and self.survey_id not in _idle_forms:
+            self.master.withdraw()
+            _idle_forms[self.survey_id] = self
+        else:
+            self.master.destroy()
 
     def close_window(self):
         """
@@ -72,7 +193,7 @@ class SurveyEntry:
         :return: None
         """
         if messagebox.askyesno('Close', 'Are you sure you want to close?\nThis survey will not be saved.'):
-            self.master.destroy()
+            self.release()
 
     def student_lookup(self, event):
         """
@@ -84,7 +205,7 @@ class SurveyEntry:
              self.lookupwindow.deiconify()
         except:
             self.lookupwindow = tk.Toplevel(self.master)
-            self.app = sl.StudentLookup(self.lookupwindow, event.widget, self.con, self)
+            self.app = sl.StudentLookup(self.lookupwindow, event.widget, self.con, self, self.worker)
 
     def onFrameConfigure(self, event):
         """
@@ -96,195 +217,213 @@ class SurveyEntry:
         self.canvas.configure(scrollregion=self.canvas.bbox("all"))
 
     def populate(self):
-        """ Build Question Widgets. Loops through the questions twice, once to generate all the widget information, and then
-        a second time to place the widgets. This was done because some placement decisions depend on the widget information
-        of other answers. It was easier this way than trying to place at the same time which would require fancy logic.
+        """ Build Question Widgets. The first FIRST_SCREEN_QUESTIONS questions are built and placed right away so the
+        window opens with a screenful to fill in, the rest are built IDLE_CHUNK_QUESTIONS at a time whenever Tk is idle
+        (long surveys like the student application would otherwise take seconds to open). The submit button is added and
+        any answers being edited are filled in once every question is built, so submitanswers() and input_answers()
+        always see the full survey_widgets map.
         :returns None. The class is edited in place
         """
-        for quid, qtext, num in self.questions:
-            qtype = int(qf.get_question_type(self.con, quid)[0])
-            #print(num, qtype)
-            if qtype == 1:  # short_string
-                qlabel = tk.Label(self.master_frame, text='{}. {}'.format(num, qtext), wraplength=700, justify='left')
-                qstrvar = tk.StringVar()
-                qentry = tk.Entry(self.master_frame, textvariable=qstrvar, width=50)
-                if quid == 97:
-                    if self.survey_id in (1,2,3):
-                        name = qf.get_student_name_from_id(self.con, self.respondent)
-                        qentry.delete(0,'end')
-                        qentry.insert(0, name)
-                    else:
-                        qentry.bind("<Button-1>", self.student_lookup)
-                    qentry.config(state='readonly')
-                elif quid in (99, 100):
-                    name = qf.get_student_name_from_id(self.con, self.respondent)
-                    qentry.delete(0,'end')
-                    qentry.insert(0, name)
-                    qentry.config(state='readonly')
-                self.survey_widgets[num] = {
-                    'quid': quid,
-                    'type': qtype,
-                    'label': qlabel,
-                    'response': qentry,
-                    'response_var': qstrvar
-                }
-
-            elif qtype == 2:  # long_string
-                qlabel = tk.Label(self.master_frame, text='{}. {}'.format(num, qtext), wraplength=700, justify='left')
-                qentry = tk.Text(self.master_frame, wrap='word', height=4)
-                self.survey_widgets[num] = {
-                    'quid': quid,
-                    'type': qtype,
-                    'label': qlabel,
-                    'response': qentry,
-                    'response_var': ''
-                }
-
-            elif qtype == 3:  # single_choice
-                qlabel = tk.Label(self.master_frame, text='{}. {}'.format(num, qtext), wraplength=700, justify='left')
-                qanswers = qf.get_question_responses(self.con, quid)
-                answervar = tk.StringVar()
-                answervar.set(None)
-                buttons = []
-                for a_id, ans in qanswers:
-                    buttons.append(tk.Radiobutton(
-                        self.master_frame, text=ans, variable=answervar, value=ans
-                    ))
-                self.survey_widgets[num] = {
-                    'quid': quid,
-                    'type': qtype,
-                    'label': qlabel,
-                    'response': buttons,
-                    'response_var': answervar
-                }
-
-            elif qtype == 4:  # table_single_choice
-                # these need to reference the previous question to see if the same frame should be used
-                qlabel = '{}. {}'.format(num, qtext)
-                qanswers = qf.get_question_responses(self.con, quid)
-                answervar = tk.StringVar()
-                buttons = []
-                for a_id, ans in qanswers:
-                    buttons.append(tk.Radiobutton(
-                        self.master_frame, text=ans, variable=answervar, value=ans, indicatoron=0, width=0, height=2
-                    ))
-                self.survey_widgets[num] = {
-                    'quid': quid,
-                    'type': qtype,
-                    'label': qlabel,
-                    'response': buttons,
-                    'response_var': answervar,
-                    'answers': [ans[1] for ans in qanswers]
-                }
-
-            elif qtype == 5:  # table_multiple_choice
-                # these need to reference the previous question to see if the same frame should be used
-                qlabel = '{}. {}'.format(num, qtext)
-                qanswers = qf.get_question_responses(self.con, quid)
-                buttons = []
-                answervars = []
-                for a_id, ans in qanswers:
-                    ansvar = tk.StringVar()
-                    box = tk.Checkbutton(self.master_frame, text='', variable=ansvar, onvalue=ans, offvalue='', width=7)
-                    buttons.append(box)
-                    answervars.append(ansvar)
-                self.survey_widgets[num] = {
-                    'quid': quid,
-                    'type': qtype,
-                    'label': qlabel,
-                    'response': buttons,
-                    'response_var': answervars,
-                    'answers': [ans[1] for ans in qanswers]
-                }
-
-            elif qtype == 6:  # multiple_choice
-                qlabel = tk.Label(self.master_frame, text='{}. {}'.format(num, qtext), wraplength=700, justify='left')
-                qanswers = qf.get_question_responses(self.con, quid)
-                buttons = []
-                answervars = []
-                for a_id, ans in qanswers:
-                    ansvar = tk.StringVar()
-                    box = tk.Checkbutton(self.master_frame, text=ans, variable=ansvar, onvalue=ans, offvalue='')
-                    buttons.append(box)
-                    answervars.append(ansvar)
-                self.survey_widgets[num] = {
-                    'quid': quid,
-                    'type': qtype,
-                    'label': qlabel,
-                    'response': buttons,
-                    'response_var': answervars
-                }
-
-        placerow = 3    # When placing the survey widgets, the first 2 rows are the header and instructions
-
-        for i in range(1, len(self.survey_widgets)+1):
-            label = self.survey_widgets[i]['label']
-            qtype = self.survey_widgets[i]['type']
-            answers = self.survey_widgets[i].get('answers')
-
-            if qtype in (1,2):  # short entry answers
-                response = self.survey_widgets[i]['response']
-                label.grid(row=placerow, column=0, columnspan=8, sticky='w')
-                placerow += 1
-                response.grid(row=placerow, column=0, columnspan=8, sticky='w', padx=20)
-                placerow += 1
-
-            elif qtype in (4, 5):  # horizontal table answers
-                prev_q = i-1
-                prev_q_ans = [ans[1] for ans in
-                              qf.get_question_responses(self.con, self.survey_widgets[prev_q]['quid'])]
-                if [ans.lower() for ans in answers] != [ans.lower() for ans in prev_q_ans] and qtype == 5:
-                    col = 8
-                    for answer in answers[::-1]:
-                        tk.Label(self.master_frame, text=answer, wraplength=100).grid(
-                                row=placerow, column=col, sticky='nsew')
-                        col -= 1
-                    placerow += 1
-
-                label_size = 8-len(answers)
-                tk.Label(self.master_frame, text=self.survey_widgets[i]['label'], wraplength=500, justify='left').grid(
-                        row=placerow, column=0, columnspan=label_size, sticky='w')
-                buttons = self.survey_widgets[i]['response']
-                col = 8
-                for button in buttons[::-1]:
-                    button.grid(row=placerow, column=col, sticky='nsew')
-                    col -= 1
-                placerow += 1
-
-            elif qtype in (3, 6):  # vertical choice answers
-                responses = self.survey_widgets[i]['response']
-                label.grid(row=placerow, column=0, columnspan=8, sticky='w')
-                placerow += 1
-                for resp in responses:
-                    resp.grid(row=placerow, column=0, sticky='w', padx=10)
-                    try:
-                        resp.deslect()
-                    except:
-                        pass
-                        #print(i)
-                    placerow += 1
-
-            # Add a blank line between questions unless the question is a "table" type in which case only add
-            # a blank row if the next question utilizes a different set of answers
-            if qtype in (1,2,3,6):
-                tk.Label(self.master_frame, text='', font=('Times new Roman', 3)).grid(row=placerow, columnspan=8)
-                placerow += 1
-            else:
-                next_q = i+1
-                next_q_ans = [ans[1] for ans in
-                              qf.get_question_responses(self.con, self.survey_widgets[next_q]['quid'])]
-                if [ans.lower() for ans in answers] != [ans.lower() for ans in next_q_ans]:
-                    tk.Label(self.master_frame, text='', font=('Times new Roman', 3)).grid(row=placerow, columnspan=8)
-                    placerow += 1
+        self.pending = sorted(self.questions, key=lambda question: question[2])
+        self.build_questions(FIRST_SCREEN_QUESTIONS)
+        self.master.after_idle(self.populate_more)
 
+    def populate_more(self):
+        """
+        Builds the next chunk of questions and reschedules itself until the form is complete.
+        :return: None
+        """
+        if not self.master.winfo_exists():  # closed before the form was finished
+            return
+        self.build_questions(IDLE_CHUNK_QUESTIONS)
+        if self.pending:
+            self.master.after_idle(self.populate_more)
+        else:
+            self.finish_populate()
 
+    def build_questions(self, count):
+        """
+        Builds and places the widgets of the next count questions, in question order.
+        :param count: number of questions to build
+        :return: None
+        """
+        chunk, self.pending = self.pending[:count], self.pending[count:]
+        for quid, qtext, num in chunk:
+            self.build_question(quid, qtext, num)
+            self.place_question(num)
+
+    def finish_populate(self):
+        """
+        Adds the submit button and, if editing, fills in the previously given answers.
+        :return: None
+        """
         self.submitbutton = tk.Button(self.master_frame, text='Submit', command=self.submitanswers, width=20, bg='green')
         self.submitbutton.grid()
+        if self.old_answers is not None:
+            self.input_answers(self.old_answers)
+
+    def build_question(self, quid, qtext, num):
+        """
+        Creates the widgets of a question and adds them to survey_widgets under the question order.
+        :return: None
+        """
+        qtype = int(self.definition.question_type(quid)[0])
+        #print(num, qtype)
+        if qtype == 1:  # short_string
+            qlabel = tk.Label(self.master_frame, text='{}. {}'.format(num, qtext), wraplength=700, justify='left')
+            qstrvar = tk.StringVar()
+            qentry = tk.Entry(self.master_frame, textvariable=qstrvar, width=50)
+            qstrvar.set(self.respondent_field_text(quid))
+            if quid == 97:
+                if self.survey_id not in (1,2,3):
+                    qentry.bind("<Button-1>", self.student_lookup)
+                qentry.config(state='readonly')
+            elif quid in (99, 100):
+                qentry.config(state='readonly')
+            self.survey_widgets[num] = {
+                'quid': quid,
+                'type': qtype,
+                'label': qlabel,
+                'response': qentry,
+                'response_var': qstrvar
+            }
+
+        elif qtype == 2:  # long_string
+            qlabel = tk.Label(self.master_frame, text='{}. {}'.format(num, qtext), wraplength=700, justify='left')
+            qentry = tk.Text(self.master_frame, wrap='word', height=4)
+            self.survey_widgets[num] = {
+                'quid': quid,
+                'type': qtype,
+                'label': qlabel,
+                'response': qentry,
+                'response_var': ''
+            }
+
+        elif qtype == 3:  # single_choice
+            qlabel = tk.Label(self.master_frame, text='{}. {}'.format(num, qtext), wraplength=700, justify='left')
+            qanswers = self.definition.question_responses(quid)
+            answervar = tk.StringVar()
+            answervar.set(None)
+            buttons = []
+            for a_id, ans in qanswers:
+                buttons.append(tk.Radiobutton(
+                    self.master_frame, text=ans, variable=answervar, value=ans
+                ))
+            self.survey_widgets[num] = {
+                'quid': quid,
+                'type': qtype,
+                'label': qlabel,
+                'response': buttons,
+                'response_var': answervar
+            }
+
+        elif qtype == 4:  # table_single_choice
+            # these need to reference the previous question to see if the same frame should be used
+            qlabel = '{}. {}'.format(num, qtext)
+            qanswers = self.definition.question_responses(quid)
+            answervar = tk.StringVar()
+            buttons = []
+            for a_id, ans in qanswers:
+                buttons.append(tk.Radiobutton(
+                    self.master_frame, text=ans, variable=answervar, value=ans, indicatoron=0, width=0, height=2
+                ))
+            self.survey_widgets[num] = {
+                'quid': quid,
+                'type': qtype,
+                'label': qlabel,
+                'response': buttons,
+                'response_var': answervar,
+                'answers': [ans[1] for ans in qanswers]
+            }
+
+        elif qtype == 5:  # table_multiple_choice
+            # these need to reference the previous question to see if the same frame should be used
+            qlabel = '{}. {}'.format(num, qtext)
+            qanswers = self.definition.question_responses(quid)
+            buttons = []
+            answervars = []
+            for a_id, ans in qanswers:
+                ansvar = tk.StringVar()
+                box = tk.Checkbutton(self.master_frame, text='', variable=ansvar, onvalue=ans, offvalue='', width=7)
+                buttons.append(box)
+                answervars.append(ansvar)
+            self.survey_widgets[num] = {
+                'quid': quid,
+                'type': qtype,
+                'label': qlabel,
+                'response': buttons,
+                'response_var': answervars,
+                'answer_vars': dict(zip([ans[1] for ans in qanswers], answervars)),
+                'answers': [ans[1] for ans in qanswers]
+            }
+
+        elif qtype == 6:  # multiple_choice
+            qlabel = tk.Label(self.master_frame, text='{}. {}'.format(num, qtext), wraplength=700, justify='left')
+            qanswers = self.definition.question_responses(quid)
+            buttons = []
+            answervars = []
+            for a_id, ans in qanswers:
+                ansvar = tk.StringVar()
+                box = tk.Checkbutton(self.master_frame, text=ans, variable=ansvar, onvalue=ans, offvalue='')
+                buttons.append(box)
+                answervars.append(ansvar)
+            self.survey_widgets[num] = {
+                'quid': quid,
+                'type': qtype,
+                'label': qlabel,
+                'response': buttons,
+                'response_var': answervars,
+                'answer_vars': dict(zip([ans[1] for ans in qanswers], answervars))
+            }
+
+    def respondent_field_text(self, quid):
+        """
+        The student name questions (97 on the student surveys, 99 and 100) are filled with the respondent's name.
+        :return: the respondent's name for those questions, otherwise ''
+        """
+        if (quid == 97 and self.survey_id in (1,2,3)) or quid in (99, 100):
+            return qf.get_student_name_from_id(self.con, self.respondent)
+        return ''
+
+    def place_question(self, i):
+        """
+        Places the widgets of a question where the survey's layout plan puts them (see form_layout.py).
+        :param i: the question order
+        :return: None
+        """
+        entry = self.layout[i]
+        widgets = self.survey_widgets[i]
+        qtype = widgets['type']
+
+        header = entry.get('header')
+        if header:  # answer labels above a new table of checkboxes
+            row, labels = header
+            for col, text in labels:
+                tk.Label(self.master_frame, text=text, wraplength=100).grid(row=row, column=col, sticky='nsew')
+
+        row, span = entry['label']
+        if qtype in (4, 5):
+            tk.Label(self.master_frame, text=widgets['label'], wraplength=500, justify='left').grid(
+                    row=row, column=0, columnspan=span, sticky='w')
+        else:
+            widgets['label'].grid(row=row, column=0, columnspan=span, sticky='w')
+
+        if 'response' in entry:
+            row, span = entry['response']
+            widgets['response'].grid(row=row, column=0, columnspan=span, sticky='w', padx=20)
+        for button, (row, col) in zip(widgets['response'] if 'buttons' in entry else (), entry.get('buttons', ())):
+            if qtype in (3, 6):
+                button.grid(row=row, column=col, sticky='w', padx=10)
+            else:
+                button.grid(row=row, column=col, sticky='nsew')
+
+        if 'spacer' in entry:
+            tk.Label(self.master_frame, text='', font=('Times new Roman', 3)).grid(row=entry['spacer'], columnspan=8)
 
     def input_answers(self, old_answers):
         """
-        Method used when the user has selected an old survey to edit. Queries the database for the previously given answers
-        and inserts them into their appropriate widgets. Text entry fields are inputted, and buttons are selected.
+        Method used when the user has selected an old survey to edit. Inserts the previously given answers into their
+        appropriate widgets. Text entry fields are inputted, and buttons are selected.
         :param old_answers: a list generated from the qf.get_given_answers() method
         :return: None
         """
@@ -299,43 +438,36 @@ class SurveyEntry:
                 old_ans_dict[ans[2]]['ans'].append(ans[1])
         #print(old_ans_dict)
 
-        for num, widget_dict in self.survey_widgets.items():
+        # Walk the given answers rather than the widgets, and set the variables directly through the answer -> variable
+        # maps built in build_question(), so prefilling costs one pass over the answers
+        for num, old_num_dict in old_ans_dict.items():
+            widget_dict = self.survey_widgets.get(num)
+            if widget_dict is None:
+                continue
             quid = widget_dict['quid']
             type = widget_dict['type']
-
-            old_num_dict = old_ans_dict.get(num)
-            if not old_num_dict:
-                #print('no answer for {}'.format(num))
-                continue
-
             old_ans = old_num_dict['ans']
 
-            if quid != old_ans_dict.get(num)['quid']:
+            if quid != old_num_dict['quid']:
                 messagebox.showerror('','quids dont match')
 
             if type == 1:
-                widget_dict['response'].config(state='normal')
-                widget = widget_dict['response']
-                widget.delete(0,'end')
-                widget.insert(0, old_ans[0])
-                # Special handling of fields that are filled through another window
-                if quid in (97, 99, 100):
-                    widget_dict['response'].config(state='readonly')
+                # the textvariable also fills the readonly fields (97, 99, 100) that are set through another window
+                widget_dict['response_var'].set(old_ans[0])
 
             elif type == 2:
                 widget = widget_dict['response']
                 widget.insert(1.0, old_ans[0])
 
-            if type in (3, 4):
-                responsevar = widget_dict['response_var']
-                responsevar.set(old_ans[0])
+            elif type in (3, 4):
+                widget_dict['response_var'].set(old_ans[0])
 
-            if type in (5,6):
-                buttons = widget_dict['response']
-                for but in buttons:
-                    but_ans = but.cget('onvalue')
-                    if but_ans in old_ans:
-                        but.select()
+            elif type in (5, 6):
+                answer_vars = widget_dict['answer_vars']
+                for ans in set(old_ans):
+                    var = answer_vars.get(ans)
+                    if var is not None:
+                        var.set(ans)   # same as selecting the checkbutton, its onvalue is the answer
 
     def submitanswers(self):
         """
@@ -347,144 +479,102 @@ class SurveyEntry:
         if not messagebox.askokcancel('Submit Answers?', 'Are you sure you want to submit these answers?'):
             return
         else:
-            #Grab the date information, on surveys this is the "date taken" field, which is important for identifying the order of administrations, in the student application
-            #quid 116 is the "Date of Birth" field which is important because it is a field we'll be matching on in the future.
-            date_widget = {}
-            for widget in self.survey_widgets.values():
-                if widget['quid'] in (96,116):
-                    date_widget = widget
-
-            if date_widget.get('quid', None) not in (96,116):
-                messagebox.showerror('Fatal Error', 'The date could not be retrieved, something went VERY wrong. \nCall Dave. Take a break. There\'s nothing you can do.')
-                return
-
-            # Confirm that both the date has been entered and is of the format MM/DD/YYYY
             try:
-                date = date_widget['response_var'].get()
-                if not date:
-                    if self.survey_id == 7:
-                        messagebox.showerror('Date Error', 'You haven\'t entered a date of birth.\nPlease enter one in the format of MM/DD/YYYY')
-                        return
-                    else:
-                        messagebox.showerror('Date Error', 'You haven\'t entered a date.\nPlease enter one in the format of MM/DD/YYYY')
-                        return
-                print(date)
-                time.strptime(date, '%m/%d/%Y')    # Will raise an error if the date is not formatted correctly
-
-            except ValueError:
-                messagebox.showerror('Date Error', 'You\'ve entered a date that is not in correct format\nPlease change to MM/DD/YYYY format')
+                date, answers = self.collect_answers()
+            except survey_rules.ValidationError as e:
+                messagebox.showerror(e.title, e.message)
                 return
 
-            #The "date taken" field doesn't exist on the student application, so we are going to just set it to the day the application was entered into the survey
-            if self.survey_id == 7:
-                date = datetime.date.today().strftime('%m/%d/%Y')
-
-            insert_list = []
-            for index in range(1,len(self.survey_widgets)+1):
-                quid = self.survey_widgets[index]['quid']
-                qtype = self.survey_widgets[index]['type']
-                #long answer (tk.Text) fields have a different way of getting the inputted information
-                if qtype == 2:
-                    resp =self.survey_widgets[index]['response']
-                else:
-                    resp = self.survey_widgets[index]['response_var']
-
-                #Handling multiple choice requires iterating through a list of response widgets
-                if isinstance(resp, list):
-                    for response in resp:
-                        text = response.get()
-                        if text:
-                            insert_list.append([0, quid, self.respondent, text])
-                else:
-                    if resp: # Check to make sure we have a response variable
-                        if qtype == 2:
-                            text = resp.get(0.0, 'end')   #Special handling of tk.Text widget
-                        else:
-                            text = resp.get()
-                        if text:   # Don't add null responses to the database
-                            insert_list.append([0, quid, self.respondent, text])
-                        else:
-                            if quid in (91,92,93,94,95,96) or self.survey_id == 7:    #Required answers, cannot be null, application must be completely filled out
-                                if self.survey_id == 7:
-                                    messagebox.showerror("Empty Fields", 'Student Applications must be completely filled out, if an answer is left blank by the student or parents please enter \"None\"')
-                                else:
-                                    messagebox.showerror("Empty Fields", "You haven't answered the required questions\n\nPlease answer all questions marked with an \"*\"")
-                                return
-
-            # If we're editing an old survey, update the survey administration details, otherwise create a new
-            # administration. Set self.admin_id to the generated or given admin_id
-            if self.toedit:
-                admin_id = self.admin_id
-                update_result = qf.update_survey_response(self.con, admin_id)
-                if update_result:
-                    messagebox.showerror('', 'Could not update the survey data. Call Dave')
+            #The database work runs on the worker, the window is locked until it reports back in answers_saved()
+            linked_student = self.linked_student if self.survey_id in (4,5,6) and not self.toedit else None
+            admin_id = self.admin_id if self.toedit else None
+            self.submitbutton.config(state='disabled')
+            #The survey is written to the local journal first so that it is not lost if the database can't be reached
+            try:
+                seq = qf.journal_survey(self.survey_id, self.respondent, answers, date, admin_id, linked_student,
+                                        self.loaded_answers)
+            except OSError as e:
+                logger.error('Could not journal the survey: %s', e)
+                seq = None
+            if seq is None:
+                self.worker.submit(qf.submit_survey, self.survey_id, self.respondent, answers, date, admin_id,
+                                   linked_student, self.loaded_answers, callback=self.answers_saved,
+                                   errback=self.save_failed)
             else:
-                if self.valid_entry(date):
-                    admin_id = qf.insert_new_survey_response(self.con, self.survey_id, self.respondent, date)
-                else:
-                    messagebox.showerror('Invalid Entry', 'You\'re trying to enter a survey for a student that\'s already been entered.\nPlease double check the respondent\'ts name, the survey type, and the date you\'ve entered above')
-                    return
-
-            #add the admin id to all the incoming response rows
-            for row in insert_list:
-                row[0] = admin_id
-
-            #If updating, delete all old responses (less error prone than trying to update and add new responses if old were left blank)
-            if self.toedit:
-                delete_result = qf.delete_old_responses(self.con, admin_id)
-                if delete_result:
-                    messagebox.showerror('Error', 'Could not delete the old answers')
-                    return
-
-            #Add responses
-            insert_result = qf.insert_responses(self.con, insert_list)
-
-            #check to see if batch insert failed
-            if not insert_result:
-                messagebox.showinfo('Success', 'Survey Responses Added Successfully!')
-                self.parentwindow.get_taken_surveys()
-                if self.survey_id in (4,5,6) and not self.toedit:
-                    result = self.update_district()
-                    if result:
-                        messagebox.showerror('Error', 'Tried to update the respondents given district but failed. Please let Dave know.')
-                self.parentwindow.respondent_search()
-                self.master.destroy()
+                #Sent in the background by the main window, which lists the entries that can't be saved
+                self.parentwindow.send_entries()
+                messagebox.showinfo('Success', 'Survey Responses Saved! They are sent to the database in the '
+                                    'background.')
+                self.release()
 
+    def collect_answers(self):
+        """
+        Extracts the entered answers from the survey widgets and checks the date and the required questions (see
+        survey_rules.py). Raises survey_rules.ValidationError with the message to display if a rule is broken.
+        :return: (date taken as MM/DD/YYYY, list of (question id, answer) tuples)
+        """
+        #Grab the date information, on surveys this is the "date taken" field, which is important for identifying the order of administrations, in the student application
+        #quid 116 is the "Date of Birth" field which is important because it is a field we'll be matching on in the future.
+        date_widget = {}
+        for widget in self.survey_widgets.values():
+            if widget['quid'] in survey_rules.DATE_QUIDS:
+                date_widget = widget
+
+        if date_widget.get('quid', None) not in survey_rules.DATE_QUIDS:
+            raise survey_rules.ValidationError('Fatal Error', 'The date could not be retrieved, something went VERY wrong. \nCall Dave. Take a break. There\'s nothing you can do.')
+
+        # Confirm that both the date has been entered and is of the format MM/DD/YYYY
+        date = survey_rules.date_taken(self.survey_id, date_widget['response_var'].get())
+
+        answers = []
+        for index in range(1,len(self.survey_widgets)+1):
+            quid = self.survey_widgets[index]['quid']
+            qtype = self.survey_widgets[index]['type']
+            #long answer (tk.Text) fields have a different way of getting the inputted information
+            if qtype == 2:
+                resp =self.survey_widgets[index]['response']
             else:
-                messagebox.showerror('Error', 'One of the answers could not be saved, please check to make sure no field is incorrectly entered')
-
-    def valid_entry(self, date):
-        """
-        Utility function for ensuring that the survey administration is not a duplicate.
-        A unique administration is defined as a distinct student id, survey id, and "date taken" for surveys
-        while applications can only be entered once.
-        :param date: a string formatted as MM/DD/YYYY, this format is verified in submit_answers(). If called outside of
-        this method then an error will be raised if formatted incorrectly.
-        :return: False if the survey information is a duplicate of an already entered survey, True otherwise.
-        """
-        results = qf.get_taken_surveys(self.con, self.respondent)
-        date2 = time.strptime(date, '%m/%d/%Y')
-        checkdate = time.strftime('%Y-%m-%d', date2) + ' 00:00:00'
-        #print(self.survey_id, checkdate, self.respondent, '\n')
-        for row in results:
-            if self.survey_id == 7:   #If the response is an application then return false since it's already been entered for this student
-                if row[4] == 7:
-                    return False
+                resp = self.survey_widgets[index]['response_var']
+
+            #Handling multiple choice requires iterating through a list of response widgets
+            if isinstance(resp, list):
+                for response in resp:
+                    text = response.get()
+                    if text:
+                        answers.append((quid, text))
             else:
-                if int(row[4]) == int(self.survey_id) and str(row[1])==str(checkdate) and int(row[6])==int(self.respondent):
-                    return False
-        else:
-            return True
-
-    def update_district(self):
+                if resp: # Check to make sure we have a response variable
+                    if qtype == 2:
+                        text = resp.get(0.0, 'end')   #Special handling of tk.Text widget
+                    else:
+                        text = resp.get()
+                    if text:   # Don't add null responses to the database
+                        answers.append((quid, text))
+                    else:   #Required answers, cannot be null, application must be completely filled out
+                        survey_rules.check_required(self.survey_id, quid, text)
+        return date, answers
+
+    def answers_saved(self, result):
         """
-        When a parent/mentor has a survey added, they must associate with a student. That student's most recent district
-        is then associated with the parent as well.
-        :return: None if the update is successful, -1 otherwise.
+        Called on the Tk thread with the qf.SubmitResult of the save. If the survey was saved the main window is
+        refreshed and this one closed, otherwise the error of the stage that failed is displayed (nothing was saved).
+        :param result: qf.SubmitResult returned by qf.submit_survey()
+        :return: None
         """
-        respondent_id = self.respondent
-        student_id = self.linked_student
-        student_district = qf.get_student_district(self.con, student_id)
-        print(student_district, student_id, respondent_id)
-        result = qf.update_district(self.con, respondent_id, student_district)
-        return result
+        logger.debug('Survey submitted: %s', result)
+        if result.saved:
+            messagebox.showinfo('Success', 'Survey Responses Added Successfully!')
+            self.parentwindow.get_taken_surveys()
+            self.parentwindow.respondent_search()
+            self.release()
+            return
+
+        if result.error is not None:
+            logger.error('Could not save the survey: %s', result.error)
+        messagebox.showerror(*SUBMIT_ERRORS[result.failed])
+        self.submitbutton.config(state='normal')
+
+    def save_failed(self, e):
+        logger.error('Could not save the survey: %s', e)
+        messagebox.showerror('Error', 'The survey could not be saved, please try again.')
+        self.submitbutton.config(state='normal')
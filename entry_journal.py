@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+
+"""
+Local journal of the entered surveys and added respondents. Every submission is appended to a file on this computer
+(and flushed to disk) before it is sent to the database, so a survey typed in while the database can't be reached is
+not lost: queryfuncs.sync_journal() replays the journal in order and records the outcome of each entry.
+
+The journal is a JSON lines file that is only ever appended to while the app runs. Entries are:
+    survey      a submitted survey, with the arguments of queryfuncs.submit_survey()
+    respondent  a respondent added while offline, with the local (negative) id it is known by until it is inserted
+    synced      an entry was saved in the database, with the id it was given (administration or respondent)
+    rejected    an entry can't be saved (e.g. the survey has already been entered), kept for KEEP_REJECTED_DAYS for
+                review
+Surveys and respondents created offline get negative local ids, later entries may refer to them and are remapped to
+the database ids when they are replayed. When the journal is opened it is rewritten with only the entries still
+pending (already remapped) and the rejected ones.
+"""
+
+import os
+import json
+import hashlib
+import datetime
+import threading
+from collections import OrderedDict
+
+JOURNAL_DIR = os.path.join(os.path.expanduser('~'), '.survey_entry')
+KEEP_REJECTED_DAYS = 30  # rejected entries are dropped from the journal after this many days
+
+
+def journal_path(domain, journal_dir=JOURNAL_DIR):
+    """
+    :param domain: the Oracle domain or SQLite connection string logged in to
+    :param journal_dir: directory of the journal files
+    :return: path of the database's journal file
+    """
+    key = hashlib.sha1(domain.strip().lower().encode()).hexdigest()[:12]
+    return os.path.join(journal_dir, 'journal_{}.jsonl'.format(key))
+
+
+class EntryJournal:
+    def __init__(self, path):
+        """
+        Opens (or creates) a journal file and loads its entries. The journal is shared by the Tk thread, which appends
+        the submissions, and the background worker, which replays them, so every change is made under a lock.
+        :param path: the journal file
+        """
+        self.path = path
+        self.lock = threading.RLock()
+        self.pending = OrderedDict()  # seq -> survey/respondent entry not saved yet
+        self.rejected = []  # (entry, rejected record) of the entries that can't be saved
+        self.ids = {}  # local id -> database id
+        self.next_seq = 1
+        self.next_local_id = -1
+        self.load()
+        self.compact()
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # a line cut short when the computer went down
+            self._apply(record)
+
+    def _apply(self, record):
+        self.next_seq = max(self.next_seq, record['seq'] + 1)
+        kind = record['kind']
+        if kind in ('survey', 'respondent'):
+            self.pending[record['seq']] = record
+            if record.get('local_id') is not None:
+                self.next_local_id = min(self.next_local_id, record['local_id'] - 1)
+            return
+        # a synced/rejected entry always follows the entry it is about, which is still pending
+        entry = self.pending.pop(record['entry'], None)
+        if entry is None:
+            return
+        if kind == 'synced' and entry.get('local_id') is not None:
+            self.ids[entry['local_id']] = record['id']
+        elif kind == 'rejected':
+            self.rejected.append((entry, record))
+
+    def append(self, kind, **fields):
+        """
+        Appends an entry to the file and waits for it to be on disk.
+        :param kind: 'survey', 'respondent', 'synced' or 'rejected'
+        :param fields: the entry's fields, JSON-serializable
+        :return: the entry as written
+        """
+        with self.lock:
+            record = dict(fields, seq=self.next_seq, kind=kind,
+                          written=datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self._apply(record)
+            return record
+
+    def add_survey(self, survey_id, respondent_id, answers, date_taken, admin_id=None, linked_student=None,
+                   previous=None):
+        """
+        Journals a submitted survey, see queryfuncs.submit_survey() for the arguments. A new administration gets a
+        local id until it is saved.
+        :return: the sequence number of the entry
+        """
+        with self.lock:
+            local_id = None
+            if admin_id is None:
+                local_id = self.next_local_id
+            record = self.append('survey', survey_id=survey_id, respondent_id=respondent_id, answers=answers,
+                                 date_taken=date_taken, admin_id=admin_id, linked_student=linked_student,
+                                 previous=previous, local_id=local_id)
+            return record['seq']
+
+    def add_respondent(self, name, resp_type):
+        """
+        Journals a respondent added while the database can't be reached.
+        :return: the local id the respondent is known by until it is inserted
+        """
+        with self.lock:
+            record = self.append('respondent', name=name, resp_type=resp_type, local_id=self.next_local_id)
+            return record['local_id']
+
+    def synced(self, seq, new_id=None):
+        """
+        Records that an entry was saved, with the id of the administration or respondent in the database.
+        :return: None
+        """
+        self.append('synced', entry=seq, id=new_id)
+
+    def reject(self, seq, reason):
+        """
+        Records that an entry can't be saved, it is not replayed again.
+        :return: None
+        """
+        self.append('rejected', entry=seq, reason=reason)
+
+    def resolve(self, value):
+        """
+        Maps a local id to its database id, other ids are returned unchanged.
+        :return: the id, None if it is a local id that has not been saved yet
+        """
+        if value is None or value >= 0:
+            return value
+        return self.ids.get(value)
+
+    def entries(self):
+        """
+        :return: list of the pending entries in the order they were made
+        """
+        with self.lock:
+            return list(self.pending.values())
+
+    def __len__(self):
+        return len(self.pending)
+
+    def compact(self):
+        """
+        Rewrites the file with the pending entries, whose references to local ids that have been saved are replaced by
+        the database ids, and the entries rejected in the last KEEP_REJECTED_DAYS days.
+        :return: None
+        """
+        with self.lock:
+            if not os.path.exists(self.path):
+                return
+            cutoff = (datetime.datetime.now() - datetime.timedelta(days=KEEP_REJECTED_DAYS)).strftime('%Y-%m-%d')
+            self.rejected = [(entry, record) for entry, record in self.rejected if record['written'] >= cutoff]
+            records = []
+            for entry, record in self.rejected:
+                records.extend((entry, record))
+            for entry in self.pending.values():
+                for field in ('respondent_id', 'admin_id', 'linked_student'):
+                    if entry.get(field) is not None and entry[field] in self.ids:
+                        entry[field] = self.ids[entry[field]]
+                records.append(entry)
+            records.sort(key=lambda record: record['seq'])
+            with open(self.path + '.tmp', 'w') as f:
+                for record in records:
+                    f.write(json.dumps(record) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(self.path + '.tmp', self.path)
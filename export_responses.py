@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+
+"""
+Command line export of the survey responses for analysis. Each survey is written to its own file with one row per
+administration and one column per question (q1, q2, ... in question order), multiple choice answers joined with "; ".
+The responses are streamed from the database in fixed-size chunks and written out a chunk of administrations at a
+time, so memory use does not grow with the size of rs_response.
+
+Parquet and Arrow IPC output need pyarrow, CSV output works without it.
+
+usage: python export_responses.py -u USER -d DOMAIN [-p PASSWORD] [-f parquet|arrow|csv] [-o DIR] [SURVEY_ID ...]
+"""
+
+import os
+import csv
+import sys
+import time
+import getpass
+import argparse
+import datetime
+import queryfuncs as qf
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pa = None
+
+CHUNK_ROWS = 5000  # response rows fetched per round trip
+BATCH_ADMINISTRATIONS = 2000  # administrations per record batch / row group
+MULTIPLE_ANSWER_SEPARATOR = '; '
+ADMIN_COLUMNS = ('admin_id', 'respondent_id', 'date_taken', 'date_entered', 'last_updated')
+FORMATS = {'parquet': '.parquet', 'arrow': '.arrow', 'csv': '.csv'}
+
+
+def pivot(chunks, orders):
+    """
+    Turns the response rows of a survey, ordered by administration, into one row per administration.
+    :param chunks: iterable of lists of rows from qf.stream_survey_responses()
+    :param orders: the question orders of the survey, in column order
+    :return: generator of lists, the ADMIN_COLUMNS values followed by one answer per question (None if unanswered)
+    """
+    position = {order: index for index, order in enumerate(orders, len(ADMIN_COLUMNS))}
+    current = None
+    record = None
+    for rows in chunks:
+        for admin_id, respondent_id, date_taken, date_entered, last_updated, q_order, answer in rows:
+            if admin_id != current:
+                if record is not None:
+                    yield record
+                current = admin_id
+                record = [admin_id, respondent_id, date_taken, date_entered, last_updated] + [None] * len(orders)
+            index = position.get(q_order)
+            if index is None or answer is None:
+                continue  # a question no longer in the survey, or a response row with no answer
+            if record[index] is None:
+                record[index] = answer
+            else:
+                record[index] += MULTIPLE_ANSWER_SEPARATOR + answer
+    if record is not None:
+        yield record
+
+
+def _timestamp(value):
+    return value if isinstance(value, datetime.datetime) else None
+
+
+class ArrowWriter:
+    def __init__(self, path, columns, file_format):
+        """
+        Writes record batches to a Parquet file (a row group per batch) or an Arrow IPC file.
+        """
+        fields = [pa.field('admin_id', pa.int64()), pa.field('respondent_id', pa.int64())]
+        fields += [pa.field(name, pa.timestamp('s')) for name in ADMIN_COLUMNS[2:]]
+        fields += [pa.field(name, pa.string()) for name in columns[len(ADMIN_COLUMNS):]]
+        self.schema = pa.schema(fields)
+        if file_format == 'parquet':
+            self.writer = pa.parquet.ParquetWriter(path, self.schema)
+        else:
+            self.writer = pa.ipc.new_file(path, self.schema)
+
+    def write(self, records):
+        arrays = []
+        for index, field in enumerate(self.schema):
+            values = [record[index] for record in records]
+            if pa.types.is_timestamp(field.type):
+                values = [_timestamp(value) for value in values]
+            elif pa.types.is_integer(field.type):
+                values = [int(value) for value in values]
+            arrays.append(pa.array(values, type=field.type))
+        batch = pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+        if isinstance(self.writer, pa.parquet.ParquetWriter):
+            self.writer.write_table(pa.Table.from_batches([batch]))
+        else:
+            self.writer.write_batch(batch)
+
+    def close(self):
+        self.writer.close()
+
+
+class CSVWriter:
+    def __init__(self, path, columns, file_format='csv'):
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(columns)
+
+    def write(self, records):
+        self.writer.writerows(records)
+
+    def close(self):
+        self.file.close()
+
+
+def export_survey(con, survey_id, path, file_format='parquet', chunk_rows=CHUNK_ROWS,
+                  batch_administrations=BATCH_ADMINISTRATIONS):
+    """
+    Exports the responses to one survey.
+    :param con: backends.Connection object
+    :param survey_id: the id of the survey
+    :param path: the file written
+    :param file_format: 'parquet', 'arrow' or 'csv'
+    :param chunk_rows: response rows fetched per round trip
+    :param batch_administrations: administrations written at a time
+    :return: (administrations, response rows) exported
+    """
+    definition = qf.get_survey_definition(con, survey_id)
+    orders = [num for _, _, num in definition.questions]
+    columns = list(ADMIN_COLUMNS) + ['q{}'.format(num) for num in orders]
+    writer = (CSVWriter if file_format == 'csv' else ArrowWriter)(path, columns, file_format)
+
+    counts = {'rows': 0}
+
+    def counted(chunks):
+        for rows in chunks:
+            counts['rows'] += len(rows)
+            yield rows
+
+    administrations = 0
+    batch = []
+    try:
+        for record in pivot(counted(qf.stream_survey_responses(con, survey_id, chunk_rows)), orders):
+            batch.append(record)
+            if len(batch) >= batch_administrations:
+                writer.write(batch)
+                administrations += len(batch)
+                batch = []
+        if batch:
+            writer.write(batch)
+            administrations += len(batch)
+    finally:
+        writer.close()
+    return administrations, counts['rows']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Export survey responses, one file per survey.')
+    parser.add_argument('surveys', nargs='*', type=int, help='ids of the surveys to export, all if not given')
+    parser.add_argument('-u', '--user', default='', help='database username')
+    parser.add_argument('-p', '--password', help='database password, prompted for if not given')
+    parser.add_argument('-d', '--domain', required=True, help='Oracle domain or SQLite connection string')
+    parser.add_argument('-f', '--format', choices=sorted(FORMATS), default='parquet', help='output format')
+    parser.add_argument('-o', '--output', default='.', help='directory the files are written to')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help='response rows fetched per round trip')
+    args = parser.parse_args(argv)
+
+    if args.format != 'csv' and pa is None:
+        print('pyarrow is not installed, use --format csv or install pyarrow')
+        return 2
+
+    password = args.password
+    if password is None:
+        password = getpass.getpass() if args.user else ''
+    con = qf.connect(args.user, password, args.domain)
+    if con in (-1, -2):
+        return 2
+
+    surveys = qf.get_surveys(con)
+    if args.surveys:
+        surveys = [(survey_id, name) for survey_id, name in surveys if survey_id in args.surveys]
+    os.makedirs(args.output, exist_ok=True)
+    for survey_id, name in surveys:
+        path = os.path.join(args.output, 'survey_{}{}'.format(survey_id, FORMATS[args.format]))
+        start = time.perf_counter()
+        administrations, rows = export_survey(con, survey_id, path, args.format, args.chunk_rows)
+        elapsed = time.perf_counter() - start
+        print('{} ({}): {} administrations, {} responses in {:.2f} s -> {}'.format(
+            name, survey_id, administrations, rows, elapsed, path))
+    con.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+
+"""
+Layout plans for the SurveyEntry form. A plan says where every widget of every question goes on the form's grid (label
+and answer rows, column spans, the answer headers of table questions and the spacer rows between questions), worked out
+once from the survey definition. Plans are plain JSON-serializable data cached in memory and on disk, keyed by a hash
+of the definition, so a survey whose questions or choices change gets a new plan.
+"""
+
+import logging
+import os
+import json
+import hashlib
+
+logger = logging.getLogger(__name__)
+
+LAYOUT_FORMAT = 1  # bump when the plan layout changes, old cached plans are then ignored
+LAYOUT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.survey_entry', 'layouts')
+COLUMNS = 8  # the answers of table questions are right-aligned to this column
+FIRST_ROW = 3  # the first 2 rows are the header and instructions
+
+_layouts = {}
+
+
+def definition_version(definition):
+    """
+    :param definition: queryfuncs.SurveyDefinition
+    :return: hash of the questions, their types and choices
+    """
+    content = [LAYOUT_FORMAT, definition.survey_id, definition.questions,
+               sorted(definition.types.items()), sorted(definition.choices.items())]
+    return hashlib.sha1(json.dumps(content, default=str).encode()).hexdigest()[:16]
+
+
+def _answers(definition, quid):
+    return [text for _, text in definition.question_responses(quid)]
+
+
+def compile_layout(definition):
+    """
+    Places the questions of a survey in order. Single line answers take a label row and an answer row, choice
+    questions a label row and a row per choice. Table questions (types 4 and 5) take one row with the label on the
+    left and the answers right-aligned; a table of checkboxes starts with a header row of its answers when they differ
+    from the previous question's, and a spacer row ends a table when the next question's answers differ.
+    :param definition: queryfuncs.SurveyDefinition
+    :return: dict with the survey id, version and a list of question entries in question order. Each entry has the
+    question order (num), type, label [row, column span], response [row, column span] or buttons [[row, column], ...],
+    and optionally header [row, [[column, text], ...]] and spacer row.
+    """
+    quids = {num: quid for quid, _, num in definition.questions}
+    row = FIRST_ROW
+    entries = []
+    for quid, _, num in sorted(definition.questions, key=lambda question: question[2]):
+        qtype = int(definition.question_type(quid)[0])
+        entry = {'num': num, 'type': qtype}
+
+        if qtype in (1, 2):  # short entry answers
+            entry['label'] = [row, COLUMNS]
+            entry['response'] = [row + 1, COLUMNS]
+            row += 2
+
+        elif qtype in (4, 5):  # horizontal table answers
+            answers = _answers(definition, quid)
+            previous = _answers(definition, quids.get(num - 1))
+            if qtype == 5 and [ans.lower() for ans in answers] != [ans.lower() for ans in previous]:
+                entry['header'] = [row, [[COLUMNS - len(answers) + 1 + index, text] for index, text in enumerate(answers)]]
+                row += 1
+            entry['label'] = [row, COLUMNS - len(answers)]
+            entry['buttons'] = [[row, COLUMNS - len(answers) + 1 + index] for index in range(len(answers))]
+            row += 1
+
+        elif qtype in (3, 6):  # vertical choice answers
+            entry['label'] = [row, COLUMNS]
+            row += 1
+            entry['buttons'] = [[row + index, 0] for index in range(len(definition.question_responses(quid)))]
+            row += len(entry['buttons'])
+
+        # Add a blank line between questions unless the question is a "table" type in which case only add
+        # a blank row if the next question utilizes a different set of answers
+        if qtype in (1, 2, 3, 6):
+            entry['spacer'] = row
+            row += 1
+        elif qtype in (4, 5):
+            following = _answers(definition, quids.get(num + 1))
+            if [ans.lower() for ans in _answers(definition, quid)] != [ans.lower() for ans in following]:
+                entry['spacer'] = row
+                row += 1
+        entries.append(entry)
+    return {'format': LAYOUT_FORMAT, 'survey_id': definition.survey_id, 'version': definition_version(definition),
+            'questions': entries}
+
+
+def get_layout(definition, cache_dir=LAYOUT_CACHE_DIR):
+    """
+    Returns the layout plan of a survey: from memory, else from the disk cache, else compiled and written to the disk
+    cache. An unreadable cache file is recompiled, a cache directory that can't be written only costs the disk cache.
+    :param definition: queryfuncs.SurveyDefinition
+    :param cache_dir: directory of the cached plans, None to not use a disk cache
+    :return: dict of question order -> layout entry (see compile_layout())
+    """
+    version = definition_version(definition)
+    key = (definition.survey_id, version)
+    layout = _layouts.get(key)
+    if layout is not None:
+        return layout
+
+    plan = None
+    path = None
+    if cache_dir:
+        path = os.path.join(cache_dir, 'survey_{}_{}.json'.format(definition.survey_id, version))
+        try:
+            with open(path) as f:
+                plan = json.load(f)
+        except (OSError, ValueError):
+            plan = None
+    if plan is None:
+        plan = compile_layout(definition)
+        if path:
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                with open(path + '.tmp', 'w') as f:
+                    json.dump(plan, f)
+                os.replace(path + '.tmp', path)
+            except OSError as e:
+                logger.warning('Could not cache the layout of survey %s: %s', definition.survey_id, e)
+
+    layout = {entry['num']: entry for entry in plan['questions']}
+    _layouts[key] = layout
+    return layout
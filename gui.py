@@ -1,46 +1,58 @@
 #!/usr/bin/env python
 
+import logging
 import tkinter as tk
 from tkinter import messagebox
 import datetime
 import queryfuncs as qf
-from enter_survey import SurveyEntry
+from enter_survey import open_form, clear_forms
 from add_respondent import AddRespondent
+from virtual_table import VirtualTable, SelectionModel
+from db_worker import BusyIndicator
+
+logger = logging.getLogger(__name__)
+
+
+RESPONDENT_COLUMNS = [('ID', 7), ('Name', 25), ('District', 25), ('Cohort', 10), ('Type', 20)]
+TAKEN_SURVEY_COLUMNS = [('Survey Name', 15), ('Date Taken', 15), ('Date Entered', 15), ('Last Updated', 15)]
+AVAILABLE_SURVEY_COLUMNS = [('Survey Name', 15), ('Description', 30)]
+
+# ms between attempts to send the journaled surveys and respondents that could not be sent yet (see qf.sync_journal())
+SYNC_INTERVAL = 30000
+
 
 class Main:
-    def __init__(self, master, con):
+    def __init__(self, master, con, worker):
         """
         This is the main GUI of the entire app. Users are directed here after logging in and this window stays open during
         the duration of use. In this window, the user searches for respondents, can add a new parent/mentor respondent if
         one is not already entered, can view and select previously entered surveys to edit, or add a new survey administrations.
+        Searches and survey lookups run on the background DBWorker, a status line shows when it is busy.
 
         :param master: TK root object that this window is created in.
-        :param con: cx_Oracle connection object created during login process
+        :param con: backends.Connection object created during login process
+        :param worker: DBWorker created during login process, with its own connection
         """
         self.CON = con
+        self.worker = worker
         self.master = master
 
         # initialize future attributes
         self.resp_frame = None
-        self.resp_search_canvas = None
-        self.resp_search_vsb = None
+        self.respondents_table = None
         self.taken_surveys_frame = None
+        self.taken_surveys_table = None
         self.available_surveys_frame = None
+        self.available_surveys_table = None
         self.active_toadd_survey = None
         self.active_id = None
-        self.resp_widgets = None
-        self.active_resp = None
-        self.taken_surveys_widgets = None
         self.add_survey_button = None
         self.toadd_survey_name = None
-        self.available_surveys_widgets = None
-        self.taken_surveys_canvas = None
-        self.taken_surveys_vsb = None
-        self.resp_results_frame = None
-        self.search_vsb = None
-        self.taken_surveys_results_frame = None
         self.active_taken_survey = None
-        self.active_taken_survey_widgets = None
+        self.active_survey_id = None
+        self.offline = False
+        self.syncing = False
+        self.sync_again = False
 
         #Set Window information, in particular, bind the "return" key to search for respondents given the text entered
         self.master.protocol("WM_DELETE_WINDOW", self.exit_program)
@@ -63,79 +75,59 @@ class Main:
         self.titleInstructions.pack(anchor='w')
         self.respSearchEntry.pack()
         self.respSearchButton.pack()
+        self.status_label = tk.Label(self.respSearchFrame, text='', font=('Times New Roman', 10, 'italic'))
+        self.status_label.pack()
+        self.worker.add_busy_listener(BusyIndicator(self.master, self.status_label))
+
+        # Selections are tracked by row key, a survey can be selected in either the taken or the available table
+        self.respondent_selection = SelectionModel(key=lambda row: row[0])
+        self.taken_survey_selection = SelectionModel(key=lambda row: row[3])
+        self.available_survey_selection = SelectionModel(key=lambda row: row[0])
+        self.taken_survey_selection.exclude(self.available_survey_selection)
 
-        #Respondent Search Results frames and canvas construction
+        #Respondent Search Results table, only the visible rows have widgets (see virtual_table.py)
         self.resp_frame = tk.Frame(self.master)
         tk.Label(self.resp_frame, text='Please click on an ID', font=('Times New Roman', '11', 'bold')).pack(anchor='w', padx=20)
-        self.resp_search_canvas = tk.Canvas(self.resp_frame, borderwidth=0, height = 200, width=580, bg='#ffffff', bd=1)
-        self.search_vsb = tk.Scrollbar(self.resp_frame)
         self.resp_add = tk.Button(self.resp_frame, text="Add New Respondent", command=self.add_respondent)
         self.resp_add.pack(side='bottom', anchor='c')
-        self.resp_results_frame = tk.Frame(self.resp_search_canvas)
-        self.resp_search_canvas.config(yscrollcommand=self.search_vsb.set)
-        self.search_vsb.pack(side="right", fill='y')
-        self.resp_search_canvas.pack(side='left', fill='both', expand=True)
-        self.resp_search_canvas.create_window((0, 0), window=self.resp_results_frame, anchor='nw', tags='self.resp_results_frame')
-        self.search_vsb.config(command=self.resp_search_canvas.yview)
-        self.resp_results_frame.bind("<Configure>", self.onFrameConfigure)
+        self.respondents_table = VirtualTable(self.resp_frame, RESPONDENT_COLUMNS, height=10, bg='#ffffff', bd=1,
+                                              command=self.highlight_respondent, empty_text='Search for Respondents Above',
+                                              selection=self.respondent_selection)
+        self.respondents_table.pack(side='left', fill='both', expand=True)
         self.resp_frame.pack(anchor='w', padx=120)
-        self.resp_labels_frame = tk.Frame(self.resp_results_frame)
-        tk.Label(self.resp_labels_frame, text='ID', font=('Times New Roman', 10, 'bold'), width=7, bd=1).grid(row=2, column=0, sticky='nsew')
-        tk.Label(self.resp_labels_frame, text='Name', font=('Times New Roman', 10, 'bold'), width=25, bd=1).grid(row=2, column=1, sticky='nsew')
-        tk.Label(self.resp_labels_frame, text='District', font=('Times New Roman', 10, 'bold'), width=25, bd=1).grid(row=2, column=2, sticky='nsew')
-        tk.Label(self.resp_labels_frame, text='Cohort', font=('Times New Roman', 10, 'bold'), width=10, bd=1).grid(row=2, column=3, sticky='nsew')
-        tk.Label(self.resp_labels_frame, text='Type', font=('Times New Roman', 10, 'bold'), width=20, bd=1).grid(row=2, column=4, sticky='nsew')
-        self.resp_labels_frame.pack(anchor='w')
-        self.created_respondents_table = tk.Frame(self.resp_results_frame)
-        tk.Label(self.created_respondents_table, text='Search for Respondents Above', font=('Times New Roman', 10, 'italic'), width=75, bd=1).grid(row=1, column=0, columnspan=4, sticky='nsew')
-        self.created_respondents_table.pack(anchor='w')
-
-        #Taken Surveys construction, frames and canvas construction
+
+        #Taken Surveys table
         self.taken_surveys_frame = tk.Frame(self.master)
         tk.Label(self.taken_surveys_frame, text='Surveys Previously Entered', font=('Times New Roman', 11, 'bold')).pack(anchor='w')
         self.edit_survey_button = tk.Button(self.taken_surveys_frame, text='Edit Survey', width=12, command=self.edit_survey, state='disabled')
         self.edit_survey_button.pack(anchor='c',side='bottom')
-        self.taken_surveys_canvas = tk.Canvas(self.taken_surveys_frame, borderwidth=0, height = 125, width=450)
-        self.taken_surveys_vsb = tk.Scrollbar(self.taken_surveys_frame)
-        self.taken_surveys_results_frame = tk.Frame(self.taken_surveys_canvas, bg='#ffffff')
-        self.taken_surveys_canvas.config(yscrollcommand=self.taken_surveys_vsb.set)
-        self.taken_surveys_vsb.pack(side="right", fill='y')
-        self.taken_surveys_canvas.pack(side='left',fill='both', expand=True)
-        self.taken_surveys_canvas.create_window((0, 0), window=self.taken_surveys_results_frame, anchor='nw', tags='self.taken_surveys_results_frame')
-        self.taken_surveys_vsb.config(command=self.taken_surveys_canvas.yview)
-        self.taken_surveys_results_frame.bind("<Configure>", self.onFrameConfigure)
+        self.taken_surveys_table = VirtualTable(self.taken_surveys_frame, TAKEN_SURVEY_COLUMNS, height=6, stripes=('#ffffff',),
+                                                command=self.highlight_taken_survey, empty_text='No Surveys Found',
+                                                selection=self.taken_survey_selection)
+        self.taken_surveys_table.pack(side='left',fill='both', expand=True)
         self.taken_surveys_frame.pack(side='left',anchor='nw', pady=15, padx=10)
-        self.taken_surveys_labels = tk.Frame(self.taken_surveys_results_frame)
-        tk.Label(self.taken_surveys_labels, text='Survey Name', font=('Times New Roman', 10, 'bold'), width=15, bd=1, bg='#ffffff').grid(row=0, column=0, sticky='nsew')
-        tk.Label(self.taken_surveys_labels, text='Date Taken', font=('Times New Roman', 10, 'bold'), width=15, bd=1, bg='#ffffff').grid(row=0, column=1, sticky='nsew')
-        tk.Label(self.taken_surveys_labels, text='Date Entered', font=('Times New Roman', 10, 'bold'), width=15, bd=1, bg='#ffffff').grid(row=0, column=2, sticky='nsew')
-        tk.Label(self.taken_surveys_labels, text='Last Updated', font=('Times New Roman', 10, 'bold'), width=15, bd=1, bg='#ffffff').grid(row=0, column=3, sticky='nsew')
-        self.taken_surveys_labels.grid(row=0, sticky='nw')
-        self.taken_surveys_table = tk.Frame(self.taken_surveys_results_frame)
-        tk.Label(self.taken_surveys_table, text='No Surveys Found', font=('Times New Roman', 10, 'italic'), width=75, bd=1).grid(row=0, column=0, columnspan=4, sticky='nsew')
-        self.taken_surveys_table.grid(row=1, sticky='nw')
-
-        #Available surveys construction frames and canvas construction
+
+        #Available surveys table
         self.available_surveys_frame = tk.Frame(self.master, height=625, width = 300)
         self.add_survey_button = tk.Button(self.available_surveys_frame, text='Add Survey', width=12, command=self.add_survey, state='disabled')
         self.add_survey_button.pack(anchor='s', side='bottom')
         self.available_surveys_frame.pack(side='left', anchor='nw', pady=15, padx=10)
-        self.available_surveys_labels = tk.Frame(self.available_surveys_frame)
-        tk.Label(self.available_surveys_labels, text='Available Surveys: Please Select a Survey', font=('Times New Roman', 11, 'bold')).grid(row=0, columnspan=2, sticky='w')
-        tk.Label(self.available_surveys_labels, text='Survey Name', font=('Times New Roman', 10, 'bold'), width=15, bd=1).grid(row=1, column=0, sticky='w')
-        tk.Label(self.available_surveys_labels, text='Description', font=('Times New Roman', 10, 'bold'), width=10, bd=1).grid(row=1, column=1, sticky='w')
-        self.available_surveys_labels.pack(anchor='w')
-        self.available_surveys_table = tk.Frame(self.available_surveys_frame)
-        tk.Label(self.available_surveys_table, text='No Surveys Found', font=('Times New Roman', 10, 'italic'), bd=1).grid(row=0, column=0, columnspan=2, sticky='nsew')
+        tk.Label(self.available_surveys_frame, text='Available Surveys: Please Select a Survey', font=('Times New Roman', 11, 'bold')).pack(anchor='w')
+        self.available_surveys_table = VirtualTable(self.available_surveys_frame, AVAILABLE_SURVEY_COLUMNS, height=6,
+                                                    stripes=('#ffffff',), command=self.unlock_add_survey,
+                                                    empty_text='No Surveys Found', selection=self.available_survey_selection)
         self.available_surveys_table.pack(anchor='w')
 
+        # Entries left in the journal by an earlier session are sent right away
+        self.sync_job = self.master.after(0, self.sync_entries)
+
     def add_respondent(self):
         """
         Button method used open the AddRespondent window and begin that process (see add_respondent.py)
         :return: None, opens a new window.
         """
         self.addrespondentwindow = tk.Toplevel(self.master)
-        self.app = AddRespondent(self.addrespondentwindow, self, self.CON)
+        self.app = AddRespondent(self.addrespondentwindow, self, self.CON, self.worker)
 
     def onMouseWheel(self, event):
         """
@@ -153,7 +145,8 @@ class Main:
 
     def findCanvas(self, widget):
         """
-        Utility method that recursively checks if the mouse is sitting on top of a canvas. When the scrollbutton is
+        Utility method that recursively checks if the mouse is sitting on top of a canvas (or a VirtualTable, which scrolls
+        the same way). When the scrollbutton is
         "pressed," Tkinter automatically associates it with the top-most widget. This function checks to see if that widget
         is a canvas, and if so, returns the widget object. Otherwise the fuction recursively calls itself again with the
         widget.parent() as the argument. This is performed until the widget passed is the master as set during the __init__()
@@ -165,20 +158,11 @@ class Main:
         #print(widget)
         if widget == self.master:
             return False
-        elif isinstance(widget, tk.Canvas):
+        elif isinstance(widget, (tk.Canvas, VirtualTable)):
             return widget
         else:
             return self.findCanvas(widget.master)
 
-    def onFrameConfigure(self, event):
-        """
-        Method called to configure the canvas to scroll through the entire frame contained within.
-        :param event: catch for event passed by tkinter.
-        :return: None, sets the canvas scroll region to the entire bounded box.
-        """
-        cnvs = event.widget.master
-        cnvs.configure(scrollregion=cnvs.bbox("all"))
-
     def exit_program(self):
         """
         Method called when the window is closed using the window manager "X" to ensure that the connection is disconnected.
@@ -195,248 +179,121 @@ class Main:
         :param args: catchall for the arguments passed by tkinter, currently unused.
         :return: None, calls "create_respondents_table()" to generate a tkinter table
         """
-        self.active_resp = {}
         self.active_id = None
+        self.respondent_selection.clear()
         text = self.respSearchStr.get()
-        results = qf.search_for_names(self.CON, text)
-        print(results)
-        #print(results)
-        self.create_respondents_table(results)
+        # a newer search replaces one still running, and a new respondent list cancels their pending surveys
+        self.worker.cancel('taken_surveys')
+        self.worker.cancel('available_surveys')
+        self.worker.submit(qf.search_for_names, text, callback=self.create_respondents_table, key='search')
 
     def create_respondents_table(self, respondents):
         """
-        Method for creating the table that displays all potential respondents that match the search field for which
-        surveys can be edited or entered. First deletes all previous respondent information (their taken and available surveys)
-        along with the existing created_respondents_table. Then it loops through the list of respondents passed and generates
-        a new row for each respondent. Each row is selectable by clicking on any of the labels which stores that respondent's
-        ID for use.
+        Method for filling the table that displays all potential respondents that match the search field for which
+        surveys can be edited or entered. First clears all previous respondent information (their taken and available
+        surveys), then hands the respondents to the VirtualTable, which only builds widgets for the rows in view. Each
+        row is selectable by clicking on any of its labels which stores that respondent's ID for use.
         :param respondents: a list of respondents as generated from the qf.search_for_names() function.
-        :return: None, creates a set of tkinter objects and places them into the window.
+        :return: None, fills the respondents table in the window.
         """
-        for child in self.created_respondents_table.winfo_children():
-            child.destroy()
-        if self.taken_surveys_table:
-            for child in self.taken_surveys_table.winfo_children():
-                child.destroy()
-        if self.available_surveys_table:
-            for child in self.available_surveys_table.winfo_children():
-                child.destroy()
-
-        if not respondents:
-            tk.Label(self.created_respondents_table, text='No Respondents Found', font=('Times New Roman', '10', 'bold italic'), width = 75).grid(row=1, column=0, columnspan = 4, sticky = 'nsew')
+        self.taken_surveys_table.clear('No Surveys Found')
+        self.available_surveys_table.clear('No Surveys Found')
+        self.active_toadd_survey = None
+        self.active_taken_survey = None
+        self.edit_survey_button.config(state='disabled')
+        self.add_survey_button.config(state='disabled')
+        self.respondents_table.set_rows(respondents, empty_text='No Respondents Found')
 
-        else:
-            self.resp_widgets = {}
-            for rowid, row in enumerate(respondents):
-                if rowid % 2 == 0:
-                    bgcol = '#ffffcc'
-                else:
-                    bgcol = '#ffffff'
-                self.resp_widgets[rowid] = {
-                    'rowid':rowid,
-                    'id': tk.Label(self.created_respondents_table, text=row[0], bg=bgcol, width=7, bd=1),
-                    'name': tk.Label(self.created_respondents_table, text=row[1], bg=bgcol, width=25, bd=1),
-                    'district': tk.Label(self.created_respondents_table, text=row[2], bg=bgcol, width=25, bd=1),
-                    'cohort': tk.Label(self.created_respondents_table, text=row[3], bg=bgcol, width=10, bd=1),
-                    'type': tk.Label(self.created_respondents_table, text=row[4], bg=bgcol, width=20, bd=1)
-                }
-
-                self.resp_widgets[rowid]['id'].grid(row=rowid, column=0, sticky='nsew')
-                self.resp_widgets[rowid]['id'].bind('<Button-1>', self.highlight_respondent)
-                self.resp_widgets[rowid]['name'].grid(row=rowid, column=1, sticky='nsew')
-                self.resp_widgets[rowid]['name'].bind('<Button-1>', self.highlight_respondent)
-                self.resp_widgets[rowid]['district'].grid(row=rowid, column=2, sticky='nsew')
-                self.resp_widgets[rowid]['district'].bind('<Button-1>', self.highlight_respondent)
-                self.resp_widgets[rowid]['cohort'].grid(row=rowid, column=3, sticky='nsew')
-                self.resp_widgets[rowid]['cohort'].bind('<Button-1>', self.highlight_respondent)
-                self.resp_widgets[rowid]['type'].grid(row=rowid, column=4, sticky='nsew')
-                self.resp_widgets[rowid]['type'].bind('<Button-1>', self.highlight_respondent)
-
-        self.created_respondents_table.pack(anchor='w')
-
-    def highlight_respondent(self, event):
-        """
-        Utility method used to simulate the "selecting" of a table row. When a label is clicked, that label is back referenced
-        to find the row and all corresponding labels in that row. The default background for each label in that row is stored
-        and the backgrounds for each label is set to a light blue. If a row had been previously selected, that old row has
-        its default background returned and the new row overwrites the saved information. A new respondent also necessitates
-        that the frames containing the taken and available surveys are rebuilt and the old information deselected.
-        :param event: the event widget passed by tkinter
-        :return: None, changes the backgrounds and sets self.active_id to the selected student and populates other frames
-        """
-        # Set previously selected to old color
-        selected_widget = event.widget
-
-        #clear all selections
-        if self.active_resp:
-            for i in range(len(self.active_resp)):
-                self.active_resp[i]['widget'].config(bg = self.active_resp[i]['bg'])
-        for child in self.taken_surveys_table.winfo_children():
-            child.destroy()
-        for child in self.available_surveys_table.winfo_children():
-            child.destroy()
+    def highlight_respondent(self, row):
+        """
+        Utility method called when a row of the respondents table is clicked. The table's selection model highlights the
+        row, and a new respondent necessitates that the frames containing the taken and available surveys are rebuilt
+        and the old information deselected.
+        :param row: the clicked respondent row, passed by the VirtualTable
+        :return: None, sets self.active_id to the selected student and populates other frames
+        """
+        self.taken_surveys_table.clear()
+        self.available_surveys_table.clear()
 
         self.active_toadd_survey = None
-        self.active_taken_survey_widgets = None
         self.active_taken_survey = None
         self.edit_survey_button.config(state='disabled')
         self.add_survey_button.config(state='disabled')
 
-        self.active_resp= []
-        selected_row = None
-
-        for i in range(len(self.resp_widgets)):
-            rowwidgets = self.resp_widgets[i]
-            for widget in rowwidgets.values():
-                #print(widget)
-                if widget == selected_widget:
-                    if widget in [widg['widget'] for widg in self.active_resp]:
-                        return
-                    selected_row = self.resp_widgets[i]['rowid']
-                    break
-
-        for key, widget in self.resp_widgets[selected_row].items():
-            #print(widget)
-            if key != 'rowid':
-                self.active_resp.append({
-                    'widget':widget,
-                    'bg':widget.cget('bg')
-                })
-                widget.config(bg='lightblue')
-
-        resp_id = self.resp_widgets[selected_row]['id'].cget('text')
-        self.active_taken_survey_widgets= []
-        self.active_id = resp_id
-        self.active_toadd_survey = {}
+        self.active_id = row[0]
         self.get_taken_surveys()
         self.get_available_surveys()
 
     def get_taken_surveys(self, *args):
         """
-        Method used to populate the frame that displays all surveys previously entered for a selected respondent. This frame
-        is displayed as a table, is scrollable, and rows are selectable. Selecting a row here necessarily deselects any
-        row in the "available surveys" frame. Selecting a new respondent deselects any row here as well.
+        Method used to populate the table that displays all surveys previously entered for a selected respondent. This
+        table is scrollable, and rows are selectable. Selecting a row here necessarily deselects any row in the
+        "available surveys" table. Selecting a new respondent deselects any row here as well.
         :param args: catch-all for passed arguments. Unused.
-        :return: None, constructs a frame and places it into the master window.
+        :return: None, fills the taken surveys table.
         """
-        print('getting taken surveys')
-        if self.taken_surveys_table.winfo_children():
-            for child in self.taken_surveys_table.winfo_children():
-                child.destroy()
-
-        self.active_taken_survey_widgets = {}
+        self.worker.submit(qf.get_taken_surveys, self.active_id, callback=self.fill_taken_surveys, key='taken_surveys')
 
-        surveys = qf.get_taken_surveys(self.CON, self.active_id)
+    def fill_taken_surveys(self, surveys):
+        self.taken_surveys_table.set_rows(surveys, self.format_taken_survey, 'No Surveys Found')
 
-        if not surveys:
-            tk.Label(self.taken_surveys_table, text='No Surveys Found').grid()
+    @staticmethod
+    def format_taken_survey(row):
+        """
+        Formats a row from qf.get_taken_surveys() for display: survey name, date taken, date entered, last updated.
+        """
+        return row[0], datetime.datetime.date(row[1]), row[2], row[5]
 
-        else:
-            self.taken_surveys_widgets = {}
-            for rowid, row in enumerate(surveys):
-                #print('Last updated: {}'.format(row[5]))
-                self.taken_surveys_widgets[rowid] = {
-                    'rowid':rowid,
-                    'id': row[3],
-                    'survey_id': row[4],
-                    'survey': tk.Label(self.taken_surveys_table, text=row[0], width=15, bg='#ffffff'),
-                    'taken': tk.Label(self.taken_surveys_table, text=datetime.datetime.date(row[1]), width=15, bg='#ffffff'),
-                    'entered': tk.Label(self.taken_surveys_table, text=row[2], width=15, bg='#ffffff'),
-                    'updated':tk.Label(self.taken_surveys_table, text=row[5], width=15, bg='#ffffff')
-                }
-
-                self.taken_surveys_widgets[rowid]['survey'].grid(row=rowid, column=0, sticky='nsew')
-                self.taken_surveys_widgets[rowid]['survey'].bind("<Button-1>", self.highlight_taken_survey)
-                self.taken_surveys_widgets[rowid]['taken'].grid(row=rowid, column=1, sticky='nsew')
-                self.taken_surveys_widgets[rowid]['taken'].bind("<Button-1>", self.highlight_taken_survey)
-                self.taken_surveys_widgets[rowid]['entered'].grid(row=rowid, column=2, sticky='nsew')
-                self.taken_surveys_widgets[rowid]['entered'].bind("<Button-1>", self.highlight_taken_survey)
-                self.taken_surveys_widgets[rowid]['updated'].grid(row=rowid, column=3, sticky='nsew')
-                self.taken_surveys_widgets[rowid]['updated'].bind("<Button-1>", self.highlight_taken_survey)
-
-        self.taken_surveys_table.grid(row=1)
-
-    def highlight_taken_survey(self, event):
+    def highlight_taken_survey(self, row):
         """
         Utility method used to simulate "selection" of a taken survey. The user can select a taken survey of a respondent
         and edit the responses. Selection is done by left-mouse clicking any row after selecting a respondent. This necessarily
-        deselects any selection made in the "Available Surveys" frame.
-        :param event: event catch passed by tkinter.
+        deselects any selection made in the "Available Surveys" table (the two selection models exclude each other).
+        :param row: the clicked survey administration row, passed by the VirtualTable
         :return: None, passes the administration_id of the selected survey to the class to be used during the edit process.
         """
-        selected_widget = event.widget
-        #erase taken survey highlighting
-        if self.active_taken_survey_widgets:
-            for i in range(len(self.active_taken_survey_widgets)):
-                self.active_taken_survey_widgets[i]['widget'].config(bg ='#ffffff')
-
-        #erase new survey highlighting
-        if self.active_toadd_survey:
-            for i in range(len(self.active_toadd_survey)):
-                self.active_toadd_survey[i]['widget'].config(bg = self.active_toadd_survey[i]['bg'])
-
-        self.active_toadd_survey= []
+        self.active_toadd_survey = None
         self.add_survey_button.config(state='disabled')
-        self.active_taken_survey_widgets= []
-        selected_row = None
-
-        for i in range(len(self.taken_surveys_widgets)):
-            rowwidgets = self.taken_surveys_widgets[i]
-            for widget in rowwidgets.values():
-                #print(widget)
-                if widget == selected_widget:
-                    if widget in [widg['widget'] for widg in self.active_taken_survey_widgets]:
-                        return
-                    selected_row = self.taken_surveys_widgets[i]['rowid']
-                    break
-
-        for key, widget in self.taken_surveys_widgets[selected_row].items():
-            #print(widget)
-            if key not in ('rowid', 'id', 'survey_id'):
-                self.active_taken_survey_widgets.append({
-                    'widget':widget,
-                    'bg':widget.cget('bg')
-                })
-                widget.config(bg='lightblue')
-
-        active_survey = self.taken_surveys_widgets[selected_row]['id']
-
-        self.active_taken_survey = active_survey
-        self.active_survey_id = self.taken_surveys_widgets[selected_row]['survey_id']
+
+        self.active_taken_survey = row[3]
+        self.active_survey_id = row[4]
         self.edit_survey_button.config(state='normal')
 
     def edit_survey(self):
         """
-        Method used to open the SurveyEntry window while passing the necessary information to enable editing.
+        Method used to open the SurveyEntry window while passing the necessary information to enable editing. The survey
+        definition and the previously given answers are loaded on the worker first, the window opens when they are ready.
+        :return: None, opens a new tkinter window.
+        """
+        survey_id, resp_id, admin_id = self.active_survey_id, self.active_id, self.active_taken_survey
+
+        def load(con):
+            qf.get_survey_definition(con, survey_id)
+            return qf.get_given_answers(con, admin_id)
+
+        self.worker.submit(load, key='open_survey',
+                           callback=lambda old_answers: self.open_survey(survey_id, resp_id, admin_id, True, old_answers))
+
+    def open_survey(self, survey_id, resp_id, admin_id=None, edit=False, old_answers=None):
+        """
+        Opens the SurveyEntry window (reusing a hidden one of the survey), called once the survey definition is cached.
         :return: None, opens a new tkinter window.
         """
-        self.newwindow = tk.Toplevel(self.master)
-        self.app = SurveyEntry(self.newwindow, self.CON, self.active_survey_id, self.active_id, self.active_taken_survey, True, self )
+        self.app = open_form(self.master, self.CON, survey_id, resp_id, admin_id, edit, self, self.worker, old_answers)
+        self.newwindow = self.app.master
 
     def get_available_surveys(self):
         """
-        Method used to generate a frame that contains the possible surveys a respondent can have entered. This is generated
-        from a list returned by qf.get_available_surveys() and is presented in table format. User can select a survey to
-        enter, this necessarily deselects any survey selected in the "Taken Surveys" frame. This frame is regenerated if a
-        new respondent is selected.
-        :return: None, generates a frame and places it in the master window.
-        """
-        surveys = qf.get_available_surveys(self.CON, self.active_id)
-        self.available_surveys_widgets = {}
-        for rowid, row in enumerate(surveys):
-            self.available_surveys_widgets[rowid] = {
-                'rowid': rowid,
-                'id': row[0],
-                'name': tk.Label(self.available_surveys_table, text=row[1]),
-                'description': tk.Label(self.available_surveys_table, text=row[2], anchor='w')
-            }
-
-            self.available_surveys_widgets[rowid]['name'].grid(row=rowid, column=0, sticky='nsew')
-            self.available_surveys_widgets[rowid]['name'].bind('<Button-1>', self.unlock_add_survey)
-            self.available_surveys_widgets[rowid]['description'].grid(row=rowid, column=1, sticky='nsew')
-            self.available_surveys_widgets[rowid]['description'].bind('<Button-1>', self.unlock_add_survey)
-
-        self.available_surveys_table.pack(anchor='nw')
+        Method used to fill the table that contains the possible surveys a respondent can have entered. This is generated
+        from a list returned by qf.get_available_surveys(). User can select a survey to enter, this necessarily deselects
+        any survey selected in the "Taken Surveys" table. This table is refilled if a new respondent is selected.
+        :return: None, fills the available surveys table.
+        """
+        self.worker.submit(qf.get_available_surveys, self.active_id, callback=self.fill_available_surveys,
+                           key='available_surveys')
+
+    def fill_available_surveys(self, surveys):
+        self.available_surveys_table.set_rows(surveys, lambda row: row[1:], 'No Surveys Found')
 
     def add_survey(self):
         """
@@ -445,69 +302,99 @@ class Main:
         for a new respondent, or by selecting a "taken survey") then the button is disabled.
         :return: None, opens a new tkinter window using the SurveyEntry class.
         """
-        survey_id = qf.get_survey_id(self.CON, self.toadd_survey_name)
-        self.newwindow = tk.Toplevel(self.master)
-        self.app = SurveyEntry(self.newwindow, self.CON, survey_id, self.active_id, parentwindow=self)
+        survey_id, resp_id = self.active_toadd_survey, self.active_id
+        self.worker.submit(qf.get_survey_definition, survey_id, key='open_survey',
+                           callback=lambda definition: self.open_survey(survey_id, resp_id))
 
-    def unlock_add_survey(self, event):
+    def unlock_add_survey(self, row):
         """
         Utility method used to enable the "add survey" button. This method is only called when a selection is made from
         "available surveys"
-        :param event: tkinter event object
+        :param row: the clicked available survey row, passed by the VirtualTable
         :return: None, changes the status of the "add_survey" button widget.
         """
-        if self.active_taken_survey_widgets:
-            for i in range(len(self.active_taken_survey_widgets)):
-                self.active_taken_survey_widgets[i]['widget'].config(bg ='#ffffff')
-            self.active_taken_survey_widgets= []
+        self.active_taken_survey = None
+        self.edit_survey_button.config(state='disabled')
 
-        #erase new survey highlighting
-        if self.active_toadd_survey:
-            for i in range(len(self.active_toadd_survey)):
-                self.active_toadd_survey[i]['widget'].config(bg = self.active_toadd_survey[i]['bg'])
-            self.active_toadd_survey= []
+        self.active_toadd_survey = row[0]
+        self.toadd_survey_name = row[1]
+        self.add_survey_button.config(state='normal')
 
-        self.edit_survey_button.config(state='disabled')
+    def sync_entries(self):
+        """
+        Sends the journaled entries that have not been saved yet on the worker (see qf.sync_journal()) and schedules the
+        next attempt in SYNC_INTERVAL ms. When the last attempt found the database unreachable the worker opens a new
+        connection first.
+        :return: None
+        """
+        if qf.pending_entries():
+            if self.offline:
+                self.worker.run(self.worker.reconnect, errback=self.reconnect_failed)
+            self.send_entries(force=True)
+        self.sync_job = self.master.after(SYNC_INTERVAL, self.sync_entries)
 
-        selected_widget = event.widget
+    def send_entries(self, force=False):
+        """
+        Sends the journaled entries on the worker now, called by the SurveyEntry windows once a survey is journaled.
+        While the database can't be reached they are left for the next attempt of sync_entries(). One qf.sync_journal()
+        runs at a time, the entries journaled in the meantime are sent once it is done.
+        :param force: send even if the last attempt found the database unreachable
+        :return: None
+        """
+        if self.offline and not force:
+            return
+        if self.syncing:
+            self.sync_again = True
+            return
+        self.syncing = True
+        self.sync_again = False
+        self.worker.submit(qf.sync_journal, callback=self.entries_synced, errback=self.sync_failed)
 
-        self.edit_survey_button.config(state='disabled')
-        self.active_taken_survey = None
-        self.active_taken_survey_widgets = []
-
-        if self.active_toadd_survey:
-            for i in range(len(self.active_toadd_survey)):
-                self.active_toadd_survey[i]['widget'].config(bg = self.active_toadd_survey[i]['bg'])
-
-        self.active_toadd_survey= []
-        selected_row = None
-
-        for i in range(len(self.available_surveys_widgets)):
-            rowwidgets = self.available_surveys_widgets[i]
-            for widget in rowwidgets.values():
-                #print(widget)
-                if widget == selected_widget:
-                    selected_row = self.available_surveys_widgets[i]['rowid']
-                    break
-
-        for key, widget in self.available_surveys_widgets[selected_row].items():
-            #print(widget)
-            if key not in ('rowid', 'id'):
-                self.active_toadd_survey.append({
-                    'widget':widget,
-                    'bg':widget.cget('bg')
-                })
-                widget.config(bg='lightblue')
+    def sync_failed(self, e):
+        self.syncing = False
+        logger.warning('Could not send the journaled entries: %s', e)
 
-        self.add_survey_button.config(state='normal')
-        self.toadd_survey_name = self.available_surveys_widgets[selected_row]['name'].cget('text')
+    def reconnect_failed(self, e):
+        logger.warning('Could not reconnect to the database: %s', e)
+
+    def entries_synced(self, result):
+        """
+        Called on the Tk thread with the qf.SyncResult of sync_entries(). Entries that were rejected are listed to the
+        user, they stay in the journal file for review.
+        :param result: qf.SyncResult
+        :return: None
+        """
+        self.syncing = False
+        self.offline = result.offline
+        if result.synced or result.rejected:
+            logger.info('Journal: %s', result)
+        if result.synced and self.active_id is not None:
+            self.get_taken_surveys()
+        if result.rejected:
+            messagebox.showwarning('Entries Not Saved', 'These journaled entries could not be saved, they are kept '
+                                   'in the journal file:\n\n' + '\n'.join(reason for _, reason in result.rejected))
+        if self.sync_again or (result.pending and not result.offline):
+            # entries journaled during the sync, or more than one batch
+            self.send_entries(force=True)
 
     def con_disconnect(self):
         """
-        Utility method used to disconnect from the oracle db
+        Utility method used to disconnect from the oracle db and stop the worker. The pool statistics are logged to
+        help size the pool (see backends.ConnectionPool.stats()), followed by the queryfuncs call statistics.
         :return: None
         """
+        self.master.after_cancel(self.sync_job)
+        self.worker.close()
+        clear_forms()
+        if qf.pending_entries():
+            logger.info('%s journaled entries will be sent at the next login', qf.pending_entries())
         if self.CON:
+            pool = self.CON.pool
+            logger.info('Statement cache: %s', self.CON.statement_stats())
             self.CON.close()
+            if pool is not None:
+                logger.info('Connection pool: %s', pool.stats())
+                pool.close()
+            logger.info('\n'.join(qf.query_stats.stats.summary()))
             #print('closed connection')
         self.master.destroy()
@@ -1,9 +1,14 @@
 #!/usr/bin/env python
 
+import logging
 import tkinter as tk
 from tkinter import messagebox
 import queryfuncs as qf
+import backends
 from gui import Main
+from db_worker import DBWorker, BusyIndicator
+
+logger = logging.getLogger(__name__)
 
 
 CREDENTIALS_ERROR = 'Login Unsuccessful.\nPlease check your credentials.'
@@ -13,13 +18,15 @@ DATABASE_ERROR = 'Database Error.\nPlease contact the administrator'
 class Login:
     def __init__(self, master):
         """
-        Login process utilizing an Oracle db for queries and cx_Oracle for query handling. Opens the main GUI if login
-        is successful.
+        Login process utilizing an Oracle db for queries and cx_Oracle for query handling, or a local SQLite file when the
+        domain is a SQLite connection string (sqlite:///path/to/file.db). Opens the main GUI if login is successful. The
+        connections are opened on the background DBWorker so the window stays responsive while connecting.
         :param master: TK Master root
         :return: None
         """
 
         self.master = master
+        self.worker = DBWorker(self.master)
         self.master.title("Database Login")
         self.frame = tk.Frame(self.master)
         self.frame.pack()
@@ -39,7 +46,12 @@ class Login:
         self.loginDomainEntry = tk.Entry(self.frame, textvariable=self.loginDomain)
         self.loginDomainEntry.grid(row=3, column=1, sticky='w')
 
-        tk.Button(self.frame, text='Login', width=10, command=self.try_login).grid(row=self.frame.grid_size()[1]+1, columnspan=2, pady=5)
+        self.login_button = tk.Button(self.frame, text='Login', width=10, command=self.try_login)
+        self.login_button.grid(row=self.frame.grid_size()[1]+1, columnspan=2, pady=5)
+        self.status_label = tk.Label(self.frame, text='')
+        self.status_label.grid(row=self.frame.grid_size()[1]+1, columnspan=2)
+        self.busy_indicator = BusyIndicator(self.master, self.status_label, 'Connecting...')
+        self.worker.add_busy_listener(self.busy_indicator)
         self.master.bind('<Return>', self.try_login)
 
     def try_login(self, *args):
@@ -49,15 +61,51 @@ class Login:
         :param args: catchall, not used.
         :return: None
         """
+        if self.worker.busy:
+            return
         name = self.loginName.get()
         pw = self.loginPw.get()
         domain = self.loginDomain.get()
-        con = qf.connect(name, pw, domain)
+        backend = backends.get_backend(domain)
+        self.login_button.config(state='disabled')
+        self.worker.run(self.open_session, name, pw, domain, backend, callback=self.session_opened,
+                        errback=self.session_failed)
+
+    def open_session(self, name, pw, domain, backend):
+        """
+        Runs on the worker thread. Creates the session's connection pool, checks out the worker's connection, builds
+        the respondent index, loads the survey metadata, opens the entry journal and checks out a second connection for
+        the queries still made from the Tk thread.
+        :return: the connection for the Tk thread, or the error code returned by qf.create_pool()
+        """
+        pool = qf.create_pool(name, pw, domain, backend)
+        if pool in (-1, -2):
+            return pool
+        if self.worker.con is not None:
+            self.worker.con.pool.close()  # left over from an earlier attempt that failed after connecting
+        con = self.worker.con = pool.acquire()
+        qf.build_respondent_index(con)
+        qf.load_survey_metadata(con, domain)
+        qf.open_journal(domain)
+        return pool.acquire()
+
+    def session_opened(self, con):
+        """
+        Called on the Tk thread with the result of open_session(), opens the main GUI if the login was successful.
+        :param con: backends.Connection object or an error code
+        :return: None
+        """
+        self.login_button.config(state='normal')
         if con == -2:
             messagebox.showerror('Credentials Error', CREDENTIALS_ERROR)
         elif con == -1:
             messagebox.showerror('Database Error', DATABASE_ERROR)
         else:
+            self.worker.remove_busy_listener(self.busy_indicator)
             self.master.withdraw()
             self.newWindow = tk.Toplevel(self.master)
-            self.app = Main(self.newWindow, con)
\ No newline at end of file
+            self.app = Main(self.newWindow, con, self.worker)
+
+    def session_failed(self, e):
+        logger.error('Database connection error: %s', e)
+        self.session_opened(-1)
\ No newline at end of file
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+
+"""
+Local copy of the survey metadata (surveys, questions, question order, question types and answer choices), so that
+opening a survey after login makes no metadata queries. The copy is a JSON file per database, stored with the checksum
+of the metadata tables it was read at (queryfuncs.METADATA_VERSION_QUERY); queryfuncs.load_survey_metadata() uses it
+only while the database still returns the same checksum, and rewrites it otherwise.
+"""
+
+import logging
+import os
+import json
+import hashlib
+
+logger = logging.getLogger(__name__)
+
+CACHE_FORMAT = 1  # bump when the file layout changes, old files are then ignored
+METADATA_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.survey_entry')
+
+
+def cache_path(domain, cache_dir=METADATA_CACHE_DIR):
+    """
+    :param domain: the Oracle domain or SQLite connection string logged in to
+    :param cache_dir: directory of the cache files
+    :return: path of the database's cache file
+    """
+    key = hashlib.sha1(domain.strip().lower().encode()).hexdigest()[:12]
+    return os.path.join(cache_dir, 'metadata_{}.json'.format(key))
+
+
+def read(path, version):
+    """
+    Reads a cache file written by write().
+    :param path: the cache file
+    :param version: the current metadata checksum, a file written at another checksum is ignored
+    :return: dict of survey id -> (name, definition rows, choice rows) as given to write(), None if there is no usable
+    cache
+    """
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get('format') != CACHE_FORMAT or data.get('version') != version:
+        return None
+    return {int(survey_id): (name, [tuple(row) for row in rows], [tuple(row) for row in choice_rows])
+            for survey_id, (name, rows, choice_rows) in data['surveys'].items()}
+
+
+def write(path, version, surveys):
+    """
+    Replaces the cache file. A cache that can't be written is reported and otherwise ignored.
+    :param path: the cache file
+    :param version: the metadata checksum the surveys were read at (a JSON-serializable value)
+    :param surveys: dict of survey id -> (name, GET_SURVEY_DEFINITION_QUERY rows, GET_SURVEY_CHOICES_QUERY rows)
+    :return: None
+    """
+    data = {'format': CACHE_FORMAT, 'version': version, 'surveys': surveys}
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(data, f, default=str)
+        os.replace(path + '.tmp', path)
+    except OSError as e:
+        logger.warning('Could not write the survey metadata cache: %s', e)
@@ -1,19 +1,24 @@
 #!/usr/bin/env python
 
 import tkinter as tk
-import queryfuncs as qf
+from virtual_table import VirtualTable
+
+
+MATCH_COLUMNS = [('ID', 5), ('Name', 15), ('District', 15), ('Match Percent', 12), ('Linked Students', 30)]
 
 class PossibleMatches:
-    def __init__(self, master, con, previous_window, matches):
+    def __init__(self, master, con, previous_window, matches, linked_students):
         """
         TK Window opened when the user attempted to add a new respondent that had a fuzzy string comparison match of 50%
-        or more to an existing respondent. Includes a scrollable table that displays the existing respondent's information
+        or more to an existing respondent. Includes a scrollable VirtualTable that displays the existing respondent's information
         for comparison.
 
         :param master: TK window root
         :param con: cx_oracle connection object
         :param previous_window: the "add_respondent" window that opened this window
-        :param matches: the list of potential matches from the fuzzywuzzy comparison
+        :param matches: the list of potential matches from DuplicateFinder.find()
+        :param linked_students: dict of respondent id -> list of the students it was linked to, for every match (see
+        qf.get_linked_students())
         """
         self.master = master
         self.con = con
@@ -23,45 +28,13 @@ class PossibleMatches:
         self.masterframe = tk.Frame(self.master)
         self.masterframe.pack()
         tk.Label(self.masterframe, text='Possible Respondent Matches', font=('Times New Roman', 18, 'bold')).pack(anchor='w')
-        self.canvasframe = tk.Frame(self.masterframe)
-        self.canvasframe.pack()
-
-        self.canvas = tk.Canvas(self.canvasframe, width=600, borderwidth=0, bg='#ffffff')
-        self.vsb = tk.Scrollbar(self.canvasframe)
-        self.results_frame = tk.Frame(self.canvas)
-        self.canvas.config(yscrollcommand=self.vsb.set)
-        self.vsb.pack(side="right", fill='y')
-        self.canvas.pack(side='left', fill='both', expand=True)
-        self.canvas.create_window((4, 4), window=self.results_frame, anchor='nw', tags='self.results_frame')
-        self.vsb.config(command=self.canvas.yview)
-        self.results_frame.bind("<Configure>", self.onFrameConfigure)
         self.master.bind_all("<MouseWheel>", self.onMouseWheel)
 
-
-        tk.Label(self.results_frame, text='ID', width=5, font=('Times New Roman', 11, 'bold')).grid(row=0, column=0, sticky='nsew')
-        tk.Label(self.results_frame, text='Name', width=15, font=('Times New Roman', 11, 'bold')).grid(row=0, column=1, sticky='nsew')
-        tk.Label(self.results_frame, text='District', width=15, font=('Times New Roman', 11, 'bold')).grid(row=0, column=2, sticky='nsew')
-        tk.Label(self.results_frame, text='Match Percent', width=5, font=('Times New Roman', 11, 'bold')).grid(row=0, column=3, sticky='nsew')
-        tk.Label(self.results_frame, text='Linked Students', font=('Times New Roman', 11, 'bold')).grid(row=0, column=4, sticky='nsw')
-
-        currow = 1
-        print(self.matches)
-        for res in self.matches:
-            previous_matched_students = qf.get_given_students(self.con, res[1])
-            prev_resp_string = ', '.join(str(i) for i in previous_matched_students)
-            label1 = tk.Label(self.results_frame, text=res[1], width=5)
-            label2 = tk.Label(self.results_frame, text=res[0], width=15)
-            label3 = tk.Label(self.results_frame, text=res[3], width=15)
-            label4 = tk.Label(self.results_frame, text='{}%'.format(res[2]), width=15)
-            label5 = tk.Label(self.results_frame, text=prev_resp_string, wraplength=150, justify='left')
-
-            label1.grid(row=currow, column=0)
-            label2.grid(row=currow, column=1)
-            label3.grid(row=currow, column=2)
-            label4.grid(row=currow, column=3)
-            label5.grid(row=currow, column=4, sticky='nsw')
-
-            currow += 1
+        self.linked_students = linked_students
+        self.matches_table = VirtualTable(self.masterframe, MATCH_COLUMNS, height=12, stripes=('#ffffff',),
+                                          header_font=('Times New Roman', 11, 'bold'), empty_text='No Matches')
+        self.matches_table.pack()
+        self.matches_table.set_rows(self.matches, self.format_match)
 
         self.buttonframe = tk.Frame(self.masterframe)
         self.buttonframe.pack(anchor='c')
@@ -86,14 +59,15 @@ class PossibleMatches:
         """
         self.previous_window.submit(bypass_duplicate=True)
 
-    def onFrameConfigure(self, event):
+    def format_match(self, res):
         """
-        Method used to configure the potential matches frame to scroll
-        :param event: the event information passed by tkinter
-        :return: None
+        Formats a possible match for display: ID, name, district, match percent and the students the respondent has
+        already been linked to on previous surveys, loaded with the matches.
+        :param res: a (name, id, score, district) tuple from the duplicate check
+        :return: tuple of the cell values
         """
-        '''Reset the scroll region to encompass the inner frame'''
-        self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+        prev_resp_string = ', '.join(str(i) for i in self.linked_students.get(res[1], []))
+        return res[1], res[0], res[3], '{}%'.format(res[2]), prev_resp_string
 
     def onMouseWheel(self, event):
         """
@@ -122,7 +96,7 @@ class PossibleMatches:
         """
         if widget == self.master:
             return False
-        elif isinstance(widget, tk.Canvas):
+        elif isinstance(widget, (tk.Canvas, VirtualTable)):
             return widget
         else:
             return self.findCanvas(widget.master)
\ No newline at end of file
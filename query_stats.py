@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+
+"""
+Call statistics for the queryfuncs functions: call and error counts, rows returned and a latency histogram per
+function. Calls slower than SLOW_QUERY_SECONDS are written to a rotating log file in ~/.survey_entry, and summary() is
+logged when the main window logs off. queryfuncs wraps its database calls with instrument() when it is imported.
+"""
+
+import os
+import time
+import inspect
+import logging
+import threading
+import functools
+from logging.handlers import RotatingFileHandler
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_SECONDS = 0.5
+SLOW_QUERY_LOG = os.path.join(os.path.expanduser('~'), '.survey_entry', 'slow_queries.log')
+LOG_MAX_BYTES = 1024 * 1024
+LOG_BACKUPS = 3
+# Upper bounds (ms) of the latency histogram buckets, slower calls go in a last overflow bucket
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+def count_rows(result):
+    """
+    :return: the number of rows in a function's result, None if it doesn't return rows
+    """
+    if isinstance(result, (list, tuple, set, dict)):
+        return len(result)
+    return None
+
+
+class FunctionStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.histogram = [0] * (len(BUCKETS_MS) + 1)
+
+    def record(self, elapsed, rows=None, failed=False):
+        self.calls += 1
+        self.errors += failed
+        self.rows += rows or 0
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+        ms = elapsed * 1000
+        bucket = 0
+        while bucket < len(BUCKETS_MS) and ms > BUCKETS_MS[bucket]:
+            bucket += 1
+        self.histogram[bucket] += 1
+
+    def percentile(self, fraction):
+        """
+        :return: the upper bound (ms) of the histogram bucket the given fraction of calls falls in, None if the calls
+        are in the overflow bucket
+        """
+        target = fraction * self.calls
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.histogram):
+            seen += count
+            if seen >= target:
+                return bound
+        return None
+
+
+class QueryStats:
+    def __init__(self, slow_seconds=SLOW_QUERY_SECONDS, log_path=SLOW_QUERY_LOG):
+        """
+        Statistics of the instrumented functions, keyed by function name. Functions run on the Tk thread and on the
+        background worker, so updates are made under a lock.
+        :param slow_seconds: calls taking longer are written to the slow query log, None to log nothing
+        :param log_path: the slow query log file, rotated at LOG_MAX_BYTES, its directory is created if needed
+        """
+        self.slow_seconds = slow_seconds
+        self.log_path = log_path
+        self.functions = {}
+        self.lock = threading.Lock()
+        self.logger = None
+
+    def record(self, name, elapsed, rows=None, failed=False, args=()):
+        with self.lock:
+            stats = self.functions.get(name)
+            if stats is None:
+                stats = self.functions[name] = FunctionStats()
+            stats.record(elapsed, rows, failed)
+        if self.slow_seconds is not None and elapsed >= self.slow_seconds:
+            # called from the finally of the timed functions, a log that can't be written must not replace their
+            # result
+            try:
+                self.log_slow(name, elapsed, rows, failed, args)
+            except Exception as e:
+                logger.warning('Could not log the slow call to %s: %s', name, e)
+
+    def open_log(self):
+        """
+        Opens the slow query log. If the file can't be opened slow calls are no longer logged.
+        :return: the logger, None if the file can't be opened
+        """
+        with self.lock:
+            if self.logger is not None or self.slow_seconds is None:
+                return self.logger
+            try:
+                if os.path.dirname(self.log_path):
+                    os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+                handler = RotatingFileHandler(self.log_path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS)
+            except OSError as e:
+                logger.warning('Could not open the slow query log, slow calls are not logged: %s', e)
+                self.slow_seconds = None
+                return None
+            handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+            slow_logger = logging.getLogger('queryfuncs.slow')
+            slow_logger.setLevel(logging.INFO)
+            slow_logger.propagate = False
+            slow_logger.addHandler(handler)
+            self.logger = slow_logger
+            return self.logger
+
+    def log_slow(self, name, elapsed, rows, failed, args):
+        # The file is only created once there is a slow call to write
+        if self.open_log() is None:
+            return
+        self.logger.info('%s %.3f s rows=%s%s args=%s', name, elapsed, rows, ' FAILED' if failed else '',
+                         ', '.join(repr(arg)[:80] for arg in args))
+
+    def summary(self):
+        """
+        :return: list of lines, one per function called, slowest total time first
+        """
+        with self.lock:
+            items = sorted(self.functions.items(), key=lambda item: item[1].total, reverse=True)
+            lines = ['{:<32} {:>7} {:>6} {:>9} {:>10} {:>9} {:>9} {:>9}'.format(
+                'function', 'calls', 'errors', 'rows', 'total s', 'mean ms', 'p95 ms', 'max ms')]
+            for name, stats in items:
+                p95 = stats.percentile(0.95)
+                lines.append('{:<32} {:>7} {:>6} {:>9} {:>10.3f} {:>9.1f} {:>9} {:>9.1f}'.format(
+                    name, stats.calls, stats.errors, stats.rows, stats.total, stats.total / stats.calls * 1000,
+                    '>{}'.format(BUCKETS_MS[-1]) if p95 is None else '<={}'.format(p95), stats.max * 1000))
+        return lines
+
+    def reset(self):
+        with self.lock:
+            self.functions.clear()
+
+
+stats = QueryStats()
+
+
+def _logged_args(args):
+    # The connection (and the password given to connect()) are left out of the slow query log
+    if args and hasattr(args[0], 'fetchall'):
+        return args[1:]
+    return ()
+
+
+_calls = threading.local()  # depth of the timed calls running on each thread
+
+
+def _timed_chunks(name, chunks, start, args):
+    """
+    Passes through the chunks of a generator and records the call once it is exhausted (or closed), counting the rows
+    of the chunks.
+    """
+    rows = 0
+    failed = True
+    try:
+        while True:
+            _calls.depth = getattr(_calls, 'depth', 0) + 1
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                break
+            finally:
+                _calls.depth -= 1
+            rows += count_rows(chunk) or 0
+            yield chunk
+        failed = False
+    except GeneratorExit:
+        chunks.close()
+        failed = False
+        raise
+    finally:
+        stats.record(name, time.perf_counter() - start, rows, failed, args)
+
+
+def timed(func, name=None):
+    """
+    Wraps a function to record its calls in stats. A call fails if it raises or returns -1. A call that returns a
+    generator (or of a generator function) is timed until the generator is exhausted or closed, counting the rows of the
+    chunks it yields. Timed functions called by another timed function are part of its time and are not recorded
+    again.
+    :param func: the function
+    :param name: name recorded, the function's name by default
+    :return: the wrapped function
+    """
+    name = name or func.__name__
+
+    @functools.wraps(func)
+    def timed_function(*args, **kwargs):
+        if getattr(_calls, 'depth', 0):
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        _calls.depth = 1
+        try:
+            result = func(*args, **kwargs)
+        except BaseException:
+            stats.record(name, time.perf_counter() - start, None, True, _logged_args(args))
+            raise
+        finally:
+            _calls.depth = 0
+        if inspect.isgenerator(result):
+            return _timed_chunks(name, result, start, _logged_args(args))
+        failed = isinstance(result, int) and result == -1  # queryfuncs' error return
+        stats.record(name, time.perf_counter() - start, count_rows(result), failed, _logged_args(args))
+        return result
+    return timed_function
+
+
+def _takes_connection(func):
+    parameters = list(inspect.signature(func).parameters)
+    return bool(parameters) and parameters[0] == 'con'
+
+
+def instrument(namespace, module_name, also=()):
+    """
+    Replaces the public functions defined in a module that take a connection as first argument, the database calls,
+    with their timed() version. The helpers that don't touch the database are left alone, some run once per row.
+    :param namespace: the module's globals()
+    :param module_name: the module's __name__, functions imported from other modules are left alone
+    :param also: names of other functions to time, e.g. the ones opening connections
+    :return: None
+    """
+    for name, obj in list(namespace.items()):
+        if inspect.isfunction(obj) and obj.__module__ == module_name and not name.startswith('_') and \
+                (name in also or _takes_connection(obj)):
+            namespace[name] = timed(obj)
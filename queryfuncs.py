@@ -1,31 +1,17 @@
 #!/usr/bin/env python
 
-from time import localtime, strftime
-import cx_Oracle
-
-GET_QUESTION_QUERY = """
-select t1.id, t1.text, t2.q_order
-from davidj.rs_question t1,
-davidj.rs_question_order t2,
-davidj.rs_survey t3
-where t1.id = t2.question_id
-and t3.id =t2.survey_id
-and t3.id = :survey_id
-order by t2.q_order"""
-
-GET_AVAIL_RESPONSE_QUERY = """
-select t1.text, t1.id
-from rs_response_choice t1
-where t1.question_id = :qid
-order by t1.ANSWER_ORDER
-"""
+import logging
+from time import localtime, strftime, strptime, perf_counter, monotonic
+from collections import OrderedDict, Counter
+import datetime
+import backends
+import query_stats
+import metadata_cache
+import entry_journal
+from respondent_index import RespondentIndex
+from duplicates import DuplicateFinder
 
-GET_QTYPE_QUERY = """
-select t1.name, t2.name
-from rs_question_type t1,
-rs_question_type_xref t2
-where t1.name = t2.question_type_id and t1.question_id = :qid
-"""
+logger = logging.getLogger(__name__)
 
 GET_SURVEY_ADMINS_QUERY = """
 select t1.NAME, t2.date_taken, t2.date_entered, t2.id, t2.survey_id, t2.last_updated, t2.respondent_id
@@ -39,7 +25,59 @@ INSERT INTO RS_RESPONSE VALUES (:1, :2, :3, :4)
 
 INSERT_SURVEY_ADMIN_QUERY = """
 INSERT INTO RS_SURVEY_RESPONSE (ID, SURVEY_ID, RESPONDENT_ID, DATE_TAKEN, DATE_ENTERED)
-VALUES (:sr_id, :survey_id, :respondent_id, to_date( :dt, 'MM/DD/YYYY'), to_timestamp( :ts, 'YYYY-MM-DD HH24:MI:SS'))
+VALUES (rs_survey_response_seq.nextval, :survey_id, :respondent_id, to_date( :dt, 'MM/DD/YYYY'),
+to_timestamp( :ts, 'YYYY-MM-DD HH24:MI:SS'))
+RETURNING ID INTO :new_id
+"""
+
+INSERT_SURVEY_ADMIN_WITH_ID_QUERY = """
+INSERT INTO RS_SURVEY_RESPONSE (ID, SURVEY_ID, RESPONDENT_ID, DATE_TAKEN, DATE_ENTERED)
+VALUES (:1, :2, :3, to_date( :4, 'MM/DD/YYYY'), to_timestamp( :5, 'YYYY-MM-DD HH24:MI:SS'))
+"""
+
+# Uses the (respondent_id, survey_id, date_taken) index, applications (survey 7) can only be entered once
+ADMINISTRATION_EXISTS_QUERY = """
+select 1 from rs_survey_response
+where respondent_id = :respondent_id and survey_id = :survey_id
+and (survey_id = 7 or date_taken = to_date( :dt, 'MM/DD/YYYY'))
+"""
+
+GET_ADMINISTRATION_KEYS_QUERY = """
+select respondent_id, survey_id, date_taken from rs_survey_response
+"""
+
+GET_RESPONDENT_TYPE_IDS_QUERY = """
+select id, respondent_type_id from rs_respondent
+"""
+
+GET_AVAILABLE_SURVEY_PAIRS_QUERY = """
+select respondent_type_id, survey_id from rs_available_surveys
+"""
+
+GET_SURVEY_RESPONSES_QUERY = """
+select t2.id, t2.respondent_id, t2.date_taken, t2.date_entered, t2.last_updated, t3.q_order, t1.answer
+from rs_response t1,
+rs_survey_response t2,
+rs_question_order t3
+where t1.survey_response_id = t2.id
+and t3.survey_id = t2.survey_id
+and t3.question_id = t1.question_id
+and t2.survey_id = :survey_id
+order by t2.id, t3.q_order
+"""
+
+GET_SURVEYS_QUERY = """
+select id, name from rs_survey order by id
+"""
+
+INSERT_RESPONDENT_QUERY = """
+INSERT INTO RS_RESPONDENT (ID, NAME, RESPONDENT_TYPE_ID, LAST_UPDATED)
+VALUES (rs_respondent_seq.nextval, :name, :type, CURRENT_TIMESTAMP)
+RETURNING ID INTO :new_id
+"""
+
+GET_RESPONDENT_ID_QUERY = """
+select id from rs_respondent where name = :name and respondent_type_id = :type
 """
 
 GET_RESPONDENTS_QUERY = """
@@ -49,6 +87,51 @@ where t1.respondent_type_id = t2.id
 and lower(t1.name) like '%' || :part || '%'
 """
 
+GET_ALL_RESPONDENTS_QUERY = """
+select t1.ID, t1.name, t1.Enrolled_District, t1.cohort, t2.name, t1.last_updated
+from rs_respondent t1, rs_respondent_type_xref t2
+where t1.respondent_type_id = t2.id
+"""
+
+# Respondents added or changed since the last refresh of the respondent directory
+GET_CHANGED_RESPONDENTS_QUERY = GET_ALL_RESPONDENTS_QUERY + """and (t1.id > :max_id or t1.last_updated >= :since)
+"""
+
+GET_RESPONDENT_TYPES_QUERY = """
+select id, name from rs_respondent_type_xref
+"""
+
+DELETE_RESPONSES_QUERY = """
+DELETE FROM rs_response where SURVEY_RESPONSE_ID = :admin_id
+"""
+
+DELETE_RESPONSE_QUERY = """
+DELETE FROM rs_response WHERE survey_response_id = :admin_id AND question_id = :quid AND answer = :answer
+"""
+
+UPDATE_RESPONSE_QUERY = """
+UPDATE rs_response SET answer = :new_answer
+WHERE survey_response_id = :admin_id AND question_id = :quid AND answer = :answer
+"""
+
+UPDATE_SURVEY_ADMIN_QUERY = """
+UPDATE rs_survey_response SET last_updated = to_timestamp( :ts, 'YYYY-MM-DD HH24:MI:SS') WHERE id = :admin_id
+"""
+
+GET_STUDENT_DISTRICT_QUERY = """
+select enrolled_district from rs_respondent where id = :id
+"""
+
+UPDATE_DISTRICT_QUERY = """
+UPDATE RS_RESPONDENT SET ENROLLED_DISTRICT = :district, LAST_UPDATED = CURRENT_TIMESTAMP WHERE ID = :id
+"""
+
+# Students a parent/mentor was linked to on earlier surveys (question 97), for LINKED_STUDENTS_BATCH respondents at once
+LINKED_STUDENTS_BATCH = 100
+GET_LINKED_STUDENTS_QUERY = """
+select respondent_id, answer from rs_response where question_id = 97 and respondent_id in ({})
+""".format(', '.join(':id{}'.format(i) for i in range(LINKED_STUDENTS_BATCH)))
+
 GET_AVAILABLE_SURVEYS = """
 SELECT t3.survey_id, t2.name, t2.description
 from rs_respondent t1,
@@ -57,6 +140,67 @@ RS_AVAILABLE_SURVEYS t3
 where t3.respondent_type_id = t1.respondent_type_id and t3.survey_id = t2.id and t1.id = :id
 """
 
+GET_SURVEY_DEFINITION_QUERY = """
+select t1.id, t1.text, t2.q_order, t4.name, t5.name, t3.name
+from rs_question t1,
+rs_question_order t2,
+rs_survey t3,
+rs_question_type t4,
+rs_question_type_xref t5
+where t1.id = t2.question_id
+and t3.id = t2.survey_id
+and t4.question_id = t1.id
+and t4.name = t5.question_type_id
+and t3.id = :survey_id
+order by t2.q_order"""
+
+GET_SURVEY_CHOICES_QUERY = """
+select t1.question_id, t1.id, t1.text
+from rs_response_choice t1,
+rs_question_order t2
+where t1.question_id = t2.question_id
+and t2.survey_id = :survey_id
+order by t2.q_order, t1.ANSWER_ORDER
+"""
+
+GET_ALL_SURVEY_DEFINITIONS_QUERY = """
+select t3.id, t1.id, t1.text, t2.q_order, t4.name, t5.name, t3.name
+from rs_question t1,
+rs_question_order t2,
+rs_survey t3,
+rs_question_type t4,
+rs_question_type_xref t5
+where t1.id = t2.question_id
+and t3.id = t2.survey_id
+and t4.question_id = t1.id
+and t4.name = t5.question_type_id
+order by t3.id, t2.q_order"""
+
+GET_ALL_SURVEY_CHOICES_QUERY = """
+select t2.survey_id, t1.question_id, t1.id, t1.text
+from rs_response_choice t1,
+rs_question_order t2
+where t1.question_id = t2.question_id
+order by t2.survey_id, t2.q_order, t1.ANSWER_ORDER
+"""
+
+# Row count and sum of row hashes of each metadata table, any added, removed or edited row changes the result
+METADATA_VERSION_QUERY = """
+select 'rs_survey', count(*), sum(ora_hash(id || ':' || name)) from rs_survey
+union all
+select 'rs_question', count(*), sum(ora_hash(id || ':' || text)) from rs_question
+union all
+select 'rs_question_order', count(*), sum(ora_hash(survey_id || ':' || question_id || ':' || q_order))
+from rs_question_order
+union all
+select 'rs_question_type', count(*), sum(ora_hash(question_id || ':' || name)) from rs_question_type
+union all
+select 'rs_question_type_xref', count(*), sum(ora_hash(question_type_id || ':' || name)) from rs_question_type_xref
+union all
+select 'rs_response_choice', count(*), sum(ora_hash(id || ':' || question_id || ':' || answer_order || ':' || text))
+from rs_response_choice
+"""
+
 GET_GIVEN_ANSWERS = """
 SELECT t1.question_id, t1.answer, t3.q_order from rs_response t1, rs_survey_response t2, rs_question_order t3
 where t1.survey_response_id = :admin_id
@@ -65,129 +209,158 @@ and t2.survey_id = t3.survey_id
 and t1.question_id = t3.question_id
 """
 
-def connect(name, pw, domain):
+def connect(name, pw, domain, backend=None):
     '''
     Connection process. Takes a given username and password and returns a connection object.
     :param name: string, the username of the user connecting to the database
     :param pw: string, the password of the user connecting to the database
-    :param domain: string, the domain of the Oracle DB
-    :return: cx_Oracle connection object to be used throughout the program
+    :param domain: string, the domain of the Oracle DB or a SQLite connection string (sqlite:///path/to/file.db)
+    :param backend: the backend to connect with, picked from the domain by backends.get_backend() if not given
+    :return: backends.Connection object to be used throughout the program
+    '''
+    if backend is None:
+        backend = backends.get_backend(domain)
+    return _open(backend, backend.connect, name, pw, domain)
+
+
+def create_pool(name, pw, domain, backend=None, min_size=backends.POOL_MIN_SIZE, max_size=backends.POOL_MAX_SIZE,
+                timeout=backends.POOL_TIMEOUT):
+    '''
+    Creates a pool of connections for the session, the windows and the background worker check their connections out
+    of it (pool.acquire()) and give them back with close().
+    :param name: string, the username of the user connecting to the database
+    :param pw: string, the password of the user connecting to the database
+    :param domain: string, the domain of the Oracle DB or a SQLite connection string (sqlite:///path/to/file.db)
+    :param backend: the backend to connect with, picked from the domain by backends.get_backend() if not given
+    :param min_size: number of connections opened up front
+    :param max_size: maximum number of connections open at once
+    :param timeout: seconds to wait for a free connection when all max_size are checked out
+    :return: backends.ConnectionPool object, -2 if the credentials are wrong, -1 on any other error
     '''
+    if backend is None:
+        backend = backends.get_backend(domain)
+    return _open(backend, backend.create_pool, name, pw, domain, min_size=min_size, max_size=max_size, timeout=timeout)
+
+
+def _open(backend, opener, name, pw, domain, **kwargs):
     try:
-        con = cx_Oracle.connect('{}/{}@{}'.format(name, pw, domain))
-    except cx_Oracle.DatabaseError as e:
-        error, = e.args
-        if error.code == 1017:
-            print('Please check your credentials and domain.'.format(name, pw))
+        con = opener(name, pw, domain, **kwargs)
+    except backends.DatabaseUnavailable as e:
+        logger.error('Database connection error: %s', e)
+        return -1
+    except backend.DatabaseError as e:
+        if backend.is_credentials_error(e):
+            logger.error('Please check your credentials and domain.')
             return -2
         # sys.exit()?
         else:
-            print('Database connection error: {}'.format(e))
+            logger.error('Database connection error: %s', e)
             return -1
     return con
 
 
-def get_survey_questions(con, survey_id):
-    '''
-    Takes a given survey ID and produces a list of tuples containing the question ID, the question text, and the order
-    the question falls in (index+1).
-    :param con: cx_Oracle connection object
-    :param survey_id: integer - the survey id [1,6]
-    :return: a list of tuples containing the question id, the question text, and the relative question order.
-    '''
-    questions_cursor = con.cursor()
-    query = GET_QUESTION_QUERY
-    questions_cursor.prepare(query)
-    questions_cursor.execute(None, {'survey_id': survey_id})
-    questions = questions_cursor.fetchall()
-    questions_cursor.close()
-    return questions
+class SurveyDefinition:
+    def __init__(self, survey_id, name, rows, choice_rows):
+        """
+        Everything needed to build a survey's entry form: its questions in order, the type of each question and the
+        available answers for each question. Built from the two set-based queries run by get_survey_definition() so
+        that opening a survey does not cost a round trip per question.
+        :param survey_id: integer - the survey id
+        :param name: the name of the survey
+        :param rows: rows from GET_SURVEY_DEFINITION_QUERY (id, text, q_order, type id, type name, survey name)
+        :param choice_rows: rows from GET_SURVEY_CHOICES_QUERY (question id, choice id, choice text)
+        """
+        self.survey_id = survey_id
+        self.name = name
+        self.questions = [(quid, qtext, num) for quid, qtext, num, _, _, _ in rows]
+        self.types = {quid: (type_id, type_name) for quid, _, _, type_id, type_name, _ in rows}
+        self.choices = {}
+        for quid, choice_id, choice_text in choice_rows:
+            self.choices.setdefault(quid, []).append((choice_id, choice_text))
 
+    def question_type(self, qid):
+        """
+        Returns the type of a question.
+        :param qid: the question ID
+        :return: a tuple containing the type id and the string name of the type (in that order)
+        """
+        return self.types[qid]
 
-def get_question_responses(con, qid):
-    '''
-    Takes the connection and question ID and produces a list of strings containing the corresponding results, only to be
-    used when the question type is neither "short_string" or "long_string"
-    :param con: connection object from cx_Oracle
-    :param qid: question ID corresponding to a response-containing question. Only to be used after get_question_type()
-    :return: returns a list of tuples containing the id and text string for each of the available answers
-    '''
-    query = GET_AVAIL_RESPONSE_QUERY
-    responses_cursor = con.cursor()
-    responses_cursor.prepare(query)
-    responses_cursor.execute(None, {'qid': qid})
-    responses = [(resp[1],resp[0]) for resp in responses_cursor.fetchall()]
-    responses_cursor.close()
-    return responses
+    def question_responses(self, qid):
+        """
+        Returns the available answers of a question.
+        :param qid: the question ID
+        :return: a list of tuples containing the id and text string for each of the available answers
+        """
+        return self.choices.get(qid, [])
 
 
-def get_question_type(con, qid):
+_survey_definitions = {}
+
+
+def get_survey_definition(con, survey_id):
     '''
-    Takes the connection and the question ID and produces the question type out of the list: short_string, single_choice,
-    table_single_choice, long_string, table_multiple_choice, multiple_choice
-    :param con: connection object from cx_Oracle
-    :param qid: the question ID
-    :return: a tuple containing the type id and the string name of the type (in that order)
+    Takes a survey ID and returns its SurveyDefinition. The questions, types and answer choices are fetched with two
+    queries the first time a survey is requested and then cached for the rest of the session, so reopening a survey
+    makes no database calls. load_survey_metadata() fills the cache for every survey at login.
+    :param con: backends.Connection object
+    :param survey_id: integer - the survey id
+    :return: SurveyDefinition object
     '''
-    query = GET_QTYPE_QUERY
-    qtype_cursor = con.cursor()
-    qtype_cursor.prepare(query)
-    qtype_cursor.execute(None, {'qid': qid})
-    qtype = qtype_cursor.fetchall()[0]
-    qtype_cursor.close()
-    return qtype
+    definition = _survey_definitions.get(survey_id)
+    if definition:
+        return definition
+
+    rows = con.fetchall(GET_SURVEY_DEFINITION_QUERY, {'survey_id': survey_id})
+    choice_rows = con.fetchall(GET_SURVEY_CHOICES_QUERY, {'survey_id': survey_id})
+
+    if rows:
+        name = rows[0][5]
+    else:
+        name = get_survey_name(con, survey_id)
+    definition = SurveyDefinition(survey_id, name, rows, choice_rows)
+    _survey_definitions[survey_id] = definition
+    return definition
 
 
-def insert_responses(con, row_list):
+def load_survey_metadata(con, domain, cache_dir=metadata_cache.METADATA_CACHE_DIR):
     '''
-    Takes the connection and the list of answer lists compiled through the data entry process. Each row should be a specific
-    format of [survey_response_id, question_id, respondent_id, answer_string].
-    :param con: connection object created by cx_Oracle
-    :param row_list: list of lists/tuples - each question response is a list contained within the overall list to be passed.
-                    This list is iterated through and each is inserted into the database. Only one call per survey entry only.
-    :return: None
+    Fills the survey definition cache for every survey. The checksum of the metadata tables is fetched first and, when
+    it matches the one the local cache file (see metadata_cache.py) was written at, the definitions are read from the
+    file, so nothing else is fetched. Otherwise all surveys are fetched with two set-based queries and the file is
+    rewritten. A failure only leaves the surveys to be fetched when they are opened.
+    :param con: backends.Connection object
+    :param domain: the domain logged in to, each database has its own cache file
+    :param cache_dir: directory of the cache file
+    :return: True if the definitions were read from the cache file, False if they were fetched (or failed to load)
     '''
-    query = INSERT_RESPONSES_QUERY
-    insert_cursor = con.cursor()
-    insert_cursor.prepare(query)
     try:
-        insert_cursor.executemany(None, row_list)
-        con.commit()
-    except:
-        con.rollback()
-        return 1
-    insert_cursor.close()
-    return None
+        version = [list(row) for row in sorted(con.fetchall(METADATA_VERSION_QUERY))]
+        path = metadata_cache.cache_path(domain, cache_dir)
+        surveys = metadata_cache.read(path, version)
+        cached = surveys is not None
+        if not cached:
+            surveys = {int(survey_id): (name, [], []) for survey_id, name in con.fetchall(GET_SURVEYS_QUERY)}
+            for row in con.fetchall(GET_ALL_SURVEY_DEFINITIONS_QUERY):
+                surveys[int(row[0])][1].append(row[1:])
+            for row in con.fetchall(GET_ALL_SURVEY_CHOICES_QUERY):
+                surveys[int(row[0])][2].append(row[1:])
+            metadata_cache.write(path, version, surveys)
+    except con.backend.DatabaseError as e:
+        logger.warning('Could not load the survey metadata: %s', e)
+        return False
 
+    for survey_id, (name, rows, choice_rows) in surveys.items():
+        _survey_definitions[survey_id] = SurveyDefinition(survey_id, name, rows, choice_rows)
+    return cached
 
-def insert_new_survey_response(con, survey_id, respondent_id, date_taken):
-    '''
-    Takes the connection object, the id # of the survey, the id # of the student and the date the survey was originally
-    taken and updates the database to reflect the new survey while returning the ID of that survey to be included with
-    the responses.
-    :param con: the connection object created by cx_Oracle
-    :param survey_id: the id of the survey, in the range [1,6]
-    :param respondent_id: the id of the respondent
-    :param date_taken: the date the survey was originally taken, must be in MM-DD-YYYY format
-    :return: the id of the survey administration
-    '''
-    max_query = 'select max(id) from rs_survey_response'
-    cursor = con.cursor()
-    cursor.execute(max_query)
-    ids = cursor.fetchall()
-    returned = ids[0][0]
-    if returned:
-        new_id = returned+1
-    else:
-        new_id = 1
 
-    data = [new_id, survey_id, respondent_id, date_taken, format_timestamp()]
-    #print(data)
-    cursor.prepare(INSERT_SURVEY_ADMIN_QUERY)
-    cursor.execute(None, {"sr_id":data[0], "survey_id":data[1], "respondent_id":data[2], "dt":data[3], "ts":data[4]})
-    con.commit()
-    cursor.close()
-    return new_id
+def clear_survey_definitions():
+    '''
+    Empties the survey definition cache, the next get_survey_definition() call for each survey goes to the database.
+    :return: None
+    '''
+    _survey_definitions.clear()
 
 
 def format_timestamp():
@@ -200,23 +373,84 @@ def format_timestamp():
     return time
 
 
+_respondent_index = None
+_last_refresh = 0
+REFRESH_INTERVAL = 15  # seconds between checks for respondents added or changed by other users
+NO_UPDATES = datetime.datetime(1900, 1, 1)
+# A respondent's id and last_updated are set when it is written but it is only seen once committed, which can be
+# later than rows written after it, so every refresh reads again the rows this close to the newest ones seen
+REFRESH_OVERLAP_SECONDS = 30
+REFRESH_OVERLAP_IDS = 100
+
+
+def build_respondent_index(con):
+    '''
+    Loads every respondent into an in-memory RespondentIndex that search_for_names(), get_student_name_from_id() and
+    get_student_district() answer from for the rest of the session. Called once at login; insert_respondent() and
+    update_district() keep it current and refresh_respondents() picks up changes made from other sessions.
+    :param con: backends.Connection object
+    :return: the RespondentIndex
+    '''
+    global _respondent_index, _last_refresh
+    type_names = dict(con.fetchall(GET_RESPONDENT_TYPES_QUERY))
+    _respondent_index = RespondentIndex(con.fetchall(GET_ALL_RESPONDENTS_QUERY), type_names)
+    _last_refresh = monotonic()
+    return _respondent_index
+
+
+def refresh_respondents(con, force=False):
+    '''
+    Adds the respondents inserted or changed since the respondent index was loaded or last refreshed: those with an id
+    above the highest one seen, or a last_updated at or after the latest one seen (the timestamps come from the
+    database clock, so the clocks of the client machines don't matter). The last REFRESH_OVERLAP_IDS ids and
+    REFRESH_OVERLAP_SECONDS seconds are read again, so rows committed after newer ones are not missed; adding a
+    respondent that is already in the index only updates it. Runs at most every REFRESH_INTERVAL seconds unless forced.
+    :param con: backends.Connection object
+    :param force: refresh even if the last refresh was less than REFRESH_INTERVAL seconds ago
+    :return: the number of respondents read, -1 if there is no index
+    '''
+    global _last_refresh
+    if _respondent_index is None:
+        return -1
+    if not force and monotonic() - _last_refresh < REFRESH_INTERVAL:
+        return 0
+    _last_refresh = monotonic()
+    directory = _respondent_index.directory
+    since = NO_UPDATES  # no respondent has been changed yet, any later change is picked up
+    if directory.since is not None:
+        since = directory.since - datetime.timedelta(seconds=REFRESH_OVERLAP_SECONDS)
+    rows = con.fetchall(GET_CHANGED_RESPONDENTS_QUERY, {'max_id': max(directory.max_id - REFRESH_OVERLAP_IDS, 0),
+                                                        'since': since})
+    type_ids = {type_name: type_id for type_id, type_name in _respondent_index.type_names.items()}
+    for row in rows:
+        _respondent_index.add(row)
+        finder = _duplicate_finders.get(type_ids.get(row[4]))
+        if finder is not None:
+            finder.add(row[1], row[0], row[2])
+    return len(rows)
+
+
 def search_for_names(con, str_name):
     '''
     Takes the connection and a string and searches the table RS_RESPONDENT for any rows that contains the split elements
     of the input. For example, 'David Jones' searches for anyone with 'david' or 'jones' in the "name" field and returns
-    the following rows in order: ID, Enrolled_District, Cohort, Respondent Type.
+    the following rows in order: ID, Name, Enrolled_District, Cohort, Respondent Type. Answered from the respondent index
+    when build_respondent_index() has been called, otherwise the table is queried.
     :param con: connection object created by cx_Oracle
     :param str_name: the name of the respondent being searched for
     :return: returns a list with all rows (as tuples) retrieved in the result set
     '''
+    if _respondent_index is not None:
+        try:
+            refresh_respondents(con)
+        except Exception as e:
+            if not con.backend.is_connection_error(e):
+                raise
+            logger.warning('Could not refresh the respondents, searching the loaded ones: %s', e)
+        return _respondent_index.search(str_name)
     name = str_name.lower()
     #print(name_parts)
-    cursor = con.cursor()
-    query = GET_RESPONDENTS_QUERY
-    cursor.prepare(query)
-    cursor.execute(None, {'part':name})
-    results = cursor.fetchall()
-    cursor.close()
+    results = con.fetchall(GET_RESPONDENTS_QUERY, {'part':name})
     return results
 
 
@@ -228,12 +462,7 @@ def get_taken_surveys(con, resp_id):
     :param resp_id: the id # of the respondent
     :return: a list of all returned rows as tuples
     """
-    cursor = con.cursor()
-    cursor.prepare(GET_SURVEY_ADMINS_QUERY)
-    cursor.execute(None, {'id':resp_id})
-    results = cursor.fetchall()
-    results = [res for res in results]
-    cursor.close()
+    results = con.fetchall(GET_SURVEY_ADMINS_QUERY, {'id':resp_id})
     return results
 
 def get_available_surveys(con, resp_id):
@@ -244,40 +473,23 @@ def get_available_surveys(con, resp_id):
     :param resp_id: integer id number of the respondent
     :return: list of tuples containing survey info: (name, description)
     """
-    cursor = con.cursor()
-    cursor.prepare(GET_AVAILABLE_SURVEYS)
-    cursor.execute(None, {'id':resp_id})
-    results = cursor.fetchall()
-    results = [res for res in results]
-    cursor.close()
+    results = con.fetchall(GET_AVAILABLE_SURVEYS, {'id':resp_id})
     return results
 
 def get_survey_id(con, survey_name):
-    cursor = con.cursor()
     query = "select id from rs_survey where name = :name"
-    cursor.prepare(query)
-    cursor.execute(None, {'name':survey_name})
-    results = cursor.fetchall()
-    result = [res for res in results][0][0]
-    cursor.close()
+    result = con.fetchall(query, {'name':survey_name})[0][0]
     return result
 
 def get_survey_name(con, survey_id):
-    cursor = con.cursor()
     query = 'Select name from rs_survey where id = :id'
-    cursor.prepare(query)
-    cursor.execute(None, {'id':survey_id})
-    results = cursor.fetchall()
-    cursor.close()
-    return [res for res in results][0][0]
+    return con.fetchall(query, {'id':survey_id})[0][0]
 
 def get_student_name_from_id(con, resp_id):
-    cursor=con.cursor()
+    if _respondent_index is not None and int(resp_id) in _respondent_index.directory:
+        return _respondent_index.directory.name(resp_id)
     query = 'SELECT name from rs_respondent where id = :id'
-    cursor.prepare(query)
-    cursor.execute(None, {'id':resp_id})
-    result = cursor.fetchall()[0][0]
-    cursor.close()
+    result = con.fetchall(query, {'id':resp_id})[0][0]
     return result
 
 def get_given_answers(con, admin_id):
@@ -287,97 +499,556 @@ def get_given_answers(con, admin_id):
     :param admin_id:
     :return: a list of tuples}
     '''
-    cursor = con.cursor()
-    query = GET_GIVEN_ANSWERS
-    cursor.prepare(query)
-    cursor.execute(None, {'admin_id':admin_id})
-    result = cursor.fetchall()
-    cursor.close()
+    result = con.fetchall(GET_GIVEN_ANSWERS, {'admin_id':admin_id})
     return result
 
-def delete_old_responses(con, admin_id):
-    cursor = con.cursor()
-    query = 'DELETE FROM rs_response where SURVEY_RESPONSE_ID = :admin_id'
-    cursor.prepare(query)
-    try:
-        cursor.execute(None, {'admin_id':admin_id})
-        con.commit()
-    except:
-        con.rollback()
-        return -1
-    cursor.close()
-    return None
-
-def update_survey_response(con, admin_id):
-    cursor = con.cursor()
-    ts = format_timestamp()
-    #print(ts)
-    query = 'UPDATE rs_survey_response SET last_updated = to_timestamp( :ts, \'YYYY-MM-DD HH24:MI:SS\')WHERE id =:admin_id'
-    cursor.prepare(query)
-    try:
-        cursor.execute(None, {'ts': ts, 'admin_id':admin_id})
-        con.commit()
-    except:
-        con.rollback()
-
-        return -1
-    cursor.close()
-    return None
-
 def get_existing_respondents(con, resp_type):
-    cursor = con.cursor()
     query = 'SELECT name, id, enrolled_district from rs_respondent where RESPONDENT_TYPE_ID = :id'
-    cursor.prepare(query)
-    cursor.execute(None, {'id':resp_type})
-    results = cursor.fetchall()
-    results = [res for res in results]
-    cursor.close()
+    results = con.fetchall(query, {'id':resp_type})
     return results
 
+_duplicate_finders = {}
+
+
+def get_duplicate_finder(con, resp_type):
+    '''
+    Returns the DuplicateFinder over the existing respondents of a type. The respondents are fetched the first time a
+    type is requested; after that each call refreshes the respondent index (see refresh_respondents()), which adds the
+    respondents inserted from other computers to the finders, so a check only costs the refresh query. Without a
+    respondent index the finder is rebuilt from the table on every call.
+    :param con: backends.Connection object
+    :param resp_type: respondent type id
+    :return: DuplicateFinder object
+    '''
+    resp_type = int(resp_type)
+    finder = _duplicate_finders.get(resp_type)
+    if finder is None or _respondent_index is None:
+        finder = DuplicateFinder(get_existing_respondents(con, resp_type))
+        if _respondent_index is not None:
+            _duplicate_finders[resp_type] = finder
+    refresh_respondents(con, force=True)
+    return finder
+
+def check_new_respondent(con, name, resp_type):
+    '''
+    Checks a respondent about to be added against the existing respondents of its type (see get_duplicate_finder()).
+    :param con: backends.Connection object
+    :param name: the name entered
+    :param resp_type: respondent type id
+    :return: (True if the name already exists, list of possible matches from DuplicateFinder.find(), dict of the
+    students each possible match was linked to from get_linked_students())
+    '''
+    finder = get_duplicate_finder(con, resp_type)
+    if finder.exists(name):
+        return True, [], {}
+    matches = finder.find(name)
+    return False, matches, get_linked_students(con, [match[1] for match in matches])
+
+
+def get_linked_students(con, ids):
+    '''
+    Same as get_given_students() for several respondents, LINKED_STUDENTS_BATCH per query.
+    :param con: backends.Connection object
+    :param ids: list of respondent ids
+    :return: dict of respondent id -> list of the students (answers to question 97) it was linked to
+    '''
+    linked = {resp_id: [] for resp_id in ids}
+    ids = list(linked)
+    for start in range(0, len(ids), LINKED_STUDENTS_BATCH):
+        batch = ids[start:start + LINKED_STUDENTS_BATCH]
+        batch += [batch[-1]] * (LINKED_STUDENTS_BATCH - len(batch))  # the same statement text for every batch
+        params = {'id{}'.format(i): resp_id for i, resp_id in enumerate(batch)}
+        for resp_id, answer in con.fetchall(GET_LINKED_STUDENTS_QUERY, params):
+            linked[resp_id].append(answer)
+    return linked
+
 def get_given_students(con, id):
-    cursor = con.cursor()
     query = 'SELECT answer from rs_response where respondent_id = :id and question_id = 97'
-    cursor.prepare(query)
-    cursor.execute(None, {'id':id})
-    results = cursor.fetchall()
-    results = [res[0] for res in results]
-    cursor.close()
+    results = [res[0] for res in con.fetchall(query, {'id':id})]
     return results
 
 def insert_respondent(con, name, resp_type):
-    cursor = con.cursor()
-    new_id = cursor.execute('SELECT MAX(ID) FROM RS_RESPONDENT').fetchall()[0][0] + 1
-    print(new_id, name, resp_type)
-    query = 'INSERT INTO RS_RESPONDENT (ID, NAME, RESPONDENT_TYPE_ID) VALUES(:id, :name, :type)'
-    cursor.prepare(query)
     try:
-        cursor.execute(None, {'id':new_id, 'name':name, 'type':resp_type})
+        new_id = con.insert(INSERT_RESPONDENT_QUERY, {'name':name, 'type':resp_type})
         con.commit()
-        cursor.close()
+        if _respondent_index is not None:
+            _respondent_index.add_respondent(new_id, name, resp_type)
+        if int(resp_type) in _duplicate_finders:
+            _duplicate_finders[int(resp_type)].add(name, new_id)
         return None
-    except:
+    except Exception as e:
+        if _journal is not None and con.backend.is_connection_error(e):
+            # saved in the journal and inserted by sync_journal() once the database can be reached
+            local_id = _journal.add_respondent(name, resp_type)
+            if _respondent_index is not None:
+                _respondent_index.add_respondent(local_id, name, resp_type)
+            logger.warning('Could not reach the database, respondent %s saved locally as %s', name, local_id)
+            return None
         con.rollback()
-        cursor.close()
         return -1
 
 def get_student_district(con, id):
-    cursor = con.cursor()
-    query = 'select enrolled_district from rs_respondent where id = :id'
-    cursor.prepare(query)
-    cursor.execute(None, {'id':id})
-    result = cursor.fetchall()[0][0]
-    cursor.close()
+    if _respondent_index is not None and int(id) in _respondent_index.directory:
+        return _respondent_index.directory.district(id)
+    result = con.fetchall(GET_STUDENT_DISTRICT_QUERY, {'id':id})[0][0]
     return result
 
 def update_district(con, respondent_id, district):
-    cursor = con.cursor()
-    query = 'UPDATE RS_RESPONDENT SET ENROLLED_DISTRICT = :district WHERE ID = :id'
-    cursor.prepare(query)
     try:
-        cursor.execute(None, {'id':respondent_id, 'district':district})
+        con.execute(UPDATE_DISTRICT_QUERY, {'id':respondent_id, 'district':district})
         con.commit()
-        cursor.close()
+        if _respondent_index is not None:
+            _respondent_index.update(respondent_id, district=district)
         return None
     except:
-        cursor.close()
-        return -1
\ No newline at end of file
+        return -1
+
+
+def survey_already_entered(con, survey_id, respondent_id, date_taken):
+    '''
+    Checks that a new survey administration is not a duplicate. A unique administration is a distinct respondent id,
+    survey id and "date taken", while applications (survey 7) can only be entered once per respondent. Runs as a
+    single indexed lookup; the unique index on rs_survey_response (see backends.ORACLE_ADMINISTRATION_DDL) still
+    rejects a duplicate inserted by another session between this check and the insert.
+    :param con: backends.Connection object
+    :param survey_id: the id of the survey
+    :param respondent_id: the id of the respondent
+    :param date_taken: the date the survey was taken, must be in MM/DD/YYYY format
+    :return: True if the administration has already been entered, False otherwise
+    '''
+    rows = con.fetchall(ADMINISTRATION_EXISTS_QUERY, {'respondent_id': respondent_id, 'survey_id': survey_id,
+                                                      'dt': date_taken})
+    return bool(rows)
+
+
+def diff_answers(previous, answers):
+    '''
+    Compares the answers a survey was loaded with to the submitted ones. A question that had a single answer and still
+    has a single, different, answer is updated in place, otherwise the answers that are gone are deleted and the new
+    ones inserted. Both lists are of (question_id, answer_string) tuples and may hold several answers per question
+    (multiple choice).
+    :param previous: the answers stored for the administration
+    :param answers: the submitted answers
+    :return: (inserts, updates, deletes) - lists of (quid, answer), (quid, old answer, new answer) and (quid, answer)
+    '''
+    old = {}
+    for quid, text in previous:
+        old.setdefault(quid, []).append(text)
+    new = {}
+    for quid, text in answers:
+        new.setdefault(quid, []).append(text)
+
+    inserts, updates, deletes = [], [], []
+    for quid in set(old) | set(new):
+        old_texts = old.get(quid, [])
+        new_texts = new.get(quid, [])
+        if sorted(old_texts) == sorted(new_texts):
+            continue
+        if len(old_texts) == 1 and len(new_texts) == 1:
+            updates.append((quid, old_texts[0], new_texts[0]))
+            continue
+        for text in set(old_texts):
+            # the delete removes every copy of the answer, the copies still wanted are inserted again
+            if old_texts.count(text) > new_texts.count(text):
+                deletes.append((quid, text))
+                inserts.extend((quid, text) for _ in range(new_texts.count(text)))
+        for text in set(new_texts):
+            missing = new_texts.count(text) - old_texts.count(text)
+            if missing > 0:
+                inserts.extend((quid, text) for _ in range(missing))
+    return inserts, updates, deletes
+
+
+def _change_answers(con, admin_id, previous, updates, deletes, result):
+    '''
+    Runs the deletes and updates of diff_answers() one row at a time, checking that each one changes the rows the
+    survey was loaded with. Nothing is committed.
+    :param con: backends.Connection object
+    :param admin_id: id of the administration being edited
+    :param previous: list of (question_id, answer_string) tuples the edited survey was loaded with
+    :param updates: list of (question_id, old answer, new answer) tuples
+    :param deletes: list of (question_id, answer) tuples
+    :param result: SubmitResult, its deleted and updated counts are increased
+    :return: True if every statement changed the expected rows, False as soon as one doesn't
+    '''
+    loaded = Counter((quid, text) for quid, text in previous)
+    for quid, text in deletes:
+        deleted = con.execute(DELETE_RESPONSE_QUERY, {'admin_id': admin_id, 'quid': quid, 'answer': text})
+        if deleted != loaded[(quid, text)]:
+            return False
+        result.deleted += deleted
+    for quid, old_text, new_text in updates:
+        if con.execute(UPDATE_RESPONSE_QUERY, {'admin_id': admin_id, 'quid': quid, 'answer': old_text,
+                                               'new_answer': new_text}) != 1:
+            return False
+        result.updated += 1
+    return True
+
+
+class SubmitResult:
+    def __init__(self):
+        """
+        Outcome of submit_survey(): the id of the administration, the stage that failed (None if the survey was saved),
+        how long each stage took and the number of response rows inserted, updated and deleted.
+        """
+        self.admin_id = None
+        self.inserted = 0
+        self.updated = 0
+        self.deleted = 0
+        self.failed = None
+        self.error = None
+        self.stage = None
+        self.timings = OrderedDict()
+
+    @property
+    def saved(self):
+        return self.failed is None
+
+    def start(self, stage):
+        self.stage = stage
+        self.timings[stage] = perf_counter()
+
+    def stop(self):
+        self.timings[self.stage] = perf_counter() - self.timings[self.stage]
+
+    def __str__(self):
+        timings = ', '.join('{} {:.1f} ms'.format(stage, 1000 * seconds) for stage, seconds in self.timings.items())
+        return '{} ({} inserted, {} updated, {} deleted)'.format(timings, self.inserted, self.updated, self.deleted)
+
+
+def submit_survey(con, survey_id, respondent_id, answers, date_taken, admin_id=None, linked_student=None,
+                  previous=None):
+    '''
+    Saves an entered survey in a single transaction: checks the administration is not a duplicate, inserts the
+    administration (or updates last_updated when editing admin_id), writes its responses and, for parent/mentor
+    surveys, copies the linked student's district to the respondent. Everything is committed once at the end, any
+    failure rolls the whole survey back so no half-written administration is left behind. When editing with the
+    previous answers given, only the responses that changed are written (see diff_answers()), otherwise, or when the
+    stored responses no longer match the previous answers, all the responses of the administration are replaced.
+    :param con: backends.Connection object
+    :param survey_id: the id of the survey
+    :param respondent_id: the id of the respondent
+    :param answers: list of (question_id, answer_string) tuples
+    :param date_taken: the date the survey was taken, must be in MM/DD/YYYY format
+    :param admin_id: id of the administration being edited, None for a new administration
+    :param linked_student: id of the student a parent/mentor survey is linked to
+    :param previous: list of (question_id, answer_string) tuples the edited survey was loaded with
+    :return: SubmitResult, failed is one of 'validate', 'administration', 'responses', 'district' or 'commit'
+    '''
+    result = SubmitResult()
+    editing = admin_id is not None
+    district = None
+    try:
+        result.start('validate')
+        duplicate = not editing and survey_already_entered(con, survey_id, respondent_id, date_taken)
+        result.stop()
+        if duplicate:
+            result.failed = 'validate'
+            return result
+
+        result.start('administration')
+        ts = format_timestamp()
+        if not editing:
+            try:
+                admin_id = con.insert(INSERT_SURVEY_ADMIN_QUERY, {"survey_id": survey_id, "respondent_id": respondent_id,
+                                                                  "dt": date_taken, "ts": ts})
+            except con.backend.DatabaseError as e:
+                if not con.backend.is_unique_violation(e):
+                    raise
+                # entered by another session since the check above
+                con.rollback()
+                result.stop()
+                result.failed = 'validate'
+                return result
+        else:
+            con.execute(UPDATE_SURVEY_ADMIN_QUERY, {'ts': ts, 'admin_id': admin_id})
+        result.admin_id = admin_id
+        result.stop()
+
+        result.start('responses')
+        inserts = answers
+        if editing and previous is not None:
+            inserts, updates, deletes = diff_answers(previous, answers)
+            if not _change_answers(con, admin_id, previous, updates, deletes, result):
+                # the stored responses are no longer the ones the survey was loaded with (it was edited elsewhere
+                # since), so they are all replaced
+                inserts = answers
+                result.updated = 0
+                result.deleted = con.execute(DELETE_RESPONSES_QUERY, {'admin_id': admin_id})
+        elif editing:
+            result.deleted = con.execute(DELETE_RESPONSES_QUERY, {'admin_id': admin_id})
+        if inserts:
+            con.executemany(INSERT_RESPONSES_QUERY, [[admin_id, quid, respondent_id, text] for quid, text in inserts])
+            result.inserted = len(inserts)
+        result.stop()
+
+        if linked_student is not None:
+            result.start('district')
+            rows = con.fetchall(GET_STUDENT_DISTRICT_QUERY, {'id': linked_student})
+            district = rows[0][0] if rows else None
+            con.execute(UPDATE_DISTRICT_QUERY, {'id': respondent_id, 'district': district})
+            result.stop()
+
+        result.start('commit')
+        con.commit()
+        result.stop()
+    except Exception as e:
+        try:
+            con.rollback()
+        except Exception:
+            pass  # the connection was lost, nothing was committed
+        result.stop()
+        result.failed = result.stage
+        result.error = e
+        return result
+
+    if linked_student is not None and _respondent_index is not None:
+        _respondent_index.update(respondent_id, district=district)
+    return result
+
+
+SYNC_BATCH = 50  # journal entries replayed per sync_journal() call
+_journal = None
+
+
+def open_journal(domain, journal_dir=entry_journal.JOURNAL_DIR):
+    '''
+    Opens the entry journal (see entry_journal.py) of the database logged in to. While it is open, entered surveys are
+    journaled with journal_survey() before sync_journal() sends them, and insert_respondent() journals the respondents
+    added while the database can't be reached.
+    :param domain: the domain logged in to, each database has its own journal
+    :param journal_dir: directory of the journal file
+    :return: the number of entries still to be sent from an earlier session, -1 if the journal can't be opened (surveys
+    are then sent directly)
+    '''
+    global _journal
+    try:
+        _journal = entry_journal.EntryJournal(entry_journal.journal_path(domain, journal_dir))
+    except OSError as e:
+        logger.error('Could not open the entry journal: %s', e)
+        _journal = None
+        return -1
+    return len(_journal)
+
+
+def journal_survey(survey_id, respondent_id, answers, date_taken, admin_id=None, linked_student=None, previous=None):
+    '''
+    Appends an entered survey to the journal, see submit_survey() for the arguments. Only touches the local disk.
+    :return: the sequence number of the journal entry, None if no journal is open
+    '''
+    if _journal is None:
+        return None
+    return _journal.add_survey(survey_id, respondent_id, answers, date_taken, admin_id, linked_student, previous)
+
+
+def pending_entries():
+    '''
+    :return: the number of journal entries not sent to the database yet
+    '''
+    return len(_journal) if _journal is not None else 0
+
+
+class SyncResult:
+    def __init__(self):
+        """
+        Outcome of sync_journal(): the SubmitResult of each survey replayed (by journal sequence number), the entries
+        rejected with the reason, and whether the database couldn't be reached, which leaves entries pending.
+        """
+        self.results = {}
+        self.synced = 0
+        self.rejected = []
+        self.pending = 0
+        self.offline = False
+
+    def __str__(self):
+        return '{} synced, {} rejected, {} pending{}'.format(self.synced, len(self.rejected), self.pending,
+                                                               ' (offline)' if self.offline else '')
+
+
+def sync_journal(con, batch=SYNC_BATCH):
+    '''
+    Replays up to batch pending journal entries, in the order they were made, each in its own transaction. Local ids
+    of respondents and administrations created offline are replaced by their database ids. An entry that conflicts
+    with the database is rejected: a survey already entered (the same check as submit_survey(), backed by the unique
+    index on rs_survey_response), or a survey that fails to save; a respondent that was added from another computer in
+    the meantime is not a conflict, the entries that refer to it use the existing respondent. Replaying stops at the
+    first entry that fails because the database can't be reached, it is tried again on the next call.
+    :param con: backends.Connection object
+    :param batch: maximum number of entries replayed
+    :return: SyncResult
+    '''
+    result = SyncResult()
+    if _journal is None:
+        return result
+    for entry in _journal.entries()[:batch]:
+        if entry['kind'] == 'respondent':
+            sent = _sync_respondent(con, entry, result)
+        else:
+            sent = _sync_survey(con, entry, result)
+        if not sent:
+            result.offline = True
+            break
+    result.pending = len(_journal)
+    return result
+
+
+def _reject(entry, reason, result):
+    logger.warning('Journal entry %s rejected: %s', entry['seq'], reason)
+    _journal.reject(entry['seq'], reason)
+    result.rejected.append((entry, reason))
+
+
+def _sync_respondent(con, entry, result):
+    """
+    :return: False if the database could not be reached
+    """
+    try:
+        try:
+            new_id = con.insert(INSERT_RESPONDENT_QUERY, {'name': entry['name'], 'type': entry['resp_type']})
+            con.commit()
+        except con.backend.DatabaseError as e:
+            if not con.backend.is_unique_violation(e):
+                raise
+            con.rollback()
+            new_id = con.fetchall(GET_RESPONDENT_ID_QUERY, {'name': entry['name'], 'type': entry['resp_type']})[0][0]
+    except Exception as e:
+        if con.backend.is_connection_error(e):
+            return False
+        con.rollback()
+        _reject(entry, 'respondent not saved: {}'.format(e), result)
+        return True
+
+    _journal.synced(entry['seq'], new_id)
+    result.synced += 1
+    if _respondent_index is not None:
+        _respondent_index.renumber(entry['local_id'], new_id)
+    if int(entry['resp_type']) in _duplicate_finders:
+        _duplicate_finders[int(entry['resp_type'])].add(entry['name'], new_id)
+    return True
+
+
+def _sync_survey(con, entry, result):
+    """
+    :return: False if the database could not be reached
+    """
+    respondent_id = _journal.resolve(entry['respondent_id'])
+    admin_id = _journal.resolve(entry['admin_id'])
+    linked_student = _journal.resolve(entry['linked_student'])
+    if respondent_id is None or (admin_id is None) != (entry['admin_id'] is None) or \
+            (linked_student is None) != (entry['linked_student'] is None):
+        _reject(entry, 'refers to a respondent or survey that was not saved', result)
+        return True
+
+    submitted = submit_survey(con, entry['survey_id'], respondent_id, entry['answers'], entry['date_taken'], admin_id,
+                              linked_student, entry['previous'])
+    if not submitted.saved and submitted.error is not None and con.backend.is_connection_error(submitted.error):
+        return False
+    result.results[entry['seq']] = submitted
+    if submitted.saved:
+        _journal.synced(entry['seq'], submitted.admin_id)
+        result.synced += 1
+    elif submitted.failed == 'validate':
+        _reject(entry, 'survey {} already entered for respondent {} on {}'.format(
+            entry['survey_id'], respondent_id, entry['date_taken']), result)
+    else:
+        _reject(entry, 'could not save the {}: {}'.format(submitted.failed, submitted.error), result)
+    return True
+
+
+def administration_key(survey_id, respondent_id, date_taken):
+    '''
+    The key that makes a survey administration unique (see survey_already_entered()): respondent, survey and the day
+    it was taken, applications only once per respondent.
+    :param date_taken: a date/datetime or a MM/DD/YYYY string
+    :return: tuple
+    '''
+    if int(survey_id) == 7:
+        return int(respondent_id), 7, None
+    if isinstance(date_taken, str):
+        day = strftime('%Y-%m-%d', strptime(date_taken, '%m/%d/%Y'))
+    else:
+        day = date_taken.strftime('%Y-%m-%d')
+    return int(respondent_id), int(survey_id), day
+
+
+def get_administration_keys(con):
+    '''
+    Returns the administration_key() of every survey administration entered, for checking many new administrations
+    for duplicates with a single query.
+    :param con: backends.Connection object
+    :return: set of tuples
+    '''
+    return {administration_key(survey_id, respondent_id, date_taken)
+            for respondent_id, survey_id, date_taken in con.fetchall(GET_ADMINISTRATION_KEYS_QUERY)}
+
+
+def get_respondent_types(con):
+    '''
+    :param con: backends.Connection object
+    :return: dict of respondent id -> respondent type id
+    '''
+    return {int(resp_id): int(type_id) for resp_id, type_id in con.fetchall(GET_RESPONDENT_TYPE_IDS_QUERY)}
+
+
+def get_available_survey_pairs(con):
+    '''
+    :param con: backends.Connection object
+    :return: set of (respondent type id, survey id) tuples, the surveys each type of respondent can take
+    '''
+    return {(int(type_id), int(survey_id)) for type_id, survey_id in con.fetchall(GET_AVAILABLE_SURVEY_PAIRS_QUERY)}
+
+
+def bulk_insert_surveys(con, administrations):
+    '''
+    Inserts already validated survey administrations and their responses with array-bound batches: one round trip
+    for the administration IDs, one executemany for the administrations and one for all their responses. Everything is
+    committed together, or rolled back if any row fails.
+    :param con: backends.Connection object
+    :param administrations: list of (survey_id, respondent_id, date_taken, answers) tuples, date_taken in MM/DD/YYYY
+    format and answers a list of (question_id, answer_string) tuples
+    :return: the number of response rows inserted, -2 if an administration has already been entered, -1 if the batch
+    failed otherwise
+    '''
+    try:
+        ids = con.reserve_ids('rs_survey_response_seq', 'rs_survey_response', len(administrations))
+        ts = format_timestamp()
+        admin_rows = []
+        response_rows = []
+        for admin_id, (survey_id, respondent_id, date_taken, answers) in zip(ids, administrations):
+            admin_rows.append([admin_id, survey_id, respondent_id, date_taken, ts])
+            response_rows.extend([admin_id, quid, respondent_id, text] for quid, text in answers)
+        if admin_rows:
+            con.executemany(INSERT_SURVEY_ADMIN_WITH_ID_QUERY, admin_rows)
+        if response_rows:
+            con.executemany(INSERT_RESPONSES_QUERY, response_rows)
+        con.commit()
+    except Exception as e:
+        con.rollback()
+        if isinstance(e, con.backend.DatabaseError) and con.backend.is_unique_violation(e):
+            return -2
+        logger.error('Bulk insert failed: %s', e)
+        return -1
+    return len(response_rows)
+
+
+def get_surveys(con):
+    '''
+    :param con: backends.Connection object
+    :return: list of (id, name) tuples of every survey
+    '''
+    return con.fetchall(GET_SURVEYS_QUERY)
+
+
+def stream_survey_responses(con, survey_id, size=backends.ARRAYSIZE):
+    '''
+    Streams every response to a survey, ordered by administration and question order, in chunks of at most size rows.
+    :param con: backends.Connection object
+    :param survey_id: the id of the survey
+    :param size: rows fetched per round trip
+    :return: generator of lists of (admin id, respondent id, date taken, date entered, last updated, q_order, answer)
+    '''
+    return con.stream(GET_SURVEY_RESPONSES_QUERY, {'survey_id': survey_id}, size)
+
+
+# Record call counts, latency and rows of the database calls above (see query_stats.py)
+query_stats.instrument(globals(), __name__, also=('connect', 'create_pool'))
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+
+"""
+In-memory directory of every respondent, loaded once at login and kept current with incremental refreshes, so that
+searches and id lookups (name, district) are answered without going to the database.
+"""
+
+import sys
+from array import array
+
+UNCHANGED = object()  # default of update(), None clears a value
+
+
+def _intern(value):
+    # districts, cohorts and type names repeat across thousands of respondents, interning stores each string once
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class RespondentDirectory:
+    def __init__(self):
+        """
+        Column storage for the respondents: the ids in a typed array, the names, districts, cohorts and type names in
+        parallel lists (the repeated strings interned), and a dict of id -> slot. This takes a fraction of the memory
+        of a tuple per respondent. The directory also keeps the watermark of the last refresh: the highest id and the
+        latest last_updated seen.
+        """
+        self.slots = {}
+        self.ids = array('q')
+        self.names = []
+        self.districts = []
+        self.cohorts = []
+        self.types = []
+        self.max_id = 0
+        self.since = None
+
+    def put(self, resp_id, name, district=None, cohort=None, type_name=None, last_updated=None):
+        """
+        Adds a respondent, or replaces the details of one already in the directory.
+        :return: None
+        """
+        resp_id = int(resp_id)
+        slot = self.slots.get(resp_id)
+        if slot is None:
+            slot = self.slots[resp_id] = len(self.ids)
+            self.ids.append(resp_id)
+            self.names.append(name)
+            self.districts.append(_intern(district))
+            self.cohorts.append(_intern(cohort))
+            self.types.append(_intern(type_name))
+        else:
+            self.names[slot] = name
+            self.districts[slot] = _intern(district)
+            self.cohorts[slot] = _intern(cohort)
+            self.types[slot] = _intern(type_name)
+        self.max_id = max(self.max_id, resp_id)
+        if last_updated is not None and (self.since is None or last_updated > self.since):
+            self.since = last_updated
+
+    def update(self, resp_id, district=UNCHANGED, cohort=UNCHANGED):
+        """
+        Updates the district and/or cohort of a respondent, a value given as None is cleared.
+        :return: False if the respondent is not in the directory
+        """
+        slot = self.slots.get(int(resp_id))
+        if slot is None:
+            return False
+        if district is not UNCHANGED:
+            self.districts[slot] = _intern(district)
+        if cohort is not UNCHANGED:
+            self.cohorts[slot] = _intern(cohort)
+        return True
+
+    def discard(self, resp_id):
+        """
+        Drops a respondent from the directory, e.g. the local id of a respondent added offline once it has its database
+        id. The slot's storage is left in place.
+        :return: None
+        """
+        self.slots.pop(int(resp_id), None)
+
+    def row(self, resp_id):
+        """
+        :return: tuple of (id, name, district, cohort, type name), as returned by the respondent searches
+        """
+        slot = self.slots[resp_id]
+        return self.ids[slot], self.names[slot], self.districts[slot], self.cohorts[slot], self.types[slot]
+
+    def name(self, resp_id):
+        return self.names[self.slots[int(resp_id)]]
+
+    def district(self, resp_id):
+        return self.districts[self.slots[int(resp_id)]]
+
+    def rows(self):
+        """
+        :return: every respondent's row, sorted by id
+        """
+        return [self.row(resp_id) for resp_id in sorted(self.slots)]
+
+    def __contains__(self, resp_id):
+        return resp_id in self.slots
+
+    def __len__(self):
+        return len(self.slots)
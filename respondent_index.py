@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+
+"""
+In-memory search index over respondent names, used by queryfuncs.search_for_names() so that respondent searches do
+not have to scan rs_respondent with a leading-wildcard LIKE on every search.
+"""
+
+import threading
+from respondent_directory import RespondentDirectory, UNCHANGED
+
+GRAM_SIZE = 3
+# Names are padded so that every character starts a trigram, which lets 1-2 character terms use the index as well
+PADDING = '\0' * (GRAM_SIZE - 1)
+
+
+def trigrams(text):
+    """
+    Returns the set of 3 character substrings of the given text.
+    :param text: lowercase string
+    :return: set of strings
+    """
+    return {text[i:i+GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)}
+
+
+class RespondentIndex:
+    def __init__(self, rows, type_names):
+        """
+        Trigram index over respondent names. Each trigram of a lowercased name maps to the list of respondent ids whose
+        name contains it, so a substring search only has to check the respondents listed under the rarest trigram of
+        the search term. Terms shorter than a trigram are answered from the trigrams that start with them. The
+        respondents' details are kept in a RespondentDirectory (self.directory).
+        :param rows: rows from queryfuncs.GET_ALL_RESPONDENTS_QUERY (id, name, district, cohort, type name, last updated)
+        :param type_names: dict of respondent type id -> type name, used when adding respondents
+        """
+        self.type_names = type_names
+        self.lock = threading.RLock()  # searches run on the background worker, inserts on the Tk thread
+        self.directory = RespondentDirectory()
+        self.names = {}
+        self.grams = {}
+        self.prefixes = {}
+        for row in rows:
+            self.add(row)
+
+    def add(self, row):
+        """
+        Adds a respondent row to the index (or replaces the row if the id is already indexed).
+        :param row: tuple of (id, name, district, cohort, type name[, last updated])
+        :return: None
+        """
+        resp_id = int(row[0])
+        name = (row[1] or '').lower()
+        with self.lock:
+            if resp_id in self.names:
+                if self.names[resp_id] == name:
+                    self.directory.put(*row)  # same name, only the details changed
+                    return
+                self.remove(resp_id)
+            self.directory.put(*row)
+            self.names[resp_id] = name
+            for gram in trigrams(name + PADDING):
+                posting = self.grams.get(gram)
+                if posting is None:
+                    posting = self.grams[gram] = []
+                    for size in range(1, GRAM_SIZE):
+                        self.prefixes.setdefault(gram[:size], set()).add(gram)
+                posting.append(resp_id)
+
+    def add_respondent(self, resp_id, name, resp_type, district=None, cohort=None):
+        """
+        Adds a newly inserted respondent, looking up the name of its type.
+        :param resp_id: id of the respondent
+        :param name: name of the respondent
+        :param resp_type: respondent type id
+        :return: None
+        """
+        type_name = self.type_names.get(int(resp_type), resp_type)
+        self.add((resp_id, name, district, cohort, type_name))
+
+    def remove(self, resp_id):
+        """
+        Removes the respondent's name from the trigram postings, the directory keeps the details.
+        """
+        with self.lock:
+            name = self.names.pop(resp_id)
+            for gram in trigrams(name + PADDING):
+                self.grams[gram].remove(resp_id)
+
+    def update(self, resp_id, district=UNCHANGED, cohort=UNCHANGED):
+        """
+        Updates the district and/or cohort cached for a respondent, a value given as None is cleared. The name does not
+        change so the trigrams stay.
+        :return: None
+        """
+        with self.lock:
+            self.directory.update(resp_id, district, cohort)
+
+    def renumber(self, old_id, new_id):
+        """
+        Moves a respondent to a new id, used when a respondent added offline (with a local id) is inserted in the
+        database. If the new id is already indexed its row is kept.
+        :return: None
+        """
+        with self.lock:
+            if old_id not in self.names:
+                return
+            row = self.directory.row(old_id)
+            self.remove(old_id)
+            self.directory.discard(old_id)
+            if new_id not in self.names:
+                self.add((new_id,) + tuple(row[1:]))
+
+    def _match(self, term):
+        """
+        Returns the ids of all respondents whose lowercased name contains the term.
+        """
+        if len(term) < GRAM_SIZE:
+            matched = set()
+            for gram in self.prefixes.get(term, ()):
+                matched.update(self.grams[gram])
+            return matched
+        postings = []
+        for gram in trigrams(term):
+            posting = self.grams.get(gram)
+            if not posting:
+                return []
+            postings.append(posting)
+        candidates = min(postings, key=len)
+        if len(postings) == 1:
+            return list(candidates)
+        names = self.names
+        return [resp_id for resp_id in candidates if term in names[resp_id]]
+
+    def search(self, text):
+        """
+        Returns the rows of every respondent whose name contains any of the whitespace separated parts of the text,
+        respondents matching more of the parts first. An empty search returns every respondent.
+        :param text: the search string as typed by the user
+        :return: list of tuples (id, name, district, cohort, type name)
+        """
+        terms = set(text.lower().split())
+        with self.lock:
+            if not terms:
+                return self.directory.rows()
+
+            if len(terms) == 1:
+                ranked = sorted(self._match(terms.pop()))
+            else:
+                hits = {}
+                for term in terms:
+                    for resp_id in self._match(term):
+                        hits[resp_id] = hits.get(resp_id, 0) + 1
+                ranked = sorted(hits, key=lambda resp_id: (-hits[resp_id], resp_id))
+            row = self.directory.row
+            return [row(resp_id) for resp_id in ranked]
+
+    def __len__(self):
+        return len(self.directory)
@@ -15,6 +15,6 @@ setup(
         description='GUI For entering survey data from surveys',
         executables= [Executable(".\Survey Entry.py", base=base)],
         options={"build_exe":{"packages":['tkinter','cx_Oracle','datetime','time','enter_survey','student_lookup',
-                                          'queryfuncs','login','gui', 'datetime', 'add_respondent', 'possible_matches',
-                                          'fuzzywuzzy', 'Levenshtein']}}
+                                          'queryfuncs','query_stats','backends','sqlite3','respondent_index','respondent_directory','form_layout','metadata_cache','entry_journal','duplicates','virtual_table','db_worker','concurrent','survey_rules','login','gui', 'datetime', 'add_respondent', 'possible_matches',
+                                          'rapidfuzz', 'numpy']}}
 )
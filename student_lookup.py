@@ -3,29 +3,36 @@
 import tkinter as tk
 import queryfuncs as qf
 from tkinter import messagebox
+from virtual_table import VirtualTable, SelectionModel
+
+
+RESPONDENT_COLUMNS = [('ID', 7), ('Name', 25), ('District', 25), ('Cohort', 10), ('Type', 20)]
+
 
 class StudentLookup:
-    def __init__(self, master, widget, con, prev_window):
+    def __init__(self, master, widget, con, prev_window, worker):
         """
         TKinter window opened when, during the course of survey entry, the user clicks on the "Student name" field
         in a non-student survey. This field MUST be correctly entered, and as such, requires the user to search through
         and select from the list of students already entered into the DB. This process is performed nearly identically
-        to the respondent search process in the main gui class. The window is constructed with a scrollable canvas for
-        the search results.
+        to the respondent search process in the main gui class. The search results are shown in a scrollable
+        VirtualTable.
 
         :param master: TK Root object of the window
         :param widget: the widget object from the survey that this process is filling out
         :param con: cx_Oracle connection object
         :param prev_window: the survey window object that constructed this object
+        :param worker: DBWorker the searches run on
         """
         self.toenter_widget = widget
         self.con = con
+        self.worker = worker
         self.master = master
         self.prev_window = prev_window
 
         self.resp_frame = None
-        self.results_frame = None
-        self.resp_canvas = None
+        self.active_id = None
+        self.selection = SelectionModel(key=lambda row: row[0])
 
         self.master.minsize(700,300)
         self.master.title('Student Lookup')
@@ -47,26 +54,10 @@ class StudentLookup:
 
         self.resp_frame = tk.Frame(self.master_frame)
         tk.Label(self.resp_frame, text='Please click on an ID', font=('Times New Roman', '11', 'bold')).pack(anchor='w', padx=20)
-        self.resp_search_canvas = tk.Canvas(self.resp_frame, borderwidth=0, height = 100, width=600)
-        self.search_vsb = tk.Scrollbar(self.resp_frame)
-        self.resp_results_frame = tk.Frame(self.resp_search_canvas)
-        self.resp_search_canvas.config(yscrollcommand=self.search_vsb.set)
-        self.search_vsb.pack(side="right", fill='y')
-        self.resp_search_canvas.pack(side='left', fill='both', expand=True)
-        self.resp_search_canvas.create_window((0, 0), window=self.resp_results_frame, anchor='nw', tags='self.resp_results_frame')
-        self.search_vsb.config(command=self.resp_search_canvas.yview)
-        self.resp_results_frame.bind("<Configure>", self.onFrameConfigure)
+        self.respondents_table = VirtualTable(self.resp_frame, RESPONDENT_COLUMNS, height=5, command=self.highlight_respondent,
+                                              empty_text='Search for Respondents Above', selection=self.selection)
+        self.respondents_table.pack(side='left', fill='both', expand=True)
         self.resp_frame.pack(anchor='w', padx=30)
-        self.resp_labels_frame = tk.Frame(self.resp_results_frame)
-        tk.Label(self.resp_labels_frame, text='ID', font=('Times New Roman', 10, 'bold'), width=7, bd=1).grid(row=2, column=0, sticky='nsew')
-        tk.Label(self.resp_labels_frame, text='Name', font=('Times New Roman', 10, 'bold'), width=25, bd=1).grid(row=2, column=1, sticky='nsew')
-        tk.Label(self.resp_labels_frame, text='District', font=('Times New Roman', 10, 'bold'), width=25, bd=1).grid(row=2, column=2, sticky='nsew')
-        tk.Label(self.resp_labels_frame, text='Cohort', font=('Times New Roman', 10, 'bold'), width=10, bd=1).grid(row=2, column=3, sticky='nsew')
-        tk.Label(self.resp_labels_frame, text='Type', font=('Times New Roman', 10, 'bold'), width=20, bd=1).grid(row=2, column=4, sticky='nsew')
-        self.resp_labels_frame.pack(anchor='w')
-        self.created_respondents_table = tk.Frame(self.resp_results_frame)
-        tk.Label(self.created_respondents_table, text='Search for Respondents Above', font=('Times New Roman', 10, 'italic'), width=75, bd=1).grid(row=1, column=0, columnspan=4, sticky='nsew')
-        self.created_respondents_table.pack(anchor='w')
 
         self.selectbutton = tk.Button(self.master_frame, text='Select Student', command=self.select_student, state='disabled')
         self.selectbutton.pack(anchor='c', side='bottom')
@@ -74,106 +65,40 @@ class StudentLookup:
     def respondent_search(self, *args):
         """
         Button method used to search the db for the entered respondent. Clears any previous respondent selection as well.
+        The search runs on the worker, a newer search replaces one still running.
         :param args: catchall for event args
         :return: None, the process calls create_response_table() method that constructs the tk objects
         """
-        self.active_resp = {}
         self.active_id = None
+        self.selection.clear()
+        self.selectbutton.config(state='disabled')
         text = self.respSearchStr.get()
-        results = qf.search_for_names(self.con, text)
-        results = [res for res in results if res[4]=='Student']
-        self.create_response_table(results)
+        self.worker.submit(qf.search_for_names, text, callback=self.fill_students, key='student_search')
 
-    def onFrameConfigure(self, event):
-        """
-        Reset the scroll region to encompass the inner frame. Since there is only one scrollable object here there
-        is no need for the recursive canvas search method.
-        """
-        cnvs = event.widget.master
-        cnvs.configure(scrollregion=cnvs.bbox("all"))
+    def fill_students(self, results):
+        if not self.master.winfo_exists():
+            return  # the lookup was closed while searching
+        self.create_response_table([res for res in results if res[4]=='Student'])
 
     def create_response_table(self, respondents):
         """
-        Method destroys any old response table and then constructs a new table. Table is built using lables aligned in
-        the grid. Each label can be clicked on with the left mouse button to "highlight" that row and mark that respondent
-        as active. Active respondents have their id stored in the instance variable "active_id" and is passed accordingly.
+        Method fills the results table with the respondents found. The table is a VirtualTable, which only builds labels
+        for the rows in view. Each row can be clicked on with the left mouse button to "highlight" that row and mark that
+        respondent as active. Active respondents have their id stored in the instance variable "active_id" and is passed
+        accordingly.
         :param respondents: List generated from qf.search_for_names which returns respondents that match the given string
-        :return: None, constructs tk objects and places them into the window.
+        :return: None, fills the results table.
         """
-        for child in self.created_respondents_table.winfo_children():
-            child.destroy()
-
-        if not respondents:
-            tk.Label(self.created_respondents_table, text='No Respondents Found', font=('Times New Roman', '10', 'bold italic'), width = 75).grid(row=1, column=0, columnspan = 4, sticky = 'nsew')
-
-        else:
-            self.resp_widgets = {}
-            for rowid, row in enumerate(respondents):
-                if rowid % 2 == 0:
-                    bgcol = '#ffffcc'
-                else:
-                    bgcol = '#ffffff'
-                self.resp_widgets[rowid] = {
-                    'rowid':rowid,
-                    'id': tk.Label(self.created_respondents_table, text=row[0], bg=bgcol, width=7, bd=1),
-                    'name': tk.Label(self.created_respondents_table, text=row[1], bg=bgcol, width=25, bd=1),
-                    'district': tk.Label(self.created_respondents_table, text=row[2], bg=bgcol, width=25, bd=1),
-                    'cohort': tk.Label(self.created_respondents_table, text=row[3], bg=bgcol, width=10, bd=1),
-                    'type': tk.Label(self.created_respondents_table, text=row[4], bg=bgcol, width=20, bd=1)
-                }
-
-                self.resp_widgets[rowid]['id'].grid(row=rowid, column=0, sticky='nsew')
-                self.resp_widgets[rowid]['id'].bind('<Button-1>', self.highlight_respondent)
-                self.resp_widgets[rowid]['name'].grid(row=rowid, column=1, sticky='nsew')
-                self.resp_widgets[rowid]['name'].bind('<Button-1>', self.highlight_respondent)
-                self.resp_widgets[rowid]['district'].grid(row=rowid, column=2, sticky='nsew')
-                self.resp_widgets[rowid]['district'].bind('<Button-1>', self.highlight_respondent)
-                self.resp_widgets[rowid]['cohort'].grid(row=rowid, column=3, sticky='nsew')
-                self.resp_widgets[rowid]['cohort'].bind('<Button-1>', self.highlight_respondent)
-                self.resp_widgets[rowid]['type'].grid(row=rowid, column=4, sticky='nsew')
-                self.resp_widgets[rowid]['type'].bind('<Button-1>', self.highlight_respondent)
-
-        self.created_respondents_table.pack(anchor='w')
-
-    def highlight_respondent(self, event):
+        self.respondents_table.set_rows(respondents, empty_text='No Respondents Found')
+
+    def highlight_respondent(self, row):
         """
-        Utility method used to simluate the "selecting" of a table row. When a label is clicked, that label is back referenced
-        to find all corresponding labels in that row. The default background for each label in that row is stored and the
-        backgrounds for each label is set to a light blue. If a row had been previously selected, that row has its default
-        background returned and the new row overwrites that saved information.
-        :param event: the event widget passed by tkinter
-        :return: None, changes the backgrounds and sets self.active_id to the selected student
+        Utility method called when a row of the results table is clicked, the selection model highlights the row and
+        the respondent of that row becomes the active student.
+        :param row: the clicked respondent row, passed by the VirtualTable
+        :return: None, sets self.active_id to the selected student
         """
-        # Set previously selected to old color
-        selected_widget = event.widget
-
-        if self.active_resp:
-            for i in range(len(self.active_resp)):
-                self.active_resp[i]['widget'].config(bg = self.active_resp[i]['bg'])
-
-        self.active_resp= []
-        selected_row = None
-
-        for i in range(len(self.resp_widgets)):
-            rowwidgets = self.resp_widgets[i]
-            for widget in rowwidgets.values():
-                #print(widget)
-                if widget == selected_widget:
-                    if widget in [widg['widget'] for widg in self.active_resp]:
-                        return
-                    selected_row = self.resp_widgets[i]['rowid']
-                    break
-
-        for key, widget in self.resp_widgets[selected_row].items():
-            #print(widget)
-            if key != 'rowid':
-                self.active_resp.append({
-                    'widget':widget,
-                    'bg':widget.cget('bg')
-                })
-                widget.config(bg='lightblue')
-
-        self.active_id = self.resp_widgets[selected_row]['id'].cget('text')
+        self.active_id = row[0]
         self.selectbutton.config(state='normal')
 
     def select_student(self, *args):
@@ -16,6 +16,7 @@ of the surveys to correctly function. Changes in the surveys will undoubtedly ne
 IMPORTANT: This app necessarily relies on an Oracle Database.
 """
 
+import logging
 import tkinter as tk
 from login import Login
 
@@ -28,6 +29,7 @@ __email__ = "david.jones4822@gmail.com"
 __status__ = "Production"
 
 def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
     root = tk.Tk()
     app = Login(root)
     root.mainloop()
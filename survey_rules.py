@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+
+"""
+The entry rules of the surveys, shared by the SurveyEntry window and the bulk importer so that a survey loaded from a
+file has to pass the same checks as one keyed in by hand.
+"""
+
+import time
+import datetime
+
+REQUIRED_QUIDS = (91, 92, 93, 94, 95, 96)  # must be answered on every survey
+DATE_QUIDS = (96, 116)  # "date taken" on the surveys, "date of birth" on the student application
+APPLICATION_SURVEY_ID = 7  # every question of the student application must be answered
+DATE_FORMAT = '%m/%d/%Y'
+
+SINGLE_ANSWER_TYPES = (1, 2, 3, 4)  # short_string, long_string, single_choice, table_single_choice
+CHOICE_TYPES = (3, 4, 5, 6)
+
+
+class ValidationError(Exception):
+    def __init__(self, title, message):
+        """
+        A rule the entered survey breaks, title and message are what the entry window shows in its error popup.
+        """
+        Exception.__init__(self, message)
+        self.title = title
+        self.message = message
+
+
+def date_taken(survey_id, date):
+    """
+    Checks the date entered on the survey (the date of birth on the student application) and returns the date the
+    administration is stored with. The "date taken" field doesn't exist on the student application, so it is set to
+    the day the application is entered.
+    :param survey_id: the id of the survey
+    :param date: the entered date, must be in MM/DD/YYYY format
+    :return: the date taken as a MM/DD/YYYY string
+    """
+    if not date:
+        if survey_id == APPLICATION_SURVEY_ID:
+            raise ValidationError('Date Error', 'You haven\'t entered a date of birth.\nPlease enter one in the format of MM/DD/YYYY')
+        raise ValidationError('Date Error', 'You haven\'t entered a date.\nPlease enter one in the format of MM/DD/YYYY')
+    try:
+        time.strptime(date, DATE_FORMAT)
+    except ValueError:
+        raise ValidationError('Date Error', 'You\'ve entered a date that is not in correct format\nPlease change to MM/DD/YYYY format') from None
+
+    if survey_id == APPLICATION_SURVEY_ID:
+        return datetime.date.today().strftime(DATE_FORMAT)
+    return date
+
+
+def check_required(survey_id, quid, text):
+    """
+    Raises ValidationError if the question must be answered and text is empty.
+    :param survey_id: the id of the survey
+    :param quid: the question id
+    :param text: the answer entered
+    :return: None
+    """
+    if text:
+        return
+    if survey_id == APPLICATION_SURVEY_ID:
+        raise ValidationError("Empty Fields", 'Student Applications must be completely filled out, if an answer is left blank by the student or parents please enter \"None\"')
+    if quid in REQUIRED_QUIDS:
+        raise ValidationError("Empty Fields", "You haven't answered the required questions\n\nPlease answer all questions marked with an \"*\"")
+
+
+def validate_administration(definition, answers):
+    """
+    Applies the entry rules to a whole administration given outside of the entry window: every answer has to belong to
+    a question of the survey, choice answers have to be one of the question's choices, single answer questions take at
+    most one answer, the date and the required questions have to be filled in.
+    :param definition: queryfuncs.SurveyDefinition of the survey
+    :param answers: dict of question order -> answer string or list of answer strings
+    :return: (list of (question_id, answer) tuples, date taken as MM/DD/YYYY)
+    """
+    survey_id = int(definition.survey_id)
+    answers = {int(num): [texts] if isinstance(texts, str) else list(texts) for num, texts in answers.items()}
+    orders = {int(num): (quid, text) for quid, text, num in definition.questions}
+    unknown = sorted(set(answers) - set(orders))
+    if unknown:
+        raise ValidationError('Unknown Question', 'Survey {} has no question {}'.format(survey_id, unknown[0]))
+
+    rows = []
+    date = None
+    date_found = False
+    for num in sorted(orders):
+        quid, qtext = orders[num]
+        qtype = int(definition.question_type(quid)[0])
+        texts = [text for text in answers.get(num, []) if text]
+
+        if qtype in SINGLE_ANSWER_TYPES and len(texts) > 1:
+            raise ValidationError('Too Many Answers', 'Question {} takes a single answer'.format(num))
+        if qtype in CHOICE_TYPES:
+            choices = [choice for _, choice in definition.question_responses(quid)]
+            for text in texts:
+                if text not in choices:
+                    raise ValidationError('Invalid Answer', '"{}" is not a choice of question {}'.format(text, num))
+        if quid in DATE_QUIDS:
+            date_found = True
+            date = date_taken(survey_id, texts[0] if texts else '')
+        if qtype in SINGLE_ANSWER_TYPES:
+            check_required(survey_id, quid, texts[0] if texts else '')
+        rows.extend((quid, text) for text in texts)
+
+    if not date_found:
+        raise ValidationError('Fatal Error', 'Survey {} has no date question'.format(survey_id))
+    return rows, date
@@ -0,0 +1,430 @@
+#!/usr/bin/env python
+
+"""
+Generates a consistent synthetic dataset for load testing: the surveys of the program (student pre/mid-year/post
+surveys, parent and mentor surveys and the student application) with questions of all six types, students, parents
+and mentors with a realistic spread of names (including near-duplicates for the fuzzy matcher in AddRespondent), and
+administrations with their responses up to a target number of rs_response rows.
+
+Rows are generated lazily and written in batches (the responses through queryfuncs.bulk_insert_surveys()), so memory
+use stays flat however many responses are generated. Only the respondents' names and ids are kept in memory.
+
+The database must not have any surveys yet. On Oracle, restart the ID sequences above the generated ids afterwards.
+
+usage: python synthetic_data.py -d DOMAIN [-u USER] [-p PASSWORD] [--responses N] [--respondents N] [--seed N]
+"""
+
+import sys
+import getpass
+import argparse
+from random import Random
+from time import perf_counter
+import queryfuncs as qf
+import survey_rules
+
+SEED = 20180101
+RESPONSES = 1000000  # default target of rs_response rows
+RESPONSES_PER_RESPONDENT = 60  # used to size the respondents when their number isn't given
+BATCH_ROWS = 5000  # respondents per executemany batch
+BATCH_ADMINISTRATIONS = 500  # administrations per bulk_insert_surveys() batch
+
+STUDENT, PARENT, MENTOR = 1, 2, 3
+RESPONDENT_MIX = ((STUDENT, 0.6), (PARENT, 0.3), (MENTOR, 0.1))
+NEAR_DUPLICATE_RATE = 0.03  # share of respondents whose name is a typo/nickname variant of an existing one
+
+# (survey id, name, respondent type, instrument) surveys sharing an instrument ask the same questions
+SURVEYS = (
+    (1, 'Student Pre Survey', STUDENT, 'student'),
+    (2, 'Student Mid-Year Survey', STUDENT, 'student_mid'),
+    (3, 'Student Post Survey', STUDENT, 'student'),
+    (4, 'Parent Pre Survey', PARENT, 'parent'),
+    (5, 'Parent Post Survey', PARENT, 'parent'),
+    (6, 'Mentor Survey', MENTOR, 'mentor'),
+    (survey_rules.APPLICATION_SURVEY_ID, 'Student Application', STUDENT, 'application'),
+)
+# blocks of generated questions per instrument, see instrument_questions()
+INSTRUMENT_BLOCKS = {'student': 5, 'student_mid': 3, 'parent': 3, 'mentor': 3, 'application': 12}
+
+# The fixed questions the entry window treats specially (see SurveyEntry and survey_rules)
+HEADER_QUESTIONS = {
+    91: 'School', 92: 'Grade', 93: 'Program site', 94: 'Staff initials', 95: 'Form version',
+    96: 'Date taken (MM/DD/YYYY)', 97: 'Student name', 99: 'Parent/guardian name', 100: 'Mentor name',
+    116: 'Date of birth (MM/DD/YYYY)'
+}
+HEADER_ANSWERS = {
+    91: ('Central High', 'Eastside Middle', 'Lincoln Elementary', 'Westview High', 'Northgate Middle'),
+    92: ('6', '7', '8', '9', '10', '11', '12'),
+    93: ('Main campus', 'Library', 'Community center'),
+    94: ('DJ', 'AM', 'KL', 'RT', 'SB'),
+    95: ('A', 'B')
+}
+
+SCALES = (
+    ('Strongly Disagree', 'Disagree', 'Agree', 'Strongly Agree'),
+    ('Never', 'Rarely', 'Sometimes', 'Often', 'Always'),
+    ('Not at all', 'A little', 'Somewhat', 'A lot'),
+    ('Yes', 'No')
+)
+CHECKLISTS = (
+    ('Fall', 'Spring', 'Summer'),
+    ('Math', 'Reading', 'Science', 'Art', 'Music', 'Sports'),
+    ('Email', 'Phone', 'Text', 'In person')
+)
+SINGLE_CHOICES = (
+    ('Yes', 'No', 'Not sure'),
+    ('Very satisfied', 'Satisfied', 'Unsatisfied', 'Very unsatisfied'),
+    ('Less than 1 hour', '1-2 hours', '3-5 hours', 'More than 5 hours')
+)
+TOPICS = ('school', 'homework', 'your mentor', 'the program', 'college', 'your family', 'reading', 'your future')
+COMMENT_WORDS = ('the', 'program', 'really', 'helped', 'me', 'with', 'my', 'grades', 'mentor', 'was', 'great',
+                 'would', 'like', 'more', 'time', 'for', 'activities', 'and', 'trips', 'homework')
+
+# Ordered by frequency, sampled with Zipf-like weights so common names repeat the way they do in the real data
+FIRST_NAMES = ('Michael', 'Jessica', 'Christopher', 'Ashley', 'Matthew', 'Jennifer', 'Joshua', 'Amanda', 'Daniel',
+               'Sarah', 'David', 'Stephanie', 'James', 'Brittany', 'Robert', 'Nicole', 'John', 'Heather', 'Joseph',
+               'Elizabeth', 'Andrew', 'Megan', 'Ryan', 'Melissa', 'Brandon', 'Amber', 'Jason', 'Rachel', 'Justin',
+               'Tiffany', 'William', 'Danielle', 'Jonathan', 'Maria', 'Jose', 'Kayla', 'Anthony', 'Laura', 'Kevin',
+               'Samantha', 'Luis', 'Sofia', 'Jamal', 'Aaliyah', 'DeShawn', 'Imani', 'Mei', 'Wei', 'Priya', 'Omar',
+               'Fatima', 'Nguyen', 'Aiyana', 'Santiago', 'Ximena', 'Tyrone', 'Keisha', 'Hiroshi', 'Ingrid', 'Bogdan')
+LAST_NAMES = ('Smith', 'Johnson', 'Williams', 'Jones', 'Brown', 'Davis', 'Miller', 'Wilson', 'Moore', 'Taylor',
+              'Anderson', 'Thomas', 'Jackson', 'White', 'Harris', 'Martin', 'Thompson', 'Garcia', 'Martinez',
+              'Robinson', 'Clark', 'Rodriguez', 'Lewis', 'Lee', 'Walker', 'Hall', 'Allen', 'Young', 'Hernandez',
+              'King', 'Wright', 'Lopez', 'Hill', 'Scott', 'Green', 'Adams', 'Baker', 'Gonzalez', 'Nelson', 'Carter',
+              'Mitchell', 'Perez', 'Roberts', 'Turner', 'Phillips', 'Campbell', 'Parker', 'Evans', 'Edwards',
+              'Collins', 'Nguyen', 'Kim', 'Patel', 'Washington', 'Jefferson', "O'Brien", 'Van Buren', 'Okafor',
+              'Kowalski', 'Yamamoto')
+NICKNAMES = {'Michael': 'Mike', 'Christopher': 'Chris', 'Matthew': 'Matt', 'Jennifer': 'Jen', 'Joshua': 'Josh',
+             'Daniel': 'Dan', 'David': 'Dave', 'James': 'Jim', 'Robert': 'Bob', 'John': 'Jack', 'Joseph': 'Joe',
+             'Elizabeth': 'Liz', 'Andrew': 'Andy', 'William': 'Bill', 'Anthony': 'Tony', 'Samantha': 'Sam'}
+NAME_SUFFIXES = ('Jr.', 'Sr.', 'II', 'III')
+DISTRICTS = ('Baltimore City', 'Baltimore County', 'Anne Arundel', 'Howard', 'Prince George\'s', 'Montgomery')
+COHORTS = ('2014', '2015', '2016', '2017', '2018', '2019')
+
+
+def zipf_weights(count):
+    return [1 / rank for rank in range(1, count + 1)]
+
+
+def instrument_questions(rng, blocks, start_quid):
+    """
+    Generates the body questions of an instrument, each block has a question of every type: a single choice, a table
+    of single choice statements sharing a scale, a table of checklists sharing their choices, a multiple choice and a
+    short and a long answer. Consecutive tables share their answers, like on the paper surveys.
+    :return: list of (question id, text, question type, choices)
+    """
+    questions = []
+    quid = start_quid
+    for block in range(blocks):
+        topic = TOPICS[block % len(TOPICS)]
+        questions.append((quid, 'How do you feel about {}?'.format(topic), 3, rng.choice(SINGLE_CHOICES)))
+        quid += 1
+        scale = rng.choice(SCALES)
+        for row in range(rng.randint(3, 6)):
+            questions.append((quid, 'Statement {} about {}'.format(row + 1, topic), 4, scale))
+            quid += 1
+        checklist = rng.choice(CHECKLISTS)
+        for row in range(rng.randint(2, 4)):
+            questions.append((quid, 'When did you take part in activity {} ({})?'.format(row + 1, topic), 5, checklist))
+            quid += 1
+        questions.append((quid, 'Which of these apply to {}? (check all)'.format(topic), 6, rng.choice(CHECKLISTS)))
+        quid += 1
+        questions.append((quid, 'Name one thing about {}'.format(topic), 1, ()))
+        quid += 1
+        questions.append((quid, 'Comments about {}'.format(topic), 2, ()))
+        quid += 1
+    return questions
+
+
+def survey_questions(rng):
+    """
+    The questions of every survey, header questions first.
+    :return: dict of survey id -> list of (question id, text, question type, choices)
+    """
+    instruments = {}
+    quid = 1000
+    for instrument, blocks in sorted(INSTRUMENT_BLOCKS.items()):
+        instruments[instrument] = instrument_questions(rng, blocks, quid)
+        quid += 1000
+    surveys = {}
+    for survey_id, _, resp_type, instrument in SURVEYS:
+        if survey_id == survey_rules.APPLICATION_SURVEY_ID:
+            header = [91, 92, 93, 94, 95, 116]
+        else:
+            header = [91, 92, 93, 94, 95, 96, 97] + {PARENT: [99], MENTOR: [100]}.get(resp_type, [])
+        surveys[survey_id] = [(q, HEADER_QUESTIONS[q], 1, ()) for q in header] + instruments[instrument]
+    return surveys
+
+
+def write_surveys(con, surveys):
+    """
+    Inserts the surveys, their questions, types, orders and choices and which respondent types they are available to.
+    :return: None
+    """
+    questions = {}
+    for rows in surveys.values():
+        for quid, text, qtype, choices in rows:
+            questions[quid] = (text, qtype, choices)
+    con.executemany('INSERT INTO RS_SURVEY (ID, NAME, DESCRIPTION) VALUES (:1, :2, :3)',
+                    [[survey_id, name, 'Synthetic {} survey'.format(instrument)]
+                     for survey_id, name, _, instrument in SURVEYS])
+    con.executemany('INSERT INTO RS_AVAILABLE_SURVEYS (RESPONDENT_TYPE_ID, SURVEY_ID) VALUES (:1, :2)',
+                    [[resp_type, survey_id] for survey_id, _, resp_type, _ in SURVEYS])
+    con.executemany('INSERT INTO RS_QUESTION (ID, TEXT) VALUES (:1, :2)',
+                    [[quid, text] for quid, (text, _, _) in sorted(questions.items())])
+    con.executemany('INSERT INTO RS_QUESTION_TYPE (QUESTION_ID, NAME) VALUES (:1, :2)',
+                    [[quid, qtype] for quid, (_, qtype, _) in sorted(questions.items())])
+    con.executemany('INSERT INTO RS_QUESTION_ORDER (SURVEY_ID, QUESTION_ID, Q_ORDER) VALUES (:1, :2, :3)',
+                    [[survey_id, question[0], order] for survey_id, rows in sorted(surveys.items())
+                     for order, question in enumerate(rows, 1)])
+    choice_rows = []
+    for quid, (_, _, choices) in sorted(questions.items()):
+        for answer_order, choice in enumerate(choices, 1):
+            choice_rows.append([len(choice_rows) + 1, quid, choice, answer_order])
+    con.executemany('INSERT INTO RS_RESPONSE_CHOICE (ID, QUESTION_ID, TEXT, ANSWER_ORDER) VALUES (:1, :2, :3, :4)',
+                    choice_rows)
+    con.commit()
+
+
+class NameGenerator:
+    def __init__(self, rng):
+        """
+        Draws names with Zipf-like first and last name frequencies. A share of the names are near-duplicates of a
+        previous name (a typo, a nickname, a dropped or added middle initial), the cases the fuzzy matcher has to catch.
+        Names are unique per respondent type, as the schema requires.
+        """
+        self.rng = rng
+        self.first_weights = zipf_weights(len(FIRST_NAMES))
+        self.last_weights = zipf_weights(len(LAST_NAMES))
+        self.used = {}
+        self.recent = []
+
+    def base_name(self, last=None):
+        first = self.rng.choices(FIRST_NAMES, self.first_weights)[0]
+        last = last or self.rng.choices(LAST_NAMES, self.last_weights)[0]
+        if self.rng.random() < 0.15:
+            return '{} {}. {}'.format(first, chr(self.rng.randint(65, 90)), last)
+        return '{} {}'.format(first, last)
+
+    def near_duplicate(self, name):
+        rng = self.rng
+        kind = rng.randint(0, 3)
+        first, _, rest = name.partition(' ')
+        if kind == 0 and first in NICKNAMES:
+            return '{} {}'.format(NICKNAMES[first], rest)
+        if kind == 1 and len(name) > 4:  # transposed letters
+            i = rng.randint(1, len(name) - 3)
+            return name[:i] + name[i + 1] + name[i] + name[i + 2:]
+        if kind == 2 and len(name) > 4:  # dropped letter
+            i = rng.randint(1, len(name) - 2)
+            return name[:i] + name[i + 1:]
+        last = last_name(name)
+        if last is None:
+            return None
+        head, _, tail = name.rpartition(last)
+        return '{}{}-{}{}'.format(head, last, rng.choice(LAST_NAMES), tail)  # hyphenated last name
+
+    def name(self, resp_type, last=None):
+        used = self.used.setdefault(resp_type, set())
+        name = None
+        if self.recent and self.rng.random() < NEAR_DUPLICATE_RATE:
+            name = self.near_duplicate(self.rng.choice(self.recent))
+        attempts = 0
+        while name is None or name in used:
+            name = self.base_name(last)
+            attempts += 1
+            if name in used and attempts > 5:  # the common names run out in large datasets
+                name = '{} {}'.format(name, self.rng.choice(NAME_SUFFIXES + (self.rng.randint(2, 9999),)))
+        used.add(name)
+        self.recent.append(name)
+        if len(self.recent) > 1000:
+            del self.recent[:500]
+        return name
+
+
+def last_name(name):
+    parts = [part for part in name.split()[1:] if part not in NAME_SUFFIXES and not part.isdigit()]
+    return parts[-1] if parts else None
+
+
+def respondent_rows(rng, counts, students):
+    """
+    Generates the respondents: students first, then parents (sharing a student's last name and district) and mentors.
+    :param counts: dict of respondent type -> number of respondents
+    :param students: list the (id, name) of each student is appended to, used to link parents and mentors
+    :return: generator of [id, name, type, district, cohort] rows
+    """
+    names = NameGenerator(rng)
+    resp_id = 0
+    districts = {}
+    for _ in range(counts[STUDENT]):
+        resp_id += 1
+        name = names.name(STUDENT)
+        district = rng.choice(DISTRICTS)
+        students.append((resp_id, name))
+        districts[resp_id] = district
+        yield [resp_id, name, STUDENT, district, rng.choice(COHORTS)]
+    for resp_type in (PARENT, MENTOR):
+        for _ in range(counts[resp_type]):
+            resp_id += 1
+            student_id, student_name = rng.choice(students)
+            last = last_name(student_name) if resp_type == PARENT else None
+            yield [resp_id, names.name(resp_type, last), resp_type, districts[student_id], None]
+
+
+def comment(rng):
+    return ' '.join(rng.choice(COMMENT_WORDS) for _ in range(rng.randint(5, 25))).capitalize() + '.'
+
+
+def answer_survey(rng, survey_id, questions, date, respondent_name, student_name):
+    """
+    Fills in one administration of a survey.
+    :return: list of (question id, answer) tuples
+    """
+    application = survey_id == survey_rules.APPLICATION_SURVEY_ID
+    answers = []
+    for quid, _, qtype, choices in questions:
+        if quid in survey_rules.DATE_QUIDS:
+            answers.append((quid, date))
+        elif quid == 97:
+            answers.append((quid, respondent_name if survey_id in (1, 2, 3) else student_name))
+        elif quid in (99, 100):
+            answers.append((quid, respondent_name))
+        elif quid in HEADER_ANSWERS:
+            answers.append((quid, rng.choice(HEADER_ANSWERS[quid])))
+        elif qtype in (3, 4):
+            if application or rng.random() < 0.97:
+                answers.append((quid, rng.choice(choices)))
+        elif qtype in (5, 6):
+            answers.extend((quid, choice) for choice in choices if rng.random() < 0.35)
+        elif qtype == 1:
+            if application or rng.random() < 0.6:
+                answers.append((quid, rng.choice(TOPICS).capitalize()))
+        elif application or rng.random() < 0.25:
+            answers.append((quid, comment(rng)))
+    return answers
+
+
+def administrations(rng, surveys, respondents, students):
+    """
+    Generates survey administrations, going through the respondents in passes (each in a random order) until the caller
+    stops: every pass takes each respondent's surveys once or twice, on dates in a year of its own, so that no
+    administration repeats a respondent, survey and date taken. Students fill in the application once.
+    :param respondents: list of (id, name, type)
+    :param students: list of (id, name) of the students, linked to the parent and mentor surveys
+    :return: generator of (survey_id, respondent_id, date_taken, answers) tuples
+    """
+    by_type = {}
+    for survey_id, _, resp_type, _ in SURVEYS:
+        by_type.setdefault(resp_type, []).append(survey_id)
+    year = 2000
+    order = list(respondents)
+    while True:
+        rng.shuffle(order)
+        for resp_id, name, resp_type in order:
+            student_name = rng.choice(students)[1] if resp_type != STUDENT else name
+            for survey_id in by_type[resp_type]:
+                if survey_id == survey_rules.APPLICATION_SURVEY_ID:
+                    if year == 2000 and rng.random() < 0.8:
+                        birth = '{:02d}/{:02d}/{}'.format(rng.randint(1, 12), rng.randint(1, 28), rng.randint(1998, 2006))
+                        yield (survey_id, resp_id, survey_rules.date_taken(survey_id, birth),
+                               answer_survey(rng, survey_id, surveys[survey_id], birth, name, student_name))
+                    continue
+                days = rng.sample(range(1, 337), rng.randint(1, 2))
+                for day in days:
+                    date = '{:02d}/{:02d}/{}'.format((day - 1) // 28 + 1, (day - 1) % 28 + 1, year)
+                    yield (survey_id, resp_id, date,
+                           answer_survey(rng, survey_id, surveys[survey_id], date, name, student_name))
+        year += 1
+
+
+def generate(con, responses=RESPONSES, respondents=None, seed=SEED, verbose=True):
+    """
+    Fills an empty database with the synthetic surveys, respondents and about the given number of response rows.
+    :param con: backends.Connection object
+    :param responses: target number of rs_response rows
+    :param respondents: number of respondents, by default responses / RESPONSES_PER_RESPONDENT (at least 100)
+    :param seed: seed of the random generator, the same seed gives the same data
+    :param verbose: print progress
+    :return: dict with the number of respondents, administrations and responses written
+    """
+    if con.fetchall('select count(*) from rs_survey')[0][0]:
+        raise ValueError('The database already has surveys, synthetic data is only generated into an empty database')
+    rng = Random(seed)
+    start = perf_counter()
+    surveys = survey_questions(rng)
+    write_surveys(con, surveys)
+
+    total = respondents or max(100, responses // RESPONSES_PER_RESPONDENT)
+    counts = {resp_type: int(total * share) for resp_type, share in RESPONDENT_MIX}
+    counts[STUDENT] += total - sum(counts.values())
+    students = []
+    people = []
+    batch = []
+    for row in respondent_rows(rng, counts, students):
+        people.append((row[0], row[1], row[2]))
+        batch.append(row)
+        if len(batch) >= BATCH_ROWS:
+            con.executemany('INSERT INTO RS_RESPONDENT (ID, NAME, RESPONDENT_TYPE_ID, ENROLLED_DISTRICT, COHORT) '
+                            'VALUES (:1, :2, :3, :4, :5)', batch)
+            batch = []
+    if batch:
+        con.executemany('INSERT INTO RS_RESPONDENT (ID, NAME, RESPONDENT_TYPE_ID, ENROLLED_DISTRICT, COHORT) '
+                        'VALUES (:1, :2, :3, :4, :5)', batch)
+    con.commit()
+    if verbose:
+        print('{} respondents written in {:.1f} s'.format(len(people), perf_counter() - start))
+
+    written = 0
+    loaded = 0
+    pending = 0
+    batch = []
+    for administration in administrations(rng, surveys, people, students):
+        batch.append(administration)
+        pending += len(administration[3])
+        if len(batch) >= BATCH_ADMINISTRATIONS or written + pending >= responses:
+            rows = qf.bulk_insert_surveys(con, batch)
+            if rows < 0:
+                raise RuntimeError('Could not write a batch of administrations')
+            written += rows
+            loaded += len(batch)
+            pending = 0
+            batch = []
+            if verbose and loaded % (BATCH_ADMINISTRATIONS * 20) == 0:
+                print('{} administrations, {} responses written in {:.1f} s'.format(loaded, written,
+                                                                                    perf_counter() - start))
+            if written >= responses:
+                break
+    if verbose:
+        print('{} respondents, {} administrations, {} responses written in {:.1f} s'.format(
+            len(people), loaded, written, perf_counter() - start))
+    return {'respondents': len(people), 'administrations': loaded, 'responses': written}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate synthetic surveys, respondents and responses.')
+    parser.add_argument('-u', '--user', default='', help='database username')
+    parser.add_argument('-p', '--password', help='database password, prompted for if not given')
+    parser.add_argument('-d', '--domain', required=True, help='Oracle domain or SQLite connection string')
+    parser.add_argument('--responses', type=int, default=RESPONSES, help='rs_response rows to generate')
+    parser.add_argument('--respondents', type=int, help='respondents to generate')
+    parser.add_argument('--seed', type=int, default=SEED, help='random seed')
+    args = parser.parse_args(argv)
+
+    password = args.password
+    if password is None:
+        password = getpass.getpass() if args.user else ''
+    con = qf.connect(args.user, password, args.domain)
+    if con in (-1, -2):
+        return 2
+    try:
+        generate(con, args.responses, args.respondents, args.seed)
+    except ValueError as e:
+        print(e)
+        return 1
+    finally:
+        con.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+
+import tkinter as tk
+
+HEADER_FONT = ('Times New Roman', 10, 'bold')
+EMPTY_FONT = ('Times New Roman', 10, 'italic')
+STRIPE_COLORS = ('#ffffcc', '#ffffff')
+SELECTED_COLOR = 'lightblue'
+
+
+class SelectionModel:
+    def __init__(self, key=tuple):
+        """
+        Tracks the selected row of a table by its key rather than by its widgets, so selecting, highlighting and
+        reading the selection cost the same however many rows the table has. The selection is kept when the table is
+        refilled and the selected row is still in it. Models can be made mutually exclusive with exclude(), so that
+        selecting a row in one table clears the selection of the other.
+        :param key: function returning the key (e.g. the id) of a row record
+        """
+        self.key = key
+        self.selected = None
+        self.row = None
+        self.views = []
+        self.excluded = []
+
+    def select(self, row):
+        """
+        Makes row the selected row, clearing the previous selection and the selection of any excluded model.
+        :param row: the row record
+        :return: None
+        """
+        for other in self.excluded:
+            other.clear()
+        self.selected = self.key(row)
+        self.row = row
+        self.changed()
+
+    def clear(self):
+        if self.selected is None:
+            return
+        self.selected = None
+        self.row = None
+        self.changed()
+
+    def is_selected(self, row):
+        return self.selected is not None and self.key(row) == self.selected
+
+    def exclude(self, other):
+        """
+        Makes this model and the other one mutually exclusive.
+        :return: None
+        """
+        self.excluded.append(other)
+        other.excluded.append(self)
+
+    def changed(self):
+        for view in self.views:
+            view.render()
+
+
+class VirtualTable(tk.Frame):
+    def __init__(self, master, columns, height=10, command=None, empty_text='', stripes=STRIPE_COLORS,
+                 header_font=HEADER_FONT, selection=None, **kwargs):
+        """
+        Scrollable, selectable table that only ever creates widgets for the rows that fit on screen. A fixed pool of
+        labels (height rows x columns) is built once and, when the table is scrolled, the labels are re-filled with the
+        rows that are now visible instead of creating a label for every row of the result set. Each label knows its slot
+        in the pool, so a click maps straight to a row: the row is selected in the table's SelectionModel and command is
+        called with the row record.
+        :param master: TK parent widget
+        :param columns: list of (heading, width) tuples, one per column
+        :param height: number of rows visible at once
+        :param command: function called with the row record when a row is clicked
+        :param empty_text: message displayed when there are no rows
+        :param stripes: background colors alternated between rows
+        :param header_font: font of the column headings
+        :param selection: SelectionModel tracking the selected row, a new one keyed on the whole row if not given
+        """
+        tk.Frame.__init__(self, master, **kwargs)
+        self.columns = columns
+        self.height = height
+        self.command = command
+        self.stripes = stripes
+        self.rows = []
+        self.formatter = tuple
+        self.first = 0
+        self.selection = selection or SelectionModel()
+        self.selection.views.append(self)
+
+        self.body = tk.Frame(self)
+        self.vsb = tk.Scrollbar(self, command=self.yview)
+        self.vsb.pack(side='right', fill='y')
+        self.body.pack(side='left', fill='both', expand=True)
+
+        for col, (heading, width) in enumerate(self.columns):
+            tk.Label(self.body, text=heading, font=header_font, width=width, bd=1).grid(row=0, column=col, sticky='nsew')
+
+        self.default_bg = self.body.cget('bg')
+        self.slots = []
+        for slot in range(self.height):
+            labels = []
+            for col, (heading, width) in enumerate(self.columns):
+                label = tk.Label(self.body, text='', width=width, bd=1)
+                label.grid(row=slot+1, column=col, sticky='nsew')
+                label.bind('<Button-1>', lambda event, slot=slot: self.on_click(slot))
+                label.bind('<Button-4>', lambda event: self.yview_scroll(-1, 'units'))
+                label.bind('<Button-5>', lambda event: self.yview_scroll(1, 'units'))
+                labels.append(label)
+            self.slots.append(labels)
+
+        self.empty_label = tk.Label(self.body, text=empty_text, font=EMPTY_FONT)
+        self.show_empty(empty_text)
+
+    def set_rows(self, rows, formatter=None, empty_text=None):
+        """
+        Replaces the rows of the table and scrolls back to the top. The selection is kept if the selected row is among
+        the new rows.
+        :param rows: list of row records
+        :param formatter: function turning a row record into the tuple of cell values, only called for visible rows
+        :param empty_text: message displayed if rows is empty, the current message is kept if not given
+        :return: None
+        """
+        self.rows = rows
+        self.formatter = formatter or tuple
+        self.first = 0
+        if rows:
+            self.empty_label.grid_remove()
+        else:
+            self.show_empty(empty_text)
+        self.render()
+
+    def show_empty(self, empty_text=None):
+        if empty_text is not None:
+            self.empty_label.config(text=empty_text)
+        self.empty_label.grid(row=1, column=0, columnspan=len(self.columns), sticky='nsew')
+        self.empty_label.lift()
+
+    def render(self):
+        """
+        Fills the label pool with the rows currently scrolled into view and updates the scrollbar.
+        :return: None
+        """
+        for slot, labels in enumerate(self.slots):
+            index = self.first + slot
+            if index < len(self.rows):
+                row = self.rows[index]
+                values = self.formatter(row)
+                if self.selection.is_selected(row):
+                    bg = SELECTED_COLOR
+                else:
+                    bg = self.stripes[index % len(self.stripes)]
+                for label, value in zip(labels, values):
+                    label.config(text='' if value is None else value, bg=bg)
+            else:
+                for label in labels:
+                    label.config(text='', bg=self.default_bg)
+
+        total = len(self.rows)
+        if total > self.height:
+            self.vsb.set(self.first / total, (self.first + self.height) / total)
+        else:
+            self.vsb.set(0, 1)
+
+    def scroll_to(self, first):
+        last_first = max(len(self.rows) - self.height, 0)
+        first = min(max(int(first), 0), last_first)
+        if first != self.first:
+            self.first = first
+            self.render()
+
+    def yview(self, *args):
+        """
+        Scrollbar command, follows the Tk yview protocol ('moveto', fraction) / ('scroll', n, 'units' or 'pages').
+        """
+        if args[0] == 'moveto':
+            self.scroll_to(float(args[1]) * len(self.rows))
+        elif args[0] == 'scroll':
+            self.yview_scroll(int(args[1]), args[2])
+
+    def yview_scroll(self, number, what):
+        """
+        Scrolls by a number of rows ('units') or screens ('pages'), same signature as tk.Canvas.yview_scroll() so the
+        windows' mousewheel handlers can scroll the table like a canvas.
+        """
+        if what == 'pages':
+            number *= self.height
+        self.scroll_to(self.first + number)
+
+    def on_click(self, slot):
+        index = self.first + slot
+        if index >= len(self.rows):
+            return
+        row = self.rows[index]
+        self.selection.select(row)
+        if self.command:
+            self.command(row)
+
+    def clear(self, empty_text=None):
+        """
+        Empties the table and clears its selection.
+        """
+        self.selection.clear()
+        self.set_rows([], empty_text=empty_text)